@@ -0,0 +1,107 @@
+"""
+Compare the rows/sec of the request listing read paths: ORM objects
+serialized with `to_dict` and FastAPI's `jsonable_encoder`, versus plain rows
+of selected columns serialized by `encode_requests`.
+
+The requests are inserted in a transaction which is rolled back at the end,
+so the database is left unchanged. Uses the configured DB_URL.
+
+Usage:
+- python benchmarks/list_requests.py --rows 50000
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+import json
+import time
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert
+
+from requestor.config import config
+from requestor.db import Request, get_db_engine_and_sessionmaker, initialize_db
+from requestor.routes.query import (
+    REQUEST_FIELDS,
+    encode_requests,
+    get_fields_to_select,
+    get_filtered_requests_query,
+)
+
+
+async def orm_path(session) -> int:
+    result = await session.execute(get_filtered_requests_query())
+    requests = result.scalars().all()
+    body = json.dumps(jsonable_encoder([r.to_dict() for r in requests]))
+    # objects would not be in the session's identity map in a real request
+    session.expunge_all()
+    return len(body)
+
+
+async def core_path(session, fields: list) -> int:
+    fields, columns = get_fields_to_select(fields)
+    result = await session.execute(get_filtered_requests_query(columns=columns))
+    return len(encode_requests(result.all(), fields))
+
+
+async def main(args):
+    config.validate()
+    initialize_db()
+    _, async_sessionmaker_instance = get_db_engine_and_sessionmaker()
+    now = datetime.now(timezone.utc)
+    async with async_sessionmaker_instance() as session:
+        async with session.begin():
+            for i in range(0, args.rows, 5000):
+                await session.execute(
+                    insert(Request),
+                    [
+                        {
+                            "request_id": uuid.uuid4(),
+                            "username": f"benchmark_user_{j % 100}",
+                            "policy_id": f"benchmark_policy_{j % 50}",
+                            "revoke": False,
+                            "status": "APPROVED",
+                            "created_time": now + timedelta(microseconds=j),
+                            "updated_time": now + timedelta(microseconds=j),
+                        }
+                        for j in range(i, min(i + 5000, args.rows))
+                    ],
+                )
+
+            paths = {
+                "ORM objects + jsonable_encoder": lambda: orm_path(session),
+                "rows + encode_requests": lambda: core_path(session, REQUEST_FIELDS),
+                "rows + encode_requests, 2 fields": lambda: core_path(
+                    session, ["request_id", "status"]
+                ),
+            }
+            for name, path in paths.items():
+                durations = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    await path()
+                    durations.append(time.perf_counter() - start)
+                best = min(durations)
+                print(
+                    f"{name}: {best:.3f}s for {args.rows} rows ({args.rows / best:,.0f} rows/sec)"
+                )
+
+            await session.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=50000,
+        help="number of requests to list (default: 50000)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="number of runs per read path; the best run is reported (default: 3)",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,95 @@
+"""
+Compare the insert throughput and the primary key index size of the requests
+table with random (version 4) and time-ordered (version 7) request IDs.
+
+The requests are inserted one batch per transaction, like concurrent
+`POST /request` calls would, in a temporary copy of the requests table which
+is dropped at the end, so the database is left unchanged. Uses the
+configured DB_URL.
+
+Usage:
+- python benchmarks/request_ids.py --rows 200000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import text
+
+from requestor.config import config
+from requestor.db import get_db_engine_and_sessionmaker, initialize_db
+from requestor.request_ids import uuid7
+
+
+TABLE = "benchmark_request_ids"
+
+
+async def run(engine, generate_id, args) -> tuple[float, int]:
+    async with engine.begin() as connection:
+        await connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        await connection.execute(
+            text(f"CREATE UNLOGGED TABLE {TABLE} (LIKE requests INCLUDING ALL)")
+        )
+
+    query = text(
+        f"INSERT INTO {TABLE} (request_id, username, policy_id, revoke, status, created_time, updated_time)"
+        " VALUES (:request_id, :username, :policy_id, false, 'DRAFT', now(), now())"
+    )
+    start = time.perf_counter()
+    for i in range(0, args.rows, args.batch_size):
+        async with engine.begin() as connection:
+            await connection.execute(
+                query,
+                [
+                    {
+                        "request_id": generate_id(),
+                        "username": f"benchmark_user_{j}",
+                        "policy_id": f"benchmark_policy_{j % 50}",
+                    }
+                    for j in range(i, min(i + args.batch_size, args.rows))
+                ],
+            )
+    duration = time.perf_counter() - start
+
+    async with engine.begin() as connection:
+        index_size = (
+            await connection.execute(
+                text(
+                    "SELECT pg_relation_size(indexrelid) FROM pg_index"
+                    f" WHERE indrelid = '{TABLE}'::regclass AND indisprimary"
+                )
+            )
+        ).scalar_one()
+        await connection.execute(text(f"DROP TABLE {TABLE}"))
+    return duration, index_size
+
+
+async def main(args):
+    config.validate()
+    initialize_db()
+    engine, _ = get_db_engine_and_sessionmaker()
+    generators = {"uuid4 (random)": uuid.uuid4, "uuid7 (time-ordered)": uuid7}
+    for name, generate_id in generators.items():
+        duration, index_size = await run(engine, generate_id, args)
+        print(
+            f"{name}: {duration:.3f}s for {args.rows} rows ({args.rows / duration:,.0f} rows/sec), primary key index: {index_size / 1024 / 1024:.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=200000,
+        help="number of requests to insert (default: 200000)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=100,
+        help="number of requests inserted per transaction (default: 100)",
+    )
+    asyncio.run(main(parser.parse_args()))
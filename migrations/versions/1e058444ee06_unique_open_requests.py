@@ -0,0 +1,63 @@
+"""Make the index on open requests unique
+
+Revision ID: 1e058444ee06
+Revises: a91f5a501c24
+Create Date: 2026-10-19 12:31:08.447190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from requestor.config import config
+
+
+# revision identifiers, used by Alembic.
+revision = "1e058444ee06"
+down_revision = "a91f5a501c24"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # users can only have 1 open request per (policy_id, revoke). Requests
+    # created at the same time before this migration could be duplicates,
+    # which must be resolved (for example by updating the status of all but
+    # one to a final status) before the unique index can be created
+    connection = op.get_bind()
+    query = (
+        sa.select(
+            sa.column("username"),
+            sa.column("policy_id"),
+            sa.column("revoke"),
+            sa.func.count().label("count"),
+        )
+        .select_from(sa.table("requests"))
+        .where(sa.column("status").notin_(config["FINAL_STATUSES"]))
+        .group_by(sa.column("username"), sa.column("policy_id"), sa.column("revoke"))
+        .having(sa.func.count() > 1)
+    )
+    duplicates = connection.execute(query).fetchall()
+    if duplicates:
+        raise Exception(
+            f"Unable to create unique index: found {len(duplicates)} (username, policy_id, revoke) combinations with more than 1 open request. Update the status of the duplicate requests to one of FINAL_STATUSES {config['FINAL_STATUSES']} and run the migration again. Duplicates: {[tuple(row) for row in duplicates]}"
+        )
+
+    # If FINAL_STATUSES is updated, the index should be recreated
+    op.drop_index("ix_requests_open_username_policy_id_revoke", table_name="requests")
+    op.create_index(
+        "ix_requests_open_username_policy_id_revoke",
+        "requests",
+        ["username", "policy_id", "revoke"],
+        unique=True,
+        postgresql_where=sa.column("status").notin_(config["FINAL_STATUSES"]),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_requests_open_username_policy_id_revoke", table_name="requests")
+    op.create_index(
+        "ix_requests_open_username_policy_id_revoke",
+        "requests",
+        ["username", "policy_id", "revoke"],
+        postgresql_where=sa.column("status").notin_(config["FINAL_STATUSES"]),
+    )
@@ -0,0 +1,27 @@
+"""Add claimed_until column to external_call_dead_letters
+
+Revision ID: 2b7d94e1a6c3
+Revises: f3a8c1d2b6e4
+Create Date: 2026-10-19 21:04:17.582931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "2b7d94e1a6c3"
+down_revision = "f3a8c1d2b6e4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "external_call_dead_letters",
+        sa.Column("claimed_until", sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade():
+    op.drop_column("external_call_dead_letters", "claimed_until")
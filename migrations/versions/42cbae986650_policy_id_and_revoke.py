@@ -20,6 +20,7 @@ from requestor.arborist import (
     list_policies,
 )
 from requestor.config import config
+from requestor.migration_utils import get_table, iter_batches, update_rows
 
 
 # revision identifiers, used by Alembic.
@@ -42,11 +43,6 @@ else:
     arborist_client = ArboristClient(authz_provider="requestor", logger=logger)
 
 
-def escape(str):
-    # escape single quotes for SQL statement
-    return str.replace("'", "''")
-
-
 def upgrade():
     # get the list of existing policies from Arborist
     if not config["LOCAL_MIGRATION"]:
@@ -56,17 +52,15 @@ def upgrade():
     op.add_column("requests", sa.Column("policy_id", sa.String()))
     op.add_column("requests", sa.Column("revoke", Boolean))
 
-    # get the list of existing resource_paths in the database
-    connection = op.get_bind()
-    offset = 0
-    limit = 500
-    query = f"SELECT resource_path FROM requests ORDER by resource_path LIMIT {limit} OFFSET {offset}"
-    results = connection.execute(sa.text(query)).fetchall()
-
     # add the `policy_id` corresponding to each row's `resource_path`
     # and default `revoke` to False
-    while results:
-        for resource_path in set(r[0] for r in results):
+    connection = op.get_bind()
+    requests = get_table(connection, "requests")
+    policy_ids = {}  # resource_path -> policy_id
+    for rows in iter_batches(connection, requests, ["resource_path"]):
+        for resource_path in set(row.resource_path for row in rows):
+            if resource_path in policy_ids:
+                continue
             policy_id = get_auto_policy_id([resource_path])
             if (
                 not config["LOCAL_MIGRATION"]
@@ -77,16 +71,19 @@ def upgrade():
                     resource_paths=[resource_path],
                 )
                 existing_policies["policies"].append(created_policy_id)
-            connection.execute(
-                sa.text(
-                    f"UPDATE requests SET policy_id='{escape(policy_id)}', revoke=False WHERE resource_path='{escape(resource_path)}'"
-                )
-            )
-
-        # Grab another batch of rows
-        offset += limit
-        query = f"SELECT resource_path FROM requests ORDER by resource_path LIMIT {limit} OFFSET {offset}"
-        results = connection.execute(sa.text(query)).fetchall()
+            policy_ids[resource_path] = policy_id
+        update_rows(
+            connection,
+            requests,
+            [
+                {
+                    "request_id": row.request_id,
+                    "policy_id": policy_ids[row.resource_path],
+                    "revoke": False,
+                }
+                for row in rows
+            ],
+        )
 
     # now that there are no null values, make the columns non-nullable
     op.alter_column("requests", "policy_id", nullable=False)
@@ -106,35 +103,36 @@ def downgrade():
 
     # convert policy_id to resource_path
     connection = op.get_bind()
-    offset = 0
-    limit = 500
-    query = f"SELECT policy_id FROM requests ORDER by policy_id LIMIT {limit} OFFSET {offset}"
-    results = connection.execute(sa.text(query)).fetchall()
-
-    while results:
-        for policy_id in set(r[0] for r in results):
+    requests = get_table(connection, "requests")
+    resource_paths = {}  # policy_id -> resource_path
+    for rows in iter_batches(connection, requests, ["policy_id"]):
+        for policy_id in set(row.policy_id for row in rows):
+            if policy_id in resource_paths:
+                continue
             if not config["LOCAL_MIGRATION"]:
-                resource_paths = get_resource_paths_for_policy(
+                policy_resource_paths = get_resource_paths_for_policy(
                     existing_policies["policies"], policy_id
                 )
                 assert (
-                    len(resource_paths) > 0
+                    len(policy_resource_paths) > 0
                 ), f"No resource_paths for policy {policy_id}"
             else:
                 # hardcoded to avoid querying Arborist
-                resource_paths = ["/test/resource/path"]
+                policy_resource_paths = ["/test/resource/path"]
             # use the first item in the policy’s list of resources, because this
             # schema only allows 1 resource_path
-            connection.execute(
-                sa.text(
-                    f"UPDATE requests SET resource_path='{escape(resource_paths[0])}' WHERE policy_id='{escape(policy_id)}'"
-                )
-            )
-
-        # get another batch of rows
-        offset += limit
-        query = f"SELECT policy_id FROM requests ORDER by policy_id LIMIT {limit} OFFSET {offset}"
-        results = connection.execute(sa.text(query)).fetchall()
+            resource_paths[policy_id] = policy_resource_paths[0]
+        update_rows(
+            connection,
+            requests,
+            [
+                {
+                    "request_id": row.request_id,
+                    "resource_path": resource_paths[row.policy_id],
+                }
+                for row in rows
+            ],
+        )
 
     # now that there are no null values, make the column non-nullable
     op.alter_column("requests", "resource_path", nullable=False)
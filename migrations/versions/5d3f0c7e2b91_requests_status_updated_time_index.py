@@ -0,0 +1,30 @@
+"""Add (status, updated_time) index to requests table
+
+Revision ID: 5d3f0c7e2b91
+Revises: 1e058444ee06
+Create Date: 2026-10-19 14:02:17.514203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5d3f0c7e2b91"
+down_revision = "1e058444ee06"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # used to find the draft requests that have not been updated for
+    # DRAFT_TTL seconds
+    op.create_index(
+        "ix_requests_status_updated_time",
+        "requests",
+        ["status", "updated_time"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_requests_status_updated_time", table_name="requests")
@@ -0,0 +1,36 @@
+"""Add external_call_dead_letters table
+
+Revision ID: 7c2a3bfd605e
+Revises: 42cbae986650
+Create Date: 2026-10-19 09:12:41.338402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "7c2a3bfd605e"
+down_revision = "42cbae986650"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "external_call_dead_letters",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("external_call_id", sa.String(), nullable=False),
+        sa.Column("request_id", postgresql.UUID()),
+        sa.Column("payload", postgresql.JSONB(), nullable=False),
+        sa.Column("error", sa.String()),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("created_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_attempt_time", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("external_call_dead_letters")
@@ -0,0 +1,46 @@
+"""Create request_status_events table
+
+Revision ID: 8b6a2e4f1c37
+Revises: d7e41c3a9b02
+Create Date: 2026-10-19 16:48:05.627319
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "8b6a2e4f1c37"
+down_revision = "d7e41c3a9b02"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "request_status_events",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("request_id", postgresql.UUID(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("policy_id", sa.String(), nullable=False),
+        sa.Column("old_status", sa.String()),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("event_time", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # rows are inserted in `event_time` order, so a BRIN index is enough for
+    # time range queries
+    op.create_index(
+        "ix_request_status_events_event_time",
+        "request_status_events",
+        ["event_time"],
+        postgresql_using="brin",
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_request_status_events_event_time", table_name="request_status_events"
+    )
+    op.drop_table("request_status_events")
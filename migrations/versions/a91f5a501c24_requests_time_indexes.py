@@ -0,0 +1,36 @@
+"""Add created_time and updated_time indexes to requests table
+
+Revision ID: a91f5a501c24
+Revises: b44035308332
+Create Date: 2026-10-19 11:24:40.181635
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a91f5a501c24"
+down_revision = "b44035308332"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # request_id is included so that the indexes also match the keyset
+    # pagination order
+    op.create_index(
+        "ix_requests_created_time_request_id",
+        "requests",
+        ["created_time", "request_id"],
+    )
+    op.create_index(
+        "ix_requests_updated_time_request_id",
+        "requests",
+        ["updated_time", "request_id"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_requests_updated_time_request_id", table_name="requests")
+    op.drop_index("ix_requests_created_time_request_id", table_name="requests")
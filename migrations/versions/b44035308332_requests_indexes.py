@@ -0,0 +1,39 @@
+"""Add indexes for username, policy_id and revoke lookups to requests table
+
+Revision ID: b44035308332
+Revises: 7c2a3bfd605e
+Create Date: 2026-10-19 10:02:17.513064
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from requestor.config import config
+
+
+# revision identifiers, used by Alembic.
+revision = "b44035308332"
+down_revision = "7c2a3bfd605e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_requests_username_policy_id_revoke",
+        "requests",
+        ["username", "policy_id", "revoke"],
+    )
+    # partial index on the requests that are still open. If FINAL_STATUSES
+    # is updated, the index should be recreated
+    op.create_index(
+        "ix_requests_open_username_policy_id_revoke",
+        "requests",
+        ["username", "policy_id", "revoke"],
+        postgresql_where=sa.column("status").notin_(config["FINAL_STATUSES"]),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_requests_open_username_policy_id_revoke", table_name="requests")
+    op.drop_index("ix_requests_username_policy_id_revoke", table_name="requests")
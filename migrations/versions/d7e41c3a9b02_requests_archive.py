@@ -0,0 +1,53 @@
+"""Create requests_archive table
+
+Revision ID: d7e41c3a9b02
+Revises: 5d3f0c7e2b91
+Create Date: 2026-10-19 15:37:52.081944
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "d7e41c3a9b02"
+down_revision = "5d3f0c7e2b91"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # same columns as the `requests` table, plus `archived_time`
+    op.create_table(
+        "requests_archive",
+        sa.Column("request_id", postgresql.UUID(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("policy_id", sa.String(), nullable=False),
+        sa.Column("revoke", sa.Boolean(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("created_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("resource_id", sa.String(), nullable=True),
+        sa.Column("resource_display_name", sa.String(), nullable=True),
+        sa.Column("archived_time", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("request_id"),
+    )
+    op.create_index(
+        "ix_requests_archive_username",
+        "requests_archive",
+        ["username"],
+    )
+    op.create_index(
+        "ix_requests_archive_created_time_request_id",
+        "requests_archive",
+        ["created_time", "request_id"],
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_requests_archive_created_time_request_id", table_name="requests_archive"
+    )
+    op.drop_index("ix_requests_archive_username", table_name="requests_archive")
+    op.drop_table("requests_archive")
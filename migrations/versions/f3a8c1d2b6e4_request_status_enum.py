@@ -0,0 +1,99 @@
+"""Store the status of requests as a Postgres enum
+
+Revision ID: f3a8c1d2b6e4
+Revises: 8b6a2e4f1c37
+Create Date: 2026-10-19 18:21:44.306518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from requestor.config import config
+
+
+# revision identifiers, used by Alembic.
+revision = "f3a8c1d2b6e4"
+down_revision = "8b6a2e4f1c37"
+branch_labels = None
+depends_on = None
+
+
+def convert_status_column(table_name: str, type_name: str, new_type) -> None:
+    """
+    Convert the `status` column of `table_name` to `new_type`.
+
+    The whole migration runs in a single transaction, which holds an ACCESS
+    EXCLUSIVE lock on the table from the first schema change until it
+    commits, so copying the values in batches would not make the table
+    available any sooner. A single `ALTER COLUMN ... TYPE` rewrites the table
+    once, without leaving dead row versions behind, and keeps the column in
+    place.
+    """
+    op.alter_column(
+        table_name,
+        "status",
+        type_=new_type,
+        postgresql_using=f"status::{type_name}",
+    )
+
+
+def drop_status_indexes() -> None:
+    op.drop_index("ix_requests_status_updated_time", table_name="requests")
+    op.drop_index("ix_requests_open_username_policy_id_revoke", table_name="requests")
+
+
+def create_status_indexes() -> None:
+    # same indexes as before the column was converted
+    op.create_index(
+        "ix_requests_open_username_policy_id_revoke",
+        "requests",
+        ["username", "policy_id", "revoke"],
+        unique=True,
+        postgresql_where=sa.column("status").notin_(config["FINAL_STATUSES"]),
+    )
+    op.create_index(
+        "ix_requests_status_updated_time",
+        "requests",
+        ["status", "updated_time"],
+    )
+
+
+def upgrade():
+    # the enum values are the ALLOWED_REQUEST_STATUSES, plus the statuses
+    # of existing requests, which may have been removed from the
+    # configuration since they were created. Statuses added to
+    # ALLOWED_REQUEST_STATUSES later are added to the type on startup
+    connection = op.get_bind()
+    existing_statuses = (
+        connection.execute(
+            sa.text(
+                "SELECT DISTINCT status FROM requests UNION SELECT DISTINCT status FROM requests_archive ORDER BY status"
+            )
+        )
+        .scalars()
+        .all()
+    )
+    statuses = list(config["ALLOWED_REQUEST_STATUSES"]) + [
+        status
+        for status in existing_statuses
+        if status not in config["ALLOWED_REQUEST_STATUSES"]
+    ]
+    status_type = postgresql.ENUM(*statuses, name="request_status", create_type=False)
+    status_type.create(connection)
+
+    # the index predicate compares `status` to strings, so the indexes are
+    # recreated instead of being rebuilt with the column
+    drop_status_indexes()
+    convert_status_column("requests", "request_status", status_type)
+    convert_status_column("requests_archive", "request_status", status_type)
+    create_status_indexes()
+
+
+def downgrade():
+    drop_status_indexes()
+    convert_status_column("requests", "varchar", sa.String())
+    convert_status_column("requests_archive", "varchar", sa.String())
+    create_status_indexes()
+
+    postgresql.ENUM(name="request_status").drop(op.get_bind())
@@ -0,0 +1,52 @@
+"""
+Replay the external calls that still failed after all retries, which were
+saved to the dead-letter table (only for the external call configs with
+`batch` or `dead_letter` enabled). Calls that succeed are removed from the
+table.
+
+Usage:
+- Replay all failed calls: python replay_dead_letters.py
+- Replay the failed calls for one external call config, 10 at a time:
+    python replay_dead_letters.py --external-call-id my_call_id --concurrency 10
+"""
+
+import argparse
+import asyncio
+
+from requestor.config import config
+from requestor.dead_letters import replay_dead_letters
+from requestor.db import initialize_db
+
+
+async def main(args):
+    config.validate()
+    initialize_db()
+    counts = await replay_dead_letters(
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        external_call_id=args.external_call_id,
+    )
+    print(
+        f"Replayed {counts['replayed']} failed external calls; {counts['failed']} failed again"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=5,
+        help="max number of external calls to make at the same time (default: 5)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=100,
+        help="number of failed calls to claim and replay at once (default: 100)",
+    )
+    parser.add_argument(
+        "--external-call-id",
+        help="only replay the failed calls for this EXTERNAL_CALL_CONFIGS entry",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -9,8 +9,11 @@ from gen3authz.client.arborist.async_client import ArboristClient
 import httpx
 
 from . import logger
+from .batching import start_batchers, stop_batchers
 from .config import config
-from .db import initialize_db
+from .db import initialize_db, sync_request_status_type
+from .notifications import hub
+from .periodic_tasks import start_periodic_tasks, stop_periodic_tasks
 
 
 def load_modules(app: FastAPI = None) -> None:
@@ -69,10 +72,19 @@ async def lifespan(app: FastAPI):
     """
     # startup
     initialize_db()
+    await sync_request_status_type()
+    start_batchers()
+    start_periodic_tasks()
 
     yield
 
     # teardown
+    logger.debug("Stopping periodic tasks")
+    await stop_periodic_tasks()
+    logger.debug("Sending queued batched external calls")
+    await stop_batchers()
+    logger.debug("Closing request change subscriptions")
+    await hub.stop()
     logger.debug("Closing async client")
     await app.async_client.aclose()
 
@@ -0,0 +1,136 @@
+"""
+Archival of old requests.
+
+Requests in FINAL_STATUSES are rarely read, but slow down the queries on the
+active requests. The requests that have not been updated for ARCHIVE_AFTER
+seconds are moved to the `requests_archive` table, and an "archived"
+notification is sent for each of them. The list endpoints only return them
+when the `include_archived` parameter is set; the endpoints for a single
+request, and `POST /request/batch_get`, fall back to the archive.
+
+This runs as a periodic task, every ARCHIVE_INTERVAL seconds. Requests are
+moved ARCHIVE_BATCH_SIZE at a time, each batch with a single statement, and
+the rows already locked by another worker are skipped, so every worker can
+safely run it.
+"""
+
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import ARRAY, any_, bindparam, delete, insert, literal, select
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import aliased
+
+from . import logger
+from .config import config
+from .db import Request as RequestModel, RequestArchive, db_transaction
+from .notifications import notify_request_changes
+
+
+REQUEST_COLUMNS = [column.name for column in RequestModel.__table__.columns]
+
+
+async def archive_final_requests() -> int:
+    """
+    Move the requests in FINAL_STATUSES that have not been updated for
+    ARCHIVE_AFTER seconds to the `requests_archive` table.
+
+    Returns:
+        int: number of archived requests
+    """
+    now = datetime.now(timezone.utc)
+    to_archive = (
+        select(RequestModel.request_id)
+        .where(RequestModel.status.in_(config["FINAL_STATUSES"]))
+        .where(
+            RequestModel.updated_time < now - timedelta(seconds=config["ARCHIVE_AFTER"])
+        )
+        .limit(config["ARCHIVE_BATCH_SIZE"])
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    # delete and insert in a single statement:
+    # WITH moved AS (DELETE ... RETURNING ...) INSERT ... SELECT ... FROM moved
+    moved = (
+        delete(RequestModel)
+        .where(RequestModel.request_id.in_(to_archive))
+        .returning(*(RequestModel.__table__.c[name] for name in REQUEST_COLUMNS))
+        .cte("moved")
+    )
+    query = (
+        insert(RequestArchive)
+        .from_select(
+            [*REQUEST_COLUMNS, "archived_time"],
+            select(*(moved.c[name] for name in REQUEST_COLUMNS), literal(now)),
+        )
+        .add_cte(moved)
+        .returning(*(RequestArchive.__table__.c[name] for name in REQUEST_COLUMNS))
+    )
+
+    count = 0
+    while True:
+        async with db_transaction() as db_session:
+            archived = (await db_session.execute(query)).all()
+            await notify_request_changes(
+                db_session, "archived", [row._asdict() for row in archived]
+            )
+        count += len(archived)
+        if len(archived) < config["ARCHIVE_BATCH_SIZE"]:
+            break
+
+    logger.info(f"Archived {count} requests")
+    return count
+
+
+def get_requests_with_archive():
+    """
+    Return an entity that can be used like the `Request` model in queries,
+    and which includes both the requests and the archived requests.
+    """
+    requests_and_archive = (
+        select(*(RequestModel.__table__.c[name] for name in REQUEST_COLUMNS))
+        .union_all(
+            select(*(RequestArchive.__table__.c[name] for name in REQUEST_COLUMNS))
+        )
+        .subquery("requests_with_archive")
+    )
+    return aliased(RequestModel, requests_and_archive)
+
+
+async def get_archived_requests(db_session, request_ids: list) -> list:
+    """
+    Get the archived requests with the specified IDs, as `Request` objects.
+    The IDs of requests that are not archived are ignored.
+    """
+    archived_requests = aliased(
+        RequestModel,
+        select(
+            *(RequestArchive.__table__.c[name] for name in REQUEST_COLUMNS)
+        ).subquery("archived_requests"),
+        # the columns are matched by name, since they are not from the
+        # `requests` table
+        adapt_on_names=True,
+    )
+    query = select(archived_requests).where(
+        archived_requests.request_id
+        == any_(bindparam("request_ids", list(request_ids), type_=ARRAY(UUID)))
+    )
+    return list((await db_session.scalars(query)).all())
+
+
+async def get_request_or_archived_request(db_session, request_id) -> tuple:
+    """
+    Get a request, or the archived request if it was archived.
+
+    Returns:
+        tuple: (the request, or None if it does not exist; whether the
+            request is archived)
+    """
+    query = select(RequestModel).where(RequestModel.request_id == request_id)
+    request = (await db_session.execute(query)).scalar()
+    if request:
+        return request, False
+    archived_requests = await get_archived_requests(db_session, [request_id])
+    if archived_requests:
+        return archived_requests[0], True
+    return None, False
@@ -0,0 +1,124 @@
+"""
+Batched delivery of external calls.
+
+External call configs with `batch` enabled do not make one call per status
+update. Instead, the status updates are queued and sent together, once
+`max_size` updates are queued or the oldest one has waited `max_wait`
+seconds. Batches that still fail after all retries are saved to the
+dead-letter table.
+
+The batchers run in the app's event loop: they are started and stopped
+(after sending the queued updates) with the app.
+"""
+
+
+import asyncio
+
+from . import logger
+from .config import config
+from .dead_letters import record_dead_letters
+
+
+# queued by `ExternalCallBatcher.stop()` to tell the batcher to send the
+# status updates it is holding and exit
+_STOP = object()
+
+
+class ExternalCallBatcher:
+    def __init__(self, external_call_id: str, max_size: int, max_wait: float):
+        self.external_call_id = external_call_id
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.task = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the batcher and send the status updates that are still queued.
+
+        The batcher is not cancelled, since it may be holding updates that
+        were already taken from the queue: it sends them and exits when it
+        gets to `_STOP`.
+        """
+        if self.task:
+            self.queue.put_nowait(_STOP)
+            await self.task
+            self.task = None
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        for i in range(0, len(events), self.max_size):
+            await self._send(events[i : i + self.max_size])
+
+    def add(self, data: dict) -> None:
+        self.queue.put_nowait(data)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            event = await self.queue.get()
+            if event is _STOP:
+                break
+            events = [event]
+            deadline = loop.time() + self.max_wait
+            while len(events) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                events.append(event)
+            await self._send(events)
+
+    async def _send(self, events: list) -> None:
+        # imported here to avoid a circular import
+        from .request_utils import make_batched_external_call
+
+        try:
+            await make_batched_external_call(self.external_call_id, events)
+        except Exception as e:
+            logger.error(
+                f"Unable to send batch of {len(events)} events for external call '{self.external_call_id}': {e}"
+            )
+            await record_dead_letters(self.external_call_id, events, e)
+
+
+_batchers = {}
+
+
+def get_batcher(external_call_id: str) -> ExternalCallBatcher:
+    """
+    Get the running batcher for the specified external call config, or None
+    if batching is not enabled for it or the batchers are not running.
+    """
+    return _batchers.get(external_call_id)
+
+
+def start_batchers() -> None:
+    for external_call_id, conf in config["EXTERNAL_CALL_CONFIGS"].items():
+        if "batch" not in conf:
+            continue
+        logger.info(f"Starting batched delivery for external call '{external_call_id}'")
+        batcher = ExternalCallBatcher(
+            external_call_id,
+            max_size=conf["batch"]["max_size"],
+            max_wait=conf["batch"]["max_wait"],
+        )
+        batcher.start()
+        _batchers[external_call_id] = batcher
+
+
+async def stop_batchers() -> None:
+    batchers = list(_batchers.values())
+    _batchers.clear()
+    for batcher in batchers:
+        await batcher.stop()
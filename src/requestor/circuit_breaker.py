@@ -0,0 +1,137 @@
+"""
+Per-destination circuit breakers for external calls.
+
+When an external system keeps failing, the circuit for its host "opens" and
+calls to it fail immediately instead of being retried. After
+RECOVERY_TIMEOUT seconds, the circuit is "half-open": a single probe call is
+allowed through. If it succeeds the circuit closes, otherwise it opens again.
+
+The state is kept in memory, so each worker process has its own breakers.
+"""
+
+
+import threading
+import time
+from urllib.parse import urlparse
+
+from . import logger
+from .config import config
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(
+        self, destination: str, failure_threshold: int, recovery_timeout: float
+    ):
+        self.destination = destination
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Raise a CircuitOpenError if calls to this destination are not
+        currently allowed.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if (
+                self.state == OPEN
+                and time.monotonic() - self.opened_at >= self.recovery_timeout
+            ):
+                logger.info(
+                    f"Circuit for '{self.destination}' is half-open, allowing a probe call"
+                )
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return
+        raise CircuitOpenError(
+            f"Circuit for '{self.destination}' is {self.state}, not making the call"
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit for '{self.destination}' is now closed")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self.probe_in_flight = False
+            if (
+                self.state == HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state != OPEN:
+                    logger.warning(
+                        f"Circuit for '{self.destination}' is now open after {self.consecutive_failures} consecutive failures"
+                    )
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(
+                    0, self.recovery_timeout - (time.monotonic() - self.opened_at)
+                )
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "seconds_until_probe": retry_in,
+            }
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_destination(url: str) -> str:
+    return urlparse(url).netloc
+
+
+def get_circuit_breaker(url: str) -> CircuitBreaker:
+    """
+    Get the circuit breaker for the host the specified URL points to.
+    """
+    destination = get_destination(url)
+    with _circuit_breakers_lock:
+        if destination not in _circuit_breakers:
+            conf = config["EXTERNAL_CALL_CIRCUIT_BREAKER"]
+            _circuit_breakers[destination] = CircuitBreaker(
+                destination,
+                failure_threshold=conf["FAILURE_THRESHOLD"],
+                recovery_timeout=conf["RECOVERY_TIMEOUT"],
+            )
+        return _circuit_breakers[destination]
+
+
+def get_circuit_breakers_state() -> dict:
+    with _circuit_breakers_lock:
+        breakers = list(_circuit_breakers.values())
+    return {breaker.destination: breaker.to_dict() for breaker in breakers}
+
+
+def reset_circuit_breakers() -> None:
+    with _circuit_breakers_lock:
+        _circuit_breakers.clear()
@@ -41,6 +41,10 @@ class RequestorConfig(Config):
         self.allowed_params_from_db = [
             column.key for column in RequestModel.__table__.columns
         ]
+        assert self["REQUEST_ID_VERSION"] in (
+            4,
+            7,
+        ), f"REQUEST_ID_VERSION should be 4 or 7, got '{self['REQUEST_ID_VERSION']}'"
 
         self.validate_statuses()
         self.validate_credentials()
@@ -62,6 +66,30 @@ class RequestorConfig(Config):
         ):
             assert status in allowed_statuses, msg.format(status, allowed_statuses)
 
+        expired_status = self["DRAFT_EXPIRED_STATUS"]
+        if expired_status:
+            assert (
+                expired_status in self["FINAL_STATUSES"]
+            ), f"DRAFT_EXPIRED_STATUS '{expired_status}' is not one of FINAL_STATUSES {self['FINAL_STATUSES']}"
+            assert (
+                expired_status not in self["UPDATE_ACCESS_STATUSES"]
+            ), f"DRAFT_EXPIRED_STATUS '{expired_status}' cannot be one of UPDATE_ACCESS_STATUSES {self['UPDATE_ACCESS_STATUSES']}"
+        schema = {
+            "type": "object",
+            "properties": {
+                "DRAFT_TTL": {"type": "number", "minimum": 0},
+                "DRAFT_SWEEP_INTERVAL": {"type": "number", "exclusiveMinimum": 0},
+                "DRAFT_SWEEP_BATCH_SIZE": {"type": "integer", "minimum": 1},
+                "ARCHIVE_AFTER": {"type": "number", "minimum": 0},
+                "ARCHIVE_INTERVAL": {"type": "number", "exclusiveMinimum": 0},
+                "ARCHIVE_BATCH_SIZE": {"type": "integer", "minimum": 1},
+            },
+        }
+        validate(
+            instance={key: self[key] for key in schema["properties"]},
+            schema=schema,
+        )
+
     def validate_actions(self) -> None:
         """
         Example:
@@ -154,6 +182,10 @@ class RequestorConfig(Config):
                         - name: dataset
                           param: resource_id
                     creds: ""
+                    dead_letter: false
+                    batch:
+                        max_size: 50
+                        max_wait: 2
         """
         schema = {
             "type": "object",
@@ -166,6 +198,7 @@ class RequestorConfig(Config):
                         "method": NON_EMPTY_STRING_SCHEMA,
                         "url": NON_EMPTY_STRING_SCHEMA,
                         "creds": {"enum": list(self["CREDENTIALS"].keys())},
+                        "dead_letter": {"type": "boolean"},
                         "form": {
                             "type": "array",
                             "items": {
@@ -178,6 +211,15 @@ class RequestorConfig(Config):
                                 },
                             },
                         },
+                        "batch": {
+                            "type": "object",
+                            "additionalProperties": False,
+                            "required": ["max_size", "max_wait"],
+                            "properties": {
+                                "max_size": {"type": "integer", "minimum": 1},
+                                "max_wait": {"type": "number", "minimum": 0},
+                            },
+                        },
                     },
                 }
             },
@@ -190,6 +232,59 @@ class RequestorConfig(Config):
                 config["method"].lower() in supported_methods
             ), f"EXTERNAL_CALL_CONFIGS method {config['method']} is not one of {supported_methods}"
 
+        schema = {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["FAILURE_THRESHOLD", "RECOVERY_TIMEOUT"],
+            "properties": {
+                "FAILURE_THRESHOLD": {"type": "integer", "minimum": 1},
+                "RECOVERY_TIMEOUT": {"type": "number", "minimum": 0},
+            },
+        }
+        validate(instance=self["EXTERNAL_CALL_CIRCUIT_BREAKER"], schema=schema)
+
+        self.validate_external_call_limits()
+
+    def validate_external_call_limits(self):
+        """
+        Example:
+            EXTERNAL_CALL_LIMITS:
+                DEFAULT:
+                    MAX_CONCURRENCY: 10
+                    MAX_CALLS_PER_SECOND: 0
+                    BURST: 1
+                    MAX_QUEUE_WAIT: 30
+                DESTINATIONS:
+                    abc_system.org:
+                        MAX_CALLS_PER_SECOND: 5
+        """
+        limits_schema = {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "MAX_CONCURRENCY": {"type": "integer", "minimum": 0},
+                "MAX_CALLS_PER_SECOND": {"type": "number", "minimum": 0},
+                "BURST": {"type": "integer", "minimum": 1},
+                "MAX_QUEUE_WAIT": {"type": "number", "minimum": 0},
+            },
+        }
+        schema = {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["DEFAULT", "DESTINATIONS"],
+            "properties": {
+                "DEFAULT": {
+                    **limits_schema,
+                    "required": list(limits_schema["properties"].keys()),
+                },
+                "DESTINATIONS": {
+                    "type": "object",
+                    "patternProperties": {".*": limits_schema},  # host
+                },
+            },
+        }
+        validate(instance=self["EXTERNAL_CALL_LIMITS"], schema=schema)
+
     def validate_credentials(self):
         """
         Example:
@@ -1,8 +1,19 @@
 from collections.abc import AsyncIterable
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+import time
 
-from sqlalchemy import Column, DateTime, String
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    String,
+    TypeDecorator,
+    text,
+)
+from sqlalchemy.dialects.postgresql import ENUM, JSONB, UUID
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -10,8 +21,10 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import NullPool
 from sqlalchemy.sql.sqltypes import Boolean
 
+from . import logger
 from .config import config
 
 
@@ -21,6 +34,37 @@ Base = declarative_base()
 engine = None
 async_sessionmaker_instance = None
 
+# the statuses accepted by the `request_status` type, loaded at startup by
+# `sync_request_status_type`
+request_status_values = list(config["ALLOWED_REQUEST_STATUSES"])
+
+
+class RequestStatus(TypeDecorator):
+    """
+    Statuses are stored as a Postgres enum (4 bytes per value) instead of
+    free-form strings, which keeps the rows and the indexes on `status`
+    small and makes comparisons cheaper. The enum values are the
+    ALLOWED_REQUEST_STATUSES, plus any status found in the database when the
+    migration ran.
+    """
+
+    impl = ENUM
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return str
+
+    def result_processor(self, dialect, coltype):
+        # the driver returns plain strings. Do not fail on statuses that have
+        # since been removed from ALLOWED_REQUEST_STATUSES
+        return None
+
+
+request_status_type = RequestStatus(
+    *config["ALLOWED_REQUEST_STATUSES"], name="request_status"
+)
+
 
 class Request(Base):
     class Config:
@@ -34,7 +78,7 @@ class Request(Base):
     username = Column(String, nullable=False)
     policy_id = Column(String, nullable=False)
     revoke = Column(Boolean, default=False, nullable=False)
-    status = Column(String, nullable=False)
+    status = Column(request_status_type, nullable=False)
     created_time = Column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
@@ -59,6 +103,130 @@ class Request(Base):
         return d
 
 
+# lookups by user and policy, such as `GET /request/user` and the duplicate
+# request check when creating a request
+Index(
+    "ix_requests_username_policy_id_revoke",
+    Request.username,
+    Request.policy_id,
+    Request.revoke,
+)
+# same lookups, restricted to requests that are still open. Users can only
+# have 1 open request per (policy_id, revoke): `create_request` relies on this
+# index to detect duplicates. NOTE: the FINAL_STATUSES are set in the index
+# definition when the migration runs
+Index(
+    "ix_requests_open_username_policy_id_revoke",
+    Request.username,
+    Request.policy_id,
+    Request.revoke,
+    unique=True,
+    postgresql_where=Request.status.notin_(config["FINAL_STATUSES"]),
+)
+# time range filters, and the (created_time, request_id) keyset pagination
+# order
+Index("ix_requests_created_time_request_id", Request.created_time, Request.request_id)
+Index("ix_requests_updated_time_request_id", Request.updated_time, Request.request_id)
+# expiry of stale draft requests
+Index("ix_requests_status_updated_time", Request.status, Request.updated_time)
+
+
+class RequestArchive(Base):
+    """
+    Requests in FINAL_STATUSES that have not been updated for ARCHIVE_AFTER
+    seconds are moved from the `requests` table to this table, so that the
+    `requests` table only contains the recent and active requests. Same
+    columns as the `requests` table, plus `archived_time`.
+    """
+
+    __tablename__ = "requests_archive"
+
+    request_id = Column(UUID, primary_key=True)
+    username = Column(String, nullable=False)
+    policy_id = Column(String, nullable=False)
+    revoke = Column(Boolean, default=False, nullable=False)
+    status = Column(request_status_type, nullable=False)
+    created_time = Column(DateTime(timezone=True), nullable=False)
+    updated_time = Column(DateTime(timezone=True), nullable=False)
+    resource_id = Column(String)
+    resource_display_name = Column(String)
+    archived_time = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
+
+# lookups by user, and the (created_time, request_id) listing order
+Index("ix_requests_archive_username", RequestArchive.username)
+Index(
+    "ix_requests_archive_created_time_request_id",
+    RequestArchive.created_time,
+    RequestArchive.request_id,
+)
+
+
+class RequestStatusEvent(Base):
+    """
+    Append-only history of the status changes of requests: one row for each
+    new request, and for each status update.
+    """
+
+    __tablename__ = "request_status_events"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    request_id = Column(UUID, nullable=False)
+    username = Column(String, nullable=False)
+    policy_id = Column(String, nullable=False)
+    # None for new requests
+    old_status = Column(String)
+    status = Column(String, nullable=False)
+    event_time = Column(DateTime(timezone=True), nullable=False)
+
+
+# time range queries. Rows are inserted in `event_time` order, so a BRIN
+# index is enough, and much smaller and cheaper to maintain than a B-tree
+Index(
+    "ix_request_status_events_event_time",
+    RequestStatusEvent.event_time,
+    postgresql_using="brin",
+)
+
+
+class ExternalCallDeadLetter(Base):
+    """
+    External calls that still failed after all retries. They can be replayed
+    with `replay_dead_letters.py`.
+    """
+
+    __tablename__ = "external_call_dead_letters"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    external_call_id = Column(String, nullable=False)
+    request_id = Column(UUID)
+    # the request data the external call was made with
+    payload = Column(JSONB, nullable=False)
+    error = Column(String)
+    attempts = Column(Integer, default=1, nullable=False)
+    created_time = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    last_attempt_time = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    # set while the dead letter is being replayed, so other replays skip it.
+    # if the replay does not finish, it can be replayed again after that time
+    claimed_until = Column(DateTime(timezone=True))
+
+
+def get_connect_args() -> dict:
+    return {"ssl": config["DB_SSL"]} if config["DB_SSL"] else {}
+
+
 def initialize_db() -> None:
     """
     Initialize the database enigne.
@@ -69,7 +237,7 @@ def initialize_db() -> None:
         pool_size=config.get("DB_POOL_MIN_SIZE", 15),
         max_overflow=config["DB_POOL_MAX_SIZE"] - config["DB_POOL_MIN_SIZE"],
         echo=config["DB_ECHO"],
-        connect_args={"ssl": config["DB_SSL"]} if config["DB_SSL"] else {},
+        connect_args=get_connect_args(),
         pool_pre_ping=True,
     )
 
@@ -79,6 +247,63 @@ def initialize_db() -> None:
     )
 
 
+async def sync_request_status_type() -> None:
+    """
+    Add the ALLOWED_REQUEST_STATUSES that are missing from the
+    `request_status` type, for example statuses added to the configuration
+    after the migration ran, and load the list of statuses the type accepts.
+
+    Runs on startup, with its own connection: the asyncpg connections cache
+    the types they have seen, so they should not be reused after this
+    changes the type. The connection is in autocommit mode, because before
+    Postgres 12, `ALTER TYPE ... ADD VALUE` cannot run in a transaction.
+    """
+    global request_status_values
+    sync_engine = create_async_engine(
+        url=config["DB_URL"],
+        poolclass=NullPool,
+        connect_args=get_connect_args(),
+        isolation_level="AUTOCOMMIT",
+    )
+    try:
+        async with sync_engine.connect() as connection:
+            type_exists = (
+                await connection.execute(
+                    text("SELECT to_regtype('request_status') IS NOT NULL")
+                )
+            ).scalar_one()
+            if not type_exists:
+                raise Exception(
+                    "The 'request_status' type does not exist in the database. Run the database migrations first: `alembic upgrade head`"
+                )
+            request_status_values = (
+                (
+                    await connection.execute(
+                        text("SELECT unnest(enum_range(NULL::request_status))::text")
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            for status in config["ALLOWED_REQUEST_STATUSES"]:
+                if status not in request_status_values:
+                    logger.info(f"Adding status '{status}' to the request_status type")
+                    # `ADD VALUE` does not accept bind parameters
+                    escaped = status.replace("'", "''")
+                    await connection.execute(
+                        text(
+                            f"ALTER TYPE request_status ADD VALUE IF NOT EXISTS '{escaped}'"
+                        )
+                    )
+                    request_status_values.append(status)
+    finally:
+        await sync_engine.dispose()
+
+
+def get_request_status_values() -> list:
+    return request_status_values
+
+
 def get_db_engine_and_sessionmaker() -> tuple[AsyncEngine, async_sessionmaker]:
     """
     Get the db engine and sessionmaker instances.
@@ -89,14 +314,76 @@ def get_db_engine_and_sessionmaker() -> tuple[AsyncEngine, async_sessionmaker]:
     return engine, async_sessionmaker_instance
 
 
+class PoolWaitMetrics:
+    """
+    Time spent waiting for a connection from the pool, in this worker
+    process. Long waits mean the pool is too small for the load, or
+    connections are held for too long.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0
+        self.max_wait = 0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        if wait > 1:
+            logger.warning(f"Waited {wait:.2f}s for a database connection")
+
+    def to_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "average_wait_seconds": (
+                self.total_wait / self.checkouts if self.checkouts else 0
+            ),
+            "max_wait_seconds": self.max_wait,
+        }
+
+
+pool_wait_metrics = PoolWaitMetrics()
+
+
+def get_db_pool_state() -> dict:
+    engine, _ = get_db_engine_and_sessionmaker()
+    return {
+        "size": engine.pool.size(),
+        "checked_out": engine.pool.checkedout(),
+        "overflow": engine.pool.overflow(),
+        **pool_wait_metrics.to_dict(),
+    }
+
+
 async def get_db_session() -> AsyncIterable[AsyncSession]:
     """
     Create an AsyncSession and yield an instance of the Data Access Layer,
     which acts as an abstract interface to manipulate the database.
 
-    Can be injected as a dependency in FastAPI endpoints.
+    Can be injected as a dependency in FastAPI endpoints. The connection is
+    held until the end of the endpoint: endpoints that call Arborist or
+    external systems should use `db_transaction` instead.
+    """
+    async with db_transaction() as session:
+        yield session
+
+
+@asynccontextmanager
+async def db_transaction() -> AsyncIterable[AsyncSession]:
+    """
+    Create an AsyncSession in a transaction, which is committed when the
+    context manager exits.
+
+    Unlike `get_db_session`, whose transaction lasts until the end of the
+    endpoint, this allows endpoints to keep transactions, and the row locks
+    they hold, short: for example, to avoid holding them while calling
+    Arborist or external systems.
     """
     _, async_sessionmaker_instance = get_db_engine_and_sessionmaker()
     async with async_sessionmaker_instance() as session:
         async with session.begin():
+            start = time.monotonic()
+            await session.connection()
+            pool_wait_metrics.record(time.monotonic() - start)
             yield session
@@ -0,0 +1,203 @@
+"""
+Dead-letter store for external calls that still fail after all retries.
+
+Failed calls are saved in the `external_call_dead_letters` table so they can
+be replayed once the external system is back, using `replay_dead_letters.py`.
+This applies to the external call configs with `batch` or `dead_letter`
+enabled. For the other external calls, the status update is reverted
+instead, so there is nothing to replay.
+"""
+
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, insert, or_, select, update
+
+from . import logger
+from .config import config
+from .db import ExternalCallDeadLetter, get_db_engine_and_sessionmaker
+
+
+# max number of seconds a replay can hold the dead letters it claimed. after
+# that, for example if the replay was interrupted, other replays can claim
+# them again
+CLAIM_TIMEOUT = 3600
+
+
+async def record_dead_letters(
+    external_call_id: str, events: list, error: Exception
+) -> None:
+    """
+    Save a failed external call: one dead letter is saved for each of the
+    status updates in the call (a single one, unless the call is batched).
+    This is done in its own transaction, so it is kept even if the
+    request's own transaction is rolled back.
+    """
+    logger.warning(
+        f"Saving {len(events)} failed external call(s) '{external_call_id}' to the dead-letter table"
+    )
+    try:
+        _, async_sessionmaker_instance = get_db_engine_and_sessionmaker()
+        async with async_sessionmaker_instance() as session:
+            async with session.begin():
+                await session.execute(
+                    insert(ExternalCallDeadLetter),
+                    [
+                        {
+                            "external_call_id": external_call_id,
+                            "request_id": data.get("request_id"),
+                            "payload": jsonable_encoder(data),
+                            "error": str(error),
+                        }
+                        for data in events
+                    ],
+                )
+    except Exception:
+        # do not hide the original error
+        logger.error(
+            f"Unable to save failed external call(s) '{external_call_id}' with data {events} to the dead-letter table",
+            exc_info=True,
+        )
+
+
+async def replay_dead_letters(
+    concurrency: int = 5, batch_size: int = 100, external_call_id: str = None
+) -> dict:
+    """
+    Replay the saved failed external calls, oldest first. Calls that succeed
+    are removed from the dead-letter table; calls that fail again are kept,
+    with an updated number of attempts and error. Calls for external call
+    configs with `batch` enabled are replayed in batches.
+
+    Each batch of dead letters is claimed in a short transaction (skipping
+    the rows claimed by other replays) before the calls are made, so
+    several replays can safely run at the same time without holding a
+    transaction open during the calls. The results are saved in another
+    transaction.
+
+    Args:
+        concurrency (int): max number of external calls made at the same time
+        batch_size (int): number of dead letters to claim and replay at once
+        external_call_id (str): if provided, only replay the calls for this
+            external call config
+
+    Returns:
+        dict: number of "replayed" and "failed" calls
+    """
+    # imported here to avoid a circular import
+    from .request_utils import make_batched_external_call, make_external_call
+
+    _, async_sessionmaker_instance = get_db_engine_and_sessionmaker()
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"replayed": 0, "failed": 0}
+
+    async def replay(dead_letters):
+        async with semaphore:
+            try:
+                call_id = dead_letters[0].external_call_id
+                if "batch" in config["EXTERNAL_CALL_CONFIGS"].get(call_id, {}):
+                    await make_batched_external_call(
+                        call_id, [d.payload for d in dead_letters]
+                    )
+                else:
+                    await make_external_call(call_id, dead_letters[0].payload)
+                return dead_letters, None
+            except Exception as e:
+                return dead_letters, e
+
+    last_id = 0
+    while True:
+        async with async_sessionmaker_instance() as session:
+            async with session.begin():
+                now = datetime.now(timezone.utc)
+                claimable = (
+                    select(ExternalCallDeadLetter.id)
+                    .where(ExternalCallDeadLetter.id > last_id)
+                    .where(
+                        or_(
+                            ExternalCallDeadLetter.claimed_until.is_(None),
+                            ExternalCallDeadLetter.claimed_until < now,
+                        )
+                    )
+                    .order_by(ExternalCallDeadLetter.id)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                if external_call_id:
+                    claimable = claimable.where(
+                        ExternalCallDeadLetter.external_call_id == external_call_id
+                    )
+                claimed = await session.execute(
+                    update(ExternalCallDeadLetter)
+                    .where(ExternalCallDeadLetter.id.in_(claimable.scalar_subquery()))
+                    .values(claimed_until=now + timedelta(seconds=CLAIM_TIMEOUT))
+                    .returning(
+                        ExternalCallDeadLetter.id,
+                        ExternalCallDeadLetter.external_call_id,
+                        ExternalCallDeadLetter.payload,
+                    )
+                )
+                # `RETURNING` does not keep the order of the subquery
+                dead_letters = sorted(claimed.all(), key=lambda d: d.id)
+        if not dead_letters:
+            break
+        last_id = dead_letters[-1].id
+
+        results = await asyncio.gather(
+            *(replay(group) for group in group_dead_letters(dead_letters))
+        )
+
+        async with async_sessionmaker_instance() as session:
+            async with session.begin():
+                replayed_ids = [
+                    d.id for group, error in results if error is None for d in group
+                ]
+                if replayed_ids:
+                    await session.execute(
+                        delete(ExternalCallDeadLetter).where(
+                            ExternalCallDeadLetter.id.in_(replayed_ids)
+                        )
+                    )
+                for group, error in results:
+                    if error is None:
+                        continue
+                    await session.execute(
+                        update(ExternalCallDeadLetter)
+                        .where(ExternalCallDeadLetter.id.in_([d.id for d in group]))
+                        .values(
+                            attempts=ExternalCallDeadLetter.attempts + 1,
+                            error=str(error),
+                            last_attempt_time=datetime.now(timezone.utc),
+                            claimed_until=None,
+                        )
+                    )
+        counts["replayed"] += len(replayed_ids)
+        counts["failed"] += len(dead_letters) - len(replayed_ids)
+        logger.info(
+            f"Replayed {counts['replayed']} dead letters so far, {counts['failed']} failed again"
+        )
+
+    return counts
+
+
+def group_dead_letters(dead_letters: list) -> list:
+    """
+    Group the dead letters into the lists of dead letters to replay in a
+    single call: batches of up to `max_size` for external call configs with
+    `batch` enabled, and single dead letters otherwise.
+    """
+    groups = []
+    batches = {}
+    for dead_letter in dead_letters:
+        conf = config["EXTERNAL_CALL_CONFIGS"].get(dead_letter.external_call_id, {})
+        if "batch" not in conf:
+            groups.append([dead_letter])
+            continue
+        batch = batches.get(dead_letter.external_call_id)
+        if not batch or len(batch) >= conf["batch"]["max_size"]:
+            batch = batches[dead_letter.external_call_id] = []
+            groups.append(batch)
+        batch.append(dead_letter)
+    return groups
@@ -0,0 +1,82 @@
+"""
+Expiry of stale draft requests.
+
+Draft requests (DRAFT_STATUSES) that have not been updated for DRAFT_TTL
+seconds are deleted, or updated to DRAFT_EXPIRED_STATUS if it is configured,
+so that abandoned drafts do not pile up in the requests table.
+
+This runs as a periodic task, every DRAFT_SWEEP_INTERVAL seconds. Expired
+drafts are processed DRAFT_SWEEP_BATCH_SIZE at a time, in short
+transactions, and the rows already locked by another worker are skipped, so
+every worker can safely run it.
+"""
+
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select, update
+
+from . import logger
+from .config import config
+from .db import Request as RequestModel, db_transaction
+from .notifications import notify_request_changes
+from .status_history import record_status_changes
+
+
+async def expire_draft_requests() -> int:
+    """
+    Delete or finalize the draft requests that have not been updated for
+    DRAFT_TTL seconds.
+
+    Returns:
+        int: number of expired draft requests
+    """
+    now = datetime.now(timezone.utc)
+    expired = (
+        select(RequestModel.request_id, RequestModel.status)
+        .where(RequestModel.status.in_(config["DRAFT_STATUSES"]))
+        .where(RequestModel.updated_time < now - timedelta(seconds=config["DRAFT_TTL"]))
+        .limit(config["DRAFT_SWEEP_BATCH_SIZE"])
+        .with_for_update(skip_locked=True)
+        .subquery("expired")
+    )
+    expired_status = config["DRAFT_EXPIRED_STATUS"]
+    if expired_status:
+        event = "updated"
+        # the subquery's `status` is the status before the update
+        query = (
+            update(RequestModel)
+            .where(RequestModel.request_id == expired.c.request_id)
+            .values(status=expired_status, updated_time=now)
+            .returning(RequestModel, expired.c.status)
+        )
+    else:
+        event = "deleted"
+        query = (
+            delete(RequestModel)
+            .where(RequestModel.request_id.in_(select(expired.c.request_id)))
+            .returning(RequestModel, RequestModel.status)
+        )
+    query = query.execution_options(synchronize_session=False)
+
+    count = 0
+    while True:
+        async with db_transaction() as db_session:
+            rows = (await db_session.execute(query)).all()
+            requests = [request for request, _ in rows]
+            await notify_request_changes(
+                db_session, event, [request.to_dict() for request in requests]
+            )
+            if expired_status:
+                await record_status_changes(
+                    db_session,
+                    requests,
+                    {request.request_id: old_status for request, old_status in rows},
+                )
+        count += len(rows)
+        if len(rows) < config["DRAFT_SWEEP_BATCH_SIZE"]:
+            break
+
+    action = f"updated to '{expired_status}'" if expired_status else "deleted"
+    logger.info(f"Expired {count} draft requests ({action})")
+    return count
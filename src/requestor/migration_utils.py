@@ -0,0 +1,122 @@
+"""
+Helpers for data migrations on large tables.
+
+Rows are processed in batches, in the order of a unique key column (keyset
+pagination): each batch starts where the previous one ended, so it is
+found with an index range scan, unlike `LIMIT/OFFSET` pagination, which
+scans and discards all the previous rows for every batch. Each batch of
+updates is a single statement instead of one statement per row.
+
+The helpers take the migration's connection (`op.get_bind()`) and log
+their progress.
+"""
+
+
+from typing import Iterator
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+from . import logger
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def get_table(connection: Connection, table_name: str) -> sa.Table:
+    """
+    Reflect the current state of a table, including the changes made
+    earlier in the migration.
+    """
+    return sa.Table(table_name, sa.MetaData(), autoload_with=connection)
+
+
+def estimate_row_count(connection: Connection, table: sa.Table) -> int:
+    """
+    Return the planner's estimate of the number of rows in `table`
+    (`pg_class.reltuples`), which is only as recent as the last `VACUUM` or
+    `ANALYZE`. Return 0 if there is no estimate.
+    """
+    estimate = connection.execute(
+        sa.text("SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+        {"table": table.fullname},
+    ).scalar()
+    return max(int(estimate or 0), 0)
+
+
+def iter_batches(
+    connection: Connection,
+    table: sa.Table,
+    columns: list,
+    key: str = "request_id",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[list]:
+    """
+    Read the rows of `table` in batches of `batch_size` rows, in `key`
+    order. `key` must be a unique column.
+
+    Args:
+        connection (Connection): the migration's connection
+        table (sa.Table): see `get_table`
+        columns (list): names of the columns to select. `key` is always
+            selected, as the first column
+        key (str): name of the unique column to paginate on
+        batch_size (int): number of rows per batch
+
+    Yields:
+        list: the rows of the batch
+    """
+    key_column = table.c[key]
+    # counting the rows would scan the whole table: use the planner's
+    # estimate for the progress logs
+    total = estimate_row_count(connection, table)
+    query = (
+        sa.select(key_column, *(table.c[name] for name in columns if name != key))
+        .order_by(key_column)
+        .limit(batch_size)
+    )
+    done = 0
+    after = None
+    while True:
+        batch_query = query if after is None else query.where(key_column > after)
+        rows = connection.execute(batch_query).all()
+        if not rows:
+            break
+        yield rows
+        done += len(rows)
+        progress = f"{done}/~{total}" if total else str(done)
+        logger.info(f"Migrating '{table.name}': {progress} rows")
+        if len(rows) < batch_size:
+            break
+        after = rows[-1][0]
+
+
+def update_rows(
+    connection: Connection, table: sa.Table, rows: list, key: str = "request_id"
+) -> None:
+    """
+    Update many rows with a single
+    `UPDATE ... FROM (VALUES ...) WHERE table.key = new_values.key`
+    statement. Each value is a bind parameter, so the number of rows times
+    the number of columns should stay under the driver's limit (32767 for
+    asyncpg).
+
+    Args:
+        connection (Connection): the migration's connection
+        table (sa.Table): see `get_table`
+        rows (list): dicts of {column name: new value}, which all include
+            `key` and the same columns
+        key (str): name of the unique column identifying the rows
+    """
+    if not rows:
+        return
+    names = list(rows[0].keys())
+    new_values = sa.values(
+        *(sa.column(name, table.c[name].type) for name in names),
+        name="new_values",
+    ).data([tuple(row[name] for name in names) for row in rows])
+    connection.execute(
+        sa.update(table)
+        .where(table.c[key] == new_values.c[key])
+        .values({name: new_values.c[name] for name in names if name != key})
+    )
@@ -0,0 +1,164 @@
+"""
+Notifications of request changes, using Postgres LISTEN/NOTIFY.
+
+Creating, updating, deleting or archiving a request publishes a
+notification on the `request_changes` channel. The notification is sent in
+the same transaction as the change, so it is only delivered if the change is
+committed, and it reaches every worker process.
+
+Each worker listens to the channel on a single database connection, started
+when the first client subscribes, and fans the notifications out to the
+subscribers whose filters match.
+"""
+
+
+import asyncio
+import json
+
+from pydantic_core import to_json
+from sqlalchemy import ARRAY, Text, bindparam, func, select
+
+from . import logger
+from .db import get_db_engine_and_sessionmaker
+
+
+CHANNEL = "request_changes"
+
+# max number of notifications waiting to be sent to a subscriber. slower
+# subscribers are disconnected
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+async def notify_request_change(db_session, event: str, request: dict) -> None:
+    """
+    Publish a notification for a request change. It is delivered when the
+    session's transaction is committed.
+
+    Args:
+        db_session (AsyncSession)
+        event (str): "created", "updated", "deleted" or "archived"
+        request (dict): the request's data
+    """
+    payload = to_json({"event": event, "request": request}).decode()
+    await db_session.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+async def notify_request_changes(db_session, event: str, requests: list) -> None:
+    """
+    Same as `notify_request_change`, for a list of requests, in a single
+    statement.
+    """
+    if not requests:
+        return
+    payloads = [
+        to_json({"event": event, "request": request}).decode() for request in requests
+    ]
+    payload = func.unnest(
+        bindparam("payloads", payloads, type_=ARRAY(Text))
+    ).column_valued("payload")
+    await db_session.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+class Subscription:
+    def __init__(self, username: str = None, request_id: str = None):
+        self.username = username
+        self.request_id = request_id
+        # notifications, or None when the subscription was closed
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def matches(self, notification: dict) -> bool:
+        request = notification["request"]
+        if self.username and request.get("username") != self.username:
+            return False
+        if self.request_id and request.get("request_id") != self.request_id:
+            return False
+        return True
+
+    def close(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class NotificationHub:
+    def __init__(self):
+        self.subscriptions = set()
+        self._connection = None
+        self._lock = asyncio.Lock()
+
+    async def subscribe(
+        self, username: str = None, request_id: str = None
+    ) -> Subscription:
+        """
+        Subscribe to the changes to a user's requests, to a specific
+        request, or to all requests. Call `unsubscribe` when done.
+        """
+        await self._start()
+        subscription = Subscription(username, request_id)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+    async def _start(self) -> None:
+        async with self._lock:
+            if self._connection:
+                return
+            logger.info(f"Listening to '{CHANNEL}' notifications")
+            engine, _ = get_db_engine_and_sessionmaker()
+            # this connection is used for the whole life of the listener
+            connection = await engine.connect()
+            try:
+                raw_connection = await connection.get_raw_connection()
+                driver_connection = raw_connection.driver_connection
+                await driver_connection.add_listener(CHANNEL, self._on_notification)
+                driver_connection.add_termination_listener(self._on_termination)
+            except Exception:
+                await connection.close()
+                raise
+            self._connection = connection
+
+    async def stop(self) -> None:
+        """
+        Stop listening and close all the subscriptions.
+        """
+        async with self._lock:
+            connection, self._connection = self._connection, None
+            if connection:
+                # do not return the connection to the pool with a listener
+                await connection.invalidate()
+                await connection.close()
+            self._close_subscriptions()
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        notification = json.loads(payload)
+        for subscription in list(self.subscriptions):
+            if not subscription.matches(notification):
+                continue
+            try:
+                subscription.queue.put_nowait(notification)
+            except asyncio.QueueFull:
+                logger.warning(
+                    f"Closing subscription to '{CHANNEL}' notifications: too many notifications waiting"
+                )
+                self.unsubscribe(subscription)
+                subscription.close()
+
+    def _on_termination(self, connection) -> None:
+        if not self._connection:
+            # stopped
+            return
+        # the subscribers will reconnect, which starts a new listener
+        logger.warning(f"Lost the connection listening to '{CHANNEL}' notifications")
+        self._connection = None
+        self._close_subscriptions()
+
+    def _close_subscriptions(self) -> None:
+        subscriptions = list(self.subscriptions)
+        self.subscriptions.clear()
+        for subscription in subscriptions:
+            subscription.close()
+
+
+hub = NotificationHub()
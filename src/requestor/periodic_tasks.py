@@ -0,0 +1,79 @@
+"""
+Background maintenance tasks, such as the expiry of draft requests, which
+run periodically in the app's event loop. They are started and stopped with
+the app.
+"""
+
+
+import asyncio
+
+from . import logger
+from .archive import archive_final_requests
+from .config import config
+from .draft_expiry import expire_draft_requests
+
+
+class PeriodicTask:
+    def __init__(self, name: str, func, interval: float):
+        """
+        Args:
+            name (str): name of the task, for logging
+            func (async callable): function to call every `interval` seconds
+            interval (float): number of seconds between calls
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.task = None
+
+    def start(self) -> None:
+        logger.info(f"Starting periodic task: {self.name}")
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.func()
+            except Exception as e:
+                logger.error(f"Periodic task '{self.name}' failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+_tasks = []
+
+
+def start_periodic_tasks() -> None:
+    if config["DRAFT_TTL"]:
+        _tasks.append(
+            PeriodicTask(
+                "draft requests expiry",
+                expire_draft_requests,
+                config["DRAFT_SWEEP_INTERVAL"],
+            )
+        )
+    if config["ARCHIVE_AFTER"]:
+        _tasks.append(
+            PeriodicTask(
+                "final requests archival",
+                archive_final_requests,
+                config["ARCHIVE_INTERVAL"],
+            )
+        )
+    for task in _tasks:
+        task.start()
+
+
+async def stop_periodic_tasks() -> None:
+    tasks = list(_tasks)
+    _tasks.clear()
+    for task in tasks:
+        await task.stop()
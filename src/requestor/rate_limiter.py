@@ -0,0 +1,188 @@
+"""
+Per-destination concurrency and rate limits for external calls.
+
+Each destination host gets a limiter which bounds the number of calls in
+flight and the number of calls started per second. Calls over the limits
+wait in line for up to MAX_QUEUE_WAIT seconds, after which they fail.
+
+Calls wait for their turn in the event loop, before the blocking call is
+handed off to a worker thread, so that waiting calls do not hold worker
+threads.
+
+The state is kept in memory, so the limits apply per worker process.
+"""
+
+
+import asyncio
+from contextlib import asynccontextmanager
+import threading
+import time
+
+from . import logger
+from .circuit_breaker import get_destination
+from .config import config
+
+
+class RateLimitExceededError(Exception):
+    pass
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        destination: str,
+        max_concurrency: int = 0,
+        max_calls_per_second: float = 0,
+        burst: int = 1,
+        max_queue_wait: float = 30,
+    ):
+        """
+        Args:
+            destination (str): host the calls are made to
+            max_concurrency (int): max number of calls in flight; 0 means no limit
+            max_calls_per_second (float): max number of calls started per
+                second; 0 means no limit
+            burst (int): number of calls that can be started at once, above
+                the per-second rate
+            max_queue_wait (float): max number of seconds a call can wait for
+                its turn before failing
+        """
+        self.destination = destination
+        self.max_concurrency = max_concurrency
+        self.max_calls_per_second = max_calls_per_second
+        self.burst = burst
+        self.max_queue_wait = max_queue_wait
+        self._semaphore = (
+            asyncio.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        )
+        # "theoretical arrival time" of the next call, for the rate limit
+        self._next_call_time = 0
+
+        # metrics
+        self.in_flight = 0
+        self.queued = 0
+        self.total_calls = 0
+        self.rejected_calls = 0
+        self.total_queue_wait = 0
+        self.max_observed_queue_wait = 0
+
+    def _reserve_rate_limit_slot(self, timeout: float) -> float:
+        """
+        Reserve the next slot allowed by the rate limit and return the number
+        of seconds to wait until then.
+        """
+        interval = 1 / self.max_calls_per_second
+        now = time.monotonic()
+        next_call_time = max(self._next_call_time, now)
+        wait = next_call_time - (self.burst - 1) * interval - now
+        if wait > timeout:
+            raise RateLimitExceededError(
+                f"Rate limit for '{self.destination}' exceeded: would need to wait {wait:.2f}s"
+            )
+        self._next_call_time = next_call_time + interval
+        return max(0, wait)
+
+    @asynccontextmanager
+    async def limit(self):
+        """
+        Wait until the limits allow a new call to the destination, then
+        keep track of the call until it is done.
+
+        The limiter is only used from the event loop, so its state does not
+        need a lock.
+        """
+        start = time.monotonic()
+        self.queued += 1
+        acquired = False
+        try:
+            if self._semaphore:
+                try:
+                    await asyncio.wait_for(
+                        self._semaphore.acquire(), self.max_queue_wait
+                    )
+                except asyncio.TimeoutError:
+                    raise RateLimitExceededError(
+                        f"Concurrency limit for '{self.destination}' exceeded: waited {self.max_queue_wait}s"
+                    )
+                acquired = True
+            if self.max_calls_per_second:
+                remaining = self.max_queue_wait - (time.monotonic() - start)
+                wait = self._reserve_rate_limit_slot(remaining)
+                if wait:
+                    await asyncio.sleep(wait)
+        except BaseException as e:
+            # also release the slot if the waiting call is cancelled
+            if acquired:
+                self._semaphore.release()
+            self.queued -= 1
+            if isinstance(e, RateLimitExceededError):
+                self.rejected_calls += 1
+                logger.error(str(e))
+            raise
+
+        queue_wait = time.monotonic() - start
+        self.queued -= 1
+        self.in_flight += 1
+        self.total_calls += 1
+        self.total_queue_wait += queue_wait
+        self.max_observed_queue_wait = max(self.max_observed_queue_wait, queue_wait)
+        if queue_wait > 1:
+            logger.warning(
+                f"Call to '{self.destination}' waited {queue_wait:.2f}s for its turn"
+            )
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self._semaphore:
+                self._semaphore.release()
+
+    def to_dict(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_calls_per_second": self.max_calls_per_second,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "total_calls": self.total_calls,
+            "rejected_calls": self.rejected_calls,
+            "average_queue_wait_seconds": (
+                self.total_queue_wait / self.total_calls if self.total_calls else 0
+            ),
+            "max_queue_wait_seconds": self.max_observed_queue_wait,
+        }
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(url: str) -> RateLimiter:
+    """
+    Get the rate limiter for the host the specified URL points to.
+    """
+    destination = get_destination(url)
+    with _rate_limiters_lock:
+        if destination not in _rate_limiters:
+            conf = {
+                **config["EXTERNAL_CALL_LIMITS"]["DEFAULT"],
+                **config["EXTERNAL_CALL_LIMITS"]["DESTINATIONS"].get(destination, {}),
+            }
+            _rate_limiters[destination] = RateLimiter(
+                destination,
+                max_concurrency=conf["MAX_CONCURRENCY"],
+                max_calls_per_second=conf["MAX_CALLS_PER_SECOND"],
+                burst=conf["BURST"],
+                max_queue_wait=conf["MAX_QUEUE_WAIT"],
+            )
+        return _rate_limiters[destination]
+
+
+def get_rate_limiters_state() -> dict:
+    with _rate_limiters_lock:
+        limiters = list(_rate_limiters.values())
+    return {limiter.destination: limiter.to_dict() for limiter in limiters}
+
+
+def reset_rate_limiters() -> None:
+    with _rate_limiters_lock:
+        _rate_limiters.clear()
@@ -1,25 +1,36 @@
+import asyncio
+from fastapi.encoders import jsonable_encoder
 import requests
-import time
+from starlette.concurrency import run_in_threadpool
 from typing import Tuple
 from urllib.parse import urlparse, urlencode, parse_qsl
 
 from . import logger
 from .arborist import is_path_prefix_of_path
+from .batching import get_batcher
+from .circuit_breaker import CircuitOpenError, get_circuit_breaker
 from .config import config
+from .dead_letters import record_dead_letters
+from .rate_limiter import RateLimitExceededError, get_rate_limiter
 
 
 def retry_wrapper(func):
-    def retry_logic(*args, **kwargs):
+    async def retry_logic(*args, **kwargs):
         max_retries = kwargs.get("max_retries", config["DEFAULT_MAX_RETRIES"])
         retries = 0
         sleep_sec = 0.1
         while retries < max_retries:
             if retries != 0:
-                time.sleep(sleep_sec)
+                await asyncio.sleep(sleep_sec)
                 sleep_sec *= 2
             try:
-                res = func(*args, **kwargs)
+                res = await func(*args, **kwargs)
                 return res
+            except (CircuitOpenError, RateLimitExceededError) as e:
+                # the destination is down or overloaded: fail fast instead of
+                # retrying
+                logger.error(f"  {e}. Not retrying.")
+                raise
             except Exception as e:
                 logger.error(f"  Exception {e}. Retrying...")
                 retries += 1
@@ -29,11 +40,24 @@ def retry_wrapper(func):
     return retry_logic
 
 
-def post_status_update(status: str, data: dict, resource_paths: list) -> str:
+async def post_status_update(status: str, data: dict, resource_paths: list) -> str:
     """
     Handle actions after a successful status update.
+
+    External calls may wait for their turn if the destination's limits are
+    reached, then the blocking call is made in a worker thread.
+    External calls that still fail after all retries raise an error: the
+    caller then reverts the status update. If `dead_letter` is enabled for
+    the external call config, the call is saved to the dead-letter table
+    instead, and the status update is kept.
+
+    External calls configured with `batch` are queued and sent later, in
+    batches, so failures do not affect the status update. They are only
+    queued once all the other actions succeeded, so that updates which end
+    up being reverted are not sent.
     """
     redirects = []
+    batched_calls = []
     for resource_prefix, status_actions in config["ACTION_ON_UPDATE"].items():
         for resource_path in resource_paths:
             if (
@@ -44,9 +68,23 @@ def post_status_update(status: str, data: dict, resource_paths: list) -> str:
                 for redirect_action in actions.get("redirect_configs", []):
                     redirects.append((redirect_action, data))
                 for external_call_action in actions.get("external_call_configs", []):
-                    make_external_call(external_call_action, data)
+                    batcher = get_batcher(external_call_action)
+                    if batcher:
+                        batched_calls.append(batcher)
+                        continue
+                    try:
+                        await make_external_call(external_call_action, data)
+                    except Exception as e:
+                        conf = config["EXTERNAL_CALL_CONFIGS"][external_call_action]
+                        if not conf.get("dead_letter"):
+                            raise
+                        logger.error(
+                            f"External call '{external_call_action}' failed, not reverting the status update: {e}"
+                        )
+                        await record_dead_letters(external_call_action, [data], e)
                 break  # So that we only do the action once, even if more than 1 resource_path matches
 
+    redirect_url = ""
     if redirects:
         # assume there is only one redirect config. There could be more if
         # more than one action has a resource_path matching the current policy
@@ -54,10 +92,12 @@ def post_status_update(status: str, data: dict, resource_paths: list) -> str:
             logger.debug(
                 f"More than one redirect actions found; will use the first one: {redirects}"
             )
-        (redirect_action, data) = redirects[0]
-        return get_redirect_url(redirect_action, data)
-    else:
-        return ""
+        (redirect_action, redirect_data) = redirects[0]
+        redirect_url = get_redirect_url(redirect_action, redirect_data)
+
+    for batcher in batched_calls:
+        batcher.add(data)
+    return redirect_url
 
 
 def get_redirect_url(action_id: str, data: dict) -> str:
@@ -107,38 +147,82 @@ def get_credentials(creds_id: str) -> Tuple[str, str]:
     return "", ""  # this should never happen; the config validation checks `type`
 
 
-@retry_wrapper
-def make_external_call(external_call_id: str, data: dict) -> None:
-    conf = config["EXTERNAL_CALL_CONFIGS"][external_call_id]
-    # TODO use `httpx` instead of `requests` to make async call
-    requests_func = getattr(requests, conf["method"].lower())
-    form_data = {
+def get_form_data(conf: dict, data: dict) -> dict:
+    return {
         e["name"]: data[e["param"]]
         for e in conf.get("form", [])
         if data.get(e["param"])
     } or None
 
-    headers = {}
-    if "creds" in conf:
-        creds_type, creds = get_credentials(conf["creds"])
-        if creds_type == "client_credentials":
-            headers["authorization"] = f"bearer {creds}"
 
+@retry_wrapper
+async def make_external_call(external_call_id: str, data: dict) -> None:
+    conf = config["EXTERNAL_CALL_CONFIGS"][external_call_id]
+    form_data = get_form_data(conf, data)
     logger.info(f"Making call to '{conf['url']}' with data: {form_data}")
-    response = requests_func(
-        conf["url"],
-        data=form_data,
-        headers=headers,
+    if "batch" in conf:
+        # the external system expects batches: send a batch of 1
+        await call_external_system(
+            conf, json=jsonable_encoder({"events": [form_data or {}]})
+        )
+    else:
+        await call_external_system(conf, data=form_data)
+
+
+@retry_wrapper
+async def make_batched_external_call(external_call_id: str, events: list) -> None:
+    """
+    Send the data for several status updates in a single call, as a JSON
+    body: `{"events": [<form data>, ...]}`.
+    """
+    conf = config["EXTERNAL_CALL_CONFIGS"][external_call_id]
+    payload = jsonable_encoder(
+        {"events": [get_form_data(conf, data) or {} for data in events]}
     )
+    logger.info(f"Making call to '{conf['url']}' with {len(events)} events")
+    await call_external_system(conf, json=payload)
 
+
+async def call_external_system(conf: dict, **request_kwargs) -> None:
+    # wait for our turn if the destination's concurrency or rate limit is
+    # reached. This is done in the event loop, so that the calls waiting
+    # for their turn do not hold worker threads
+    async with get_rate_limiter(conf["url"]).limit():
+        await run_in_threadpool(send_external_call, conf, **request_kwargs)
+
+
+def send_external_call(conf: dict, **request_kwargs) -> None:
+    # TODO use `httpx` instead of `requests` to make async call
+    requests_func = getattr(requests, conf["method"].lower())
+
+    # fail fast if the destination is known to be down
+    circuit_breaker = get_circuit_breaker(conf["url"])
+    circuit_breaker.before_call()
     try:
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as e:
-        response_txt = response.text
+        headers = {}
+        if "creds" in conf:
+            creds_type, creds = get_credentials(conf["creds"])
+            if creds_type == "client_credentials":
+                headers["authorization"] = f"bearer {creds}"
+
+        response = requests_func(
+            conf["url"],
+            **request_kwargs,
+            headers=headers,
+        )
+
         try:
-            response_txt = response.json()
-        except Exception:
-            pass
-        logger.error(f"Error making external call: {e} - {response_txt}")
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            response_txt = response.text
+            try:
+                response_txt = response.json()
+            except Exception:
+                pass
+            logger.error(f"Error making external call: {e} - {response_txt}")
+            raise
+    except Exception:
+        circuit_breaker.record_failure()
         raise
+    circuit_breaker.record_success()
     logger.debug(f"Response: {response.status_code} {response.json()}")
@@ -1,16 +1,19 @@
+import asyncio
 import uuid
+from collections import defaultdict
 
 from datetime import datetime, timezone
 from fastapi import APIRouter, Body, Depends, FastAPI, HTTPException
 from pydantic import BaseModel
-from sqlalchemy import delete, insert, select
+from sqlalchemy import column, delete, literal, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.asyncio.session import AsyncSession
 from starlette.requests import Request
 from starlette.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
     HTTP_400_BAD_REQUEST,
+    HTTP_403_FORBIDDEN,
     HTTP_404_NOT_FOUND,
     HTTP_409_CONFLICT,
     HTTP_500_INTERNAL_SERVER_ERROR,
@@ -18,14 +21,33 @@ from starlette.status import (
 import traceback
 
 from .. import logger, arborist
+from ..archive import get_request_or_archived_request
 from ..auth import Auth
 from ..config import config
-from ..db import Request as RequestModel, get_db_session
+from ..db import Request as RequestModel, RequestArchive, db_transaction
+from ..notifications import notify_request_change, notify_request_changes
+from ..request_ids import new_request_id
 from ..request_utils import post_status_update
+from ..status_history import record_status_changes
+from .query import (
+    NON_FILTER_PARAMS,
+    apply_request_filters,
+    populate_filters_from_query_params,
+)
 
 
 router = APIRouter()
 
+# max number of requests per bulk operation
+BULK_MAX_REQUESTS = 1000
+
+# max number of requests deleted per transaction by filter-based deletions
+DELETE_BATCH_SIZE = 500
+
+# max number of requests for which Arborist and external calls are made
+# concurrently during bulk operations
+BULK_CONCURRENCY = 10
+
 
 class CreateRequestInput(BaseModel):
     """
@@ -65,12 +87,201 @@ async def grant_or_revoke_arborist_policy(arborist_client, policy_id, username,
         )
 
 
+def get_create_request_data(body: CreateRequestInput) -> dict:
+    """
+    Validate a `CreateRequestInput` and return its data, with
+    "resource_paths" set if "resource_path" is provided.
+    """
+    data = body.dict()
+
+    # cast resource_path as list if resource_paths is not present
+    if data.get("resource_path") and not data.get("resource_paths"):
+        data["resource_paths"] = [data["resource_path"]]
+
+    # error (if we have both policy_id and resource_paths)
+    # OR (if we have neither)
+    if bool(data.get("policy_id")) == bool(data.get("resource_paths")):
+        msg = f"The request must have either resource_path(s) or a policy_id."
+        log_and_raise_400_error(logger, msg, body)
+
+    # error if we have both role_ids and policy_id
+    if data.get("role_ids") and data.get("policy_id"):
+        msg = f"The request cannot have both role_ids and policy_id."
+        log_and_raise_400_error(logger, msg, body)
+
+    allowed_statuses = config["ALLOWED_REQUEST_STATUSES"]
+    if data.get("status") and data["status"] not in allowed_statuses:
+        msg = f"Status '{data['status']}' is not an allowed request status ({allowed_statuses})"
+        log_and_raise_400_error(logger, msg, body)
+
+    return data
+
+
+def get_revoke_param(api_request: Request) -> bool:
+    if "revoke" not in api_request.query_params:
+        return False
+    if api_request.query_params["revoke"]:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            f"The 'revoke' parameter should not be assigned a value. Received '{api_request.query_params['revoke']}'",
+        )
+    return True
+
+
+def get_create_requests_query(rows: list[dict]):
+    """
+    Users can only request access to a resource once: there can only be 1
+    request for each (username, policy_id, revoke) for which the status is
+    not in FINAL_STATUSES (enforced by a partial unique index). In a single
+    statement, insert each new request, or get the existing request if it
+    is a draft (its status is not changed, but its `updated_time` is, since
+    it is requested again), or get nothing if it is not.
+
+    The rows must not contain the same (username, policy_id, revoke) more
+    than once.
+    """
+    query = pg_insert(RequestModel).values(rows)
+    return query.on_conflict_do_update(
+        index_elements=[
+            RequestModel.username,
+            RequestModel.policy_id,
+            RequestModel.revoke,
+        ],
+        # the statuses must be rendered as literals for Postgres to match the
+        # index's predicate
+        index_where=RequestModel.status.notin_(
+            [literal(s, literal_execute=True) for s in config["FINAL_STATUSES"]]
+        ),
+        set_={"updated_time": query.excluded.updated_time},
+        where=RequestModel.status.in_(config["DRAFT_STATUSES"]),
+    ).returning(RequestModel)
+
+
+async def insert_requests(db_session, rows: list[dict]) -> list[RequestModel]:
+    """
+    Insert new requests, or reuse the existing draft requests, as described
+    in `get_create_requests_query`. Returns the inserted and reused
+    requests; nothing is returned for the rows that conflict with an open
+    request.
+
+    The partial unique index only covers the requests that are not in
+    FINAL_STATUSES, so new requests in FINAL_STATUSES never conflict with
+    it: their open requests are looked up (and locked) explicitly first.
+    """
+    requests = []
+    final_keys = {
+        (row["username"], row["policy_id"], row.get("revoke", False))
+        for row in rows
+        if row["status"] in config["FINAL_STATUSES"]
+    }
+    if final_keys:
+        query = (
+            select(RequestModel)
+            .where(
+                tuple_(
+                    RequestModel.username, RequestModel.policy_id, RequestModel.revoke
+                ).in_(list(final_keys))
+            )
+            .where(RequestModel.status.notin_(config["FINAL_STATUSES"]))
+            .with_for_update()
+        )
+        open_requests = (await db_session.scalars(query)).all()
+        open_keys = {(r.username, r.policy_id, r.revoke) for r in open_requests}
+        for request in open_requests:
+            if request.status in config["DRAFT_STATUSES"]:
+                request.updated_time = datetime.now(timezone.utc)
+                requests.append(request)
+        rows = [
+            row
+            for row in rows
+            if (row["username"], row["policy_id"], row.get("revoke", False))
+            not in open_keys
+        ]
+    if rows:
+        requests.extend(
+            (await db_session.scalars(get_create_requests_query(rows))).all()
+        )
+    return requests
+
+
+async def record_reused_requests(db_session, requests: list[RequestModel]) -> None:
+    """
+    Reusing a draft request triggers its actions again without changing its
+    status: like a status update to the same status, it is notified and
+    recorded in the status history.
+    """
+    await notify_request_changes(
+        db_session, "updated", [request.to_dict() for request in requests]
+    )
+    await record_status_changes(
+        db_session, requests, {r.request_id: r.status for r in requests}
+    )
+
+
+async def apply_new_request_status(
+    arborist_client, request: RequestModel, is_new_request: bool, resource_paths: list
+) -> str:
+    """
+    Grant or revoke access if the new request's status is one of the
+    UPDATE_ACCESS_STATUSES, and run the post-status-update actions. If
+    anything fails, the changes are reverted and an HTTPException is raised.
+
+    Returns the redirect URL, if any.
+    """
+    access_updated = False
+    try:
+        if request.status in config["UPDATE_ACCESS_STATUSES"]:
+            # the access request is approved: grant/revoke access
+            action = "revoke" if request.revoke else "grant"
+            logger.debug(
+                f"Status '{request.status}' is one of UPDATE_ACCESS_STATUSES {config['UPDATE_ACCESS_STATUSES']}, attempting to {action} access in Arborist"
+            )
+            await grant_or_revoke_arborist_policy(
+                arborist_client,
+                request.policy_id,
+                request.username,
+                request.revoke,
+            )
+            access_updated = True
+
+        return await post_status_update(
+            request.status, request.to_dict(), resource_paths
+        )
+    except Exception as e:  # if access updates, external calls or other actions fail: revert
+        logger.error("Something went wrong during post-status-update actions")
+        if is_new_request:
+            logger.warning(
+                f"Deleting the request that was just created ({request.request_id})"
+            )
+            async with db_transaction() as db_session:
+                await db_session.execute(
+                    delete(RequestModel).where(
+                        RequestModel.request_id == request.request_id
+                    )
+                )
+                await notify_request_change(db_session, "deleted", request.to_dict())
+        if access_updated:
+            logger.warning(f"Reverting the previous access {action} action")
+            await grant_or_revoke_arborist_policy(
+                arborist_client,
+                request.policy_id,
+                request.username,
+                not request.revoke,  # revert the access we just granted or revoked
+            )
+        if isinstance(e, HTTPException):
+            raise
+        traceback.print_exc()
+        raise HTTPException(
+            HTTP_500_INTERNAL_SERVER_ERROR,
+            "Something went wrong during post-status-update actions",
+        )
+
+
 @router.post("/request", status_code=HTTP_201_CREATED)
 async def create_request(
     api_request: Request,
     body: CreateRequestInput,
     auth=Depends(Auth),
-    db_session: AsyncSession = Depends(get_db_session),
 ) -> dict:
     """
     Create a new access request.
@@ -91,27 +302,15 @@ async def create_request(
       * resource_path(s) + existing role_ids
       * resource_path(s) without a role_id (a default reader role is assigned)
 
+    The request is saved before access is granted or revoked. If the service
+    stops in between, updating the request to its current status with
+    `PUT /request/{request_id}` grants or revokes access again.
     """
-    data = body.dict()
-    request_id = str(uuid.uuid4())
+    request_id = new_request_id()
     logger.info(
-        f"Creating request. request_id: {request_id}. Received body: {data}. Revoke: {'revoke' in api_request.query_params}"
+        f"Creating request. request_id: {request_id}. Received body: {body.dict()}. Revoke: {'revoke' in api_request.query_params}"
     )
-
-    # cast resource_path as list if resource_paths is not present
-    if data.get("resource_path") and not data.get("resource_paths"):
-        data["resource_paths"] = [data["resource_path"]]
-
-    # error (if we have both policy_id and resource_paths)
-    # OR (if we have neither)
-    if bool(data.get("policy_id")) == bool(data.get("resource_paths")):
-        msg = f"The request must have either resource_path(s) or a policy_id."
-        log_and_raise_400_error(logger, msg, body)
-
-    # error if we have both role_ids and policy_id
-    if data.get("role_ids") and data.get("policy_id"):
-        msg = f"The request cannot have both role_ids and policy_id."
-        log_and_raise_400_error(logger, msg, body)
+    data = get_create_request_data(body)
 
     resource_paths = None
     client = api_request.app.arborist_client
@@ -160,22 +359,9 @@ async def create_request(
 
     if not data.get("username"):
         logger.debug("No username provided in body, using token username")
-        token_claims = await auth.get_token_claims()
-        token_username = token_claims.get("context", {}).get("user", {}).get("name")
-        if not token_username:
-            raise HTTPException(
-                HTTP_400_BAD_REQUEST,
-                "Must provide a username in the request body or token",
-            )
-        logger.debug(f"Got username from token: {token_username}")
-        data["username"] = token_username
+        data["username"] = await get_token_username(auth)
 
-    if "revoke" in api_request.query_params:
-        if api_request.query_params["revoke"]:
-            raise HTTPException(
-                HTTP_400_BAD_REQUEST,
-                f"The 'revoke' parameter should not be assigned a value. Received '{api_request.query_params['revoke']}'",
-            )
+    if get_revoke_param(api_request):
         if data.get("resource_path"):
             # no technical reason for this; it's just not implemented/tested
             raise HTTPException(
@@ -193,112 +379,600 @@ async def create_request(
                 f"Unable to revoke access: '{data['username']}' does not have access to policy '{data['policy_id']}'",
             )
 
-    # get requests for this (username, policy_id) for which the status is
-    # not in FINAL_STATUSES. users can only request access to a resource once.
-    query = (
-        select(RequestModel)
-        .where(
-            RequestModel.username == data["username"],
-        )
-        .where(
-            RequestModel.policy_id == data["policy_id"],
-        )
-        .where(
-            RequestModel.revoke == data.get("revoke", False),
-        )
-        .where(
-            RequestModel.status.notin_(config["FINAL_STATUSES"]),
-        )
-    )
-    result = await db_session.execute(query)
-    previous_requests = list(result.scalars().all())
-    draft_previous_requests = [
-        r for r in previous_requests if r.status in config["DRAFT_STATUSES"]
-    ]
+    # remove any fields that are not stored in requests table
+    [data.pop(key) for key in ["resource_path", "resource_paths", "role_ids"]]
+
+    data = {"request_id": request_id, **data}
+    # the request is committed right away, so that no database connection is
+    # held while calling Arborist and external systems
+    try:
+        async with db_transaction() as db_session:
+            requests = await insert_requests(db_session, [data])
+            request = requests[0] if requests else None
+            is_new_request = bool(request) and str(request.request_id) == request_id
+            if is_new_request:
+                await notify_request_change(db_session, "created", request.to_dict())
+                await record_status_changes(db_session, [request])
+            elif request:
+                await record_reused_requests(db_session, [request])
+    except IntegrityError as e:
+        # TODO: a better user experience would be to retry instead of returning a 4XX error
+        if "asyncpg.exceptions.UniqueViolationError" in str(e):
+            raise HTTPException(
+                HTTP_409_CONFLICT,
+                "request_id already exists. Please try again",
+            )
+        raise
 
-    if previous_requests and not draft_previous_requests:
+    if not request:
         # a request for this (username, resource_path) already exists
         msg = f'An open access request for username \'{data["username"]}\' and policy_id \'{data["policy_id"]}\' already exists. Users can only request access to a resource once.'
-        logger.error(
-            msg
-            + f" body: {data}. existing requests: {[r.request_id for r in previous_requests]}",
-            exc_info=True,
-        )
+        logger.error(msg + f" body: {data}.", exc_info=True)
         raise HTTPException(
             HTTP_409_CONFLICT,
             msg,
         )
 
-    # remove any fields that are not stored in requests table
-    [data.pop(key) for key in ["resource_path", "resource_paths", "role_ids"]]
-
-    if draft_previous_requests:
+    if not is_new_request:
         # reuse the draft request
-        logger.debug(
-            f"Found a draft request with request_id: {draft_previous_requests[0].request_id}"
+        logger.debug(f"Found a draft request with request_id: {request.request_id}")
+
+    redirect_url = await apply_new_request_status(
+        client, request, is_new_request, resource_paths
+    )
+
+    # CORS limits redirections, so we redirect on the client side
+    if redirect_url:
+        request.redirect_url = redirect_url
+
+    return request.to_dict()
+
+
+@router.post("/request/bulk", status_code=HTTP_200_OK)
+async def create_requests(
+    api_request: Request,
+    body: list[CreateRequestInput],
+    auth=Depends(Auth),
+) -> list:
+    """
+    Create up to BULK_MAX_REQUESTS access requests at once. Each request is
+    created as with `POST /request`, and the "revoke" query parameter
+    applies to all of them.
+
+    Arborist policies and roles are listed once, authorization is checked
+    once per distinct set of resource paths and all the requests are
+    inserted in a single statement.
+
+    Returns one result per request, in the same order: either
+    `{"status_code": 201, "request": {...}}` or
+    `{"status_code": <error code>, "detail": <error message>}`.
+    """
+    logger.info(f"Creating {len(body)} requests in bulk")
+    if len(body) > BULK_MAX_REQUESTS:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            f"Cannot create more than {BULK_MAX_REQUESTS} requests at once",
         )
-        request = draft_previous_requests[0]
-    else:
-        # create a new request
-        data = {"request_id": request_id, **data}
+    revoke = get_revoke_param(api_request)
+    client = api_request.app.arborist_client
+
+    results = [None] * len(body)
+
+    def set_error(i: int, status_code: int, detail: str) -> None:
+        results[i] = {"status_code": status_code, "detail": detail}
+
+    items = {}  # {index: request data}
+    for i, item in enumerate(body):
         try:
-            request = (
-                await db_session.scalars(
-                    insert(RequestModel).values(**data).returning(RequestModel)
+            data = get_create_request_data(item)
+        except HTTPException as e:
+            set_error(i, e.status_code, e.detail)
+            continue
+        if revoke and data.get("resource_path"):
+            set_error(
+                i,
+                HTTP_400_BAD_REQUEST,
+                f"The 'revoke' parameter is not compatible with the 'resource_path' body field",
+            )
+            continue
+        items[i] = data
+
+    # list the existing policies and roles once for all the requests
+    existing_policies = []
+    if any(data["policy_id"] for data in items.values()):
+        existing_policies = (await arborist.list_policies(client, expand=True))[
+            "policies"
+        ]
+    existing_role_ids = set()
+    if any(data.get("role_ids") for data in items.values()):
+        existing_roles = await arborist.list_roles(client)
+        existing_role_ids = {item["id"] for item in existing_roles["roles"]}
+
+    resource_paths = {}  # {index: resource paths}
+    for i, data in list(items.items()):
+        if data["policy_id"]:
+            if not arborist.get_policy_for_id(existing_policies, data["policy_id"]):
+                set_error(
+                    i,
+                    HTTP_400_BAD_REQUEST,
+                    f"Request creation failed. The policy '{data['policy_id']}' does not exist.",
                 )
-            ).one()
-        except IntegrityError as e:
-            # TODO: a better user experience would be to retry instead of returning a 4XX error
-            if "asyncpg.exceptions.UniqueViolationError" in str(e):
-                raise HTTPException(
-                    HTTP_409_CONFLICT,
-                    "request_id already exists. Please try again",
+                del items[i]
+                continue
+            resource_paths[i] = arborist.get_resource_paths_for_policy(
+                existing_policies, data["policy_id"]
+            )
+        else:
+            roles_not_found = list(set(data.get("role_ids") or []) - existing_role_ids)
+            if roles_not_found:
+                set_error(
+                    i,
+                    HTTP_400_BAD_REQUEST,
+                    f"Request creation failed. The roles {roles_not_found} do not exist.",
                 )
-            raise
+                del items[i]
+                continue
+            resource_paths[i] = data["resource_paths"]
+
+    # check authz once per distinct set of resource paths
+    resource_sets = list({tuple(sorted(resource_paths[i])) for i in items})
+    authorized = await asyncio.gather(
+        *(auth.authorize("create", list(s), throw=False) for s in resource_sets)
+    )
+    authorized_sets = {s for s, ok in zip(resource_sets, authorized) if ok}
+    for i in list(items):
+        if tuple(sorted(resource_paths[i])) not in authorized_sets:
+            set_error(i, HTTP_403_FORBIDDEN, "Permission denied")
+            del items[i]
+
+    # create the policies _after_ checking authz so we don't allow
+    # unauthorized users to create resources and policies. Each distinct
+    # policy is only created once
+    created_policies = {}  # {(resource paths, role ids): policy_id}
+    for i, data in items.items():
+        if data["policy_id"]:
+            continue
+        key = (tuple(data["resource_paths"]), tuple(data.get("role_ids") or []))
+        if key not in created_policies:
+            created_policies[key] = await arborist.create_arborist_policy(
+                arborist_client=client,
+                resource_paths=data["resource_paths"],
+                role_ids=data["role_ids"],
+            )
+        data["policy_id"] = created_policies[key]
 
-    if request.status in config["UPDATE_ACCESS_STATUSES"]:
-        # the access request is approved: grant/revoke access
-        action = "revoke" if request.revoke else "grant"
-        logger.debug(
-            f"Status '{request.status}' is one of UPDATE_ACCESS_STATUSES {config['UPDATE_ACCESS_STATUSES']}, attempting to {action} access in Arborist"
+    token_username = None
+    for i, data in list(items.items()):
+        if not data.get("username"):
+            try:
+                token_username = token_username or await get_token_username(auth)
+            except HTTPException as e:
+                set_error(i, e.status_code, e.detail)
+                del items[i]
+                continue
+            data["username"] = token_username
+        if not data.get("status"):
+            data["status"] = config["DEFAULT_INITIAL_STATUS"]
+        data["revoke"] = revoke
+
+    if revoke:
+        # check if the users have the policies we want to revoke
+        user_policies = list({(d["username"], d["policy_id"]) for d in items.values()})
+        has_policy = await asyncio.gather(
+            *(
+                arborist.user_has_policy(client, username, policy_id)
+                for username, policy_id in user_policies
+            )
+        )
+        existing_user_policies = {
+            p for p, exists in zip(user_policies, has_policy) if exists
+        }
+        for i, data in list(items.items()):
+            if (data["username"], data["policy_id"]) not in existing_user_policies:
+                set_error(
+                    i,
+                    HTTP_400_BAD_REQUEST,
+                    f"Unable to revoke access: '{data['username']}' does not have access to policy '{data['policy_id']}'",
+                )
+                del items[i]
+
+    # only 1 open request per (username, policy_id, revoke) can be created
+    rows = {}  # {(username, policy_id, revoke): row}
+    row_indexes = {}  # {(username, policy_id, revoke): index}
+    for i, data in items.items():
+        key = (data["username"], data["policy_id"], data["revoke"])
+        if key in rows:
+            set_error(
+                i,
+                HTTP_409_CONFLICT,
+                f"Duplicate request for username '{data['username']}' and policy_id '{data['policy_id']}'",
+            )
+            continue
+        # remove any fields that are not stored in requests table
+        [data.pop(f) for f in ["resource_path", "resource_paths", "role_ids"]]
+        rows[key] = {"request_id": new_request_id(), **data}
+        row_indexes[key] = i
+
+    if not rows:
+        return results
+
+    # the requests are committed right away, so that no database connection
+    # is held while calling Arborist and external systems
+    async with db_transaction() as db_session:
+        requests = await insert_requests(db_session, list(rows.values()))
+        new_requests = [
+            r
+            for r in requests
+            if str(r.request_id)
+            == rows[(r.username, r.policy_id, r.revoke)]["request_id"]
+        ]
+        await notify_request_changes(
+            db_session, "created", [request.to_dict() for request in new_requests]
+        )
+        await record_status_changes(db_session, new_requests)
+        new_request_ids = {r.request_id for r in new_requests}
+        await record_reused_requests(
+            db_session, [r for r in requests if r.request_id not in new_request_ids]
+        )
+    returned_requests = {(r.username, r.policy_id, r.revoke): r for r in requests}
+
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def apply_status(i: int, request: RequestModel) -> None:
+        async with semaphore:
+            try:
+                redirect_url = await apply_new_request_status(
+                    client,
+                    request,
+                    request.request_id in new_request_ids,
+                    resource_paths[i],
+                )
+            except HTTPException as e:
+                set_error(i, e.status_code, e.detail)
+                return
+        res = request.to_dict()
+        if redirect_url:
+            res["redirect_url"] = redirect_url
+        results[i] = {"status_code": HTTP_201_CREATED, "request": res}
+
+    tasks = []
+    for key, i in row_indexes.items():
+        request = returned_requests.get(key)
+        if not request:
+            set_error(
+                i,
+                HTTP_409_CONFLICT,
+                f"An open access request for username '{key[0]}' and policy_id '{key[1]}' already exists. Users can only request access to a resource once.",
+            )
+            continue
+        tasks.append(apply_status(i, request))
+    await asyncio.gather(*tasks)
+
+    return results
+
+
+async def get_token_username(auth) -> str:
+    token_claims = await auth.get_token_claims()
+    token_username = token_claims.get("context", {}).get("user", {}).get("name")
+    if not token_username:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            "Must provide a username in the request body or token",
+        )
+    logger.debug(f"Got username from token: {token_username}")
+    return token_username
+
+
+class UpdateRequestInput(BaseModel):
+    """
+    Update the status of an access request.
+    """
+
+    request_id: uuid.UUID
+    status: str
+
+
+async def set_request_status(request: RequestModel, status: str) -> RequestModel | None:
+    """
+    Update the status of a request, in its own short transaction, if the
+    request has not been updated since it was read. Returns the updated
+    request, or None if the request was updated by someone else in the
+    meantime.
+    """
+    query = (
+        update(RequestModel)
+        .where(RequestModel.request_id == request.request_id)
+        # optimistic concurrency check: `updated_time` changes with every
+        # update, so it acts as the row's version
+        .where(RequestModel.status == request.status)
+        .where(RequestModel.updated_time == request.updated_time)
+        .values(status=status, updated_time=datetime.now(timezone.utc))
+        .returning(RequestModel)
+    )
+    async with db_transaction() as db_session:
+        updated_request = (await db_session.scalars(query)).one_or_none()
+        if updated_request:
+            await notify_request_change(
+                db_session, "updated", updated_request.to_dict()
+            )
+            await record_status_changes(
+                db_session,
+                [updated_request],
+                {request.request_id: request.status},
+            )
+    return updated_request
+
+
+async def set_requests_status(
+    updates: list[tuple[RequestModel, str]],
+) -> list[RequestModel]:
+    """
+    Same as `set_request_status`, for a list of (request, status), in a
+    single statement. Returns the updated requests; the requests that were
+    updated by someone else in the meantime are not updated.
+    """
+    new_values = values(
+        column("request_id", RequestModel.request_id.type),
+        column("old_status", RequestModel.status.type),
+        column("old_updated_time", RequestModel.updated_time.type),
+        column("status", RequestModel.status.type),
+        name="new_values",
+    ).data(
+        [
+            (request.request_id, request.status, request.updated_time, status)
+            for request, status in updates
+        ]
+    )
+    query = (
+        update(RequestModel)
+        .where(RequestModel.request_id == new_values.c.request_id)
+        # optimistic concurrency check, see `set_request_status`
+        .where(RequestModel.status == new_values.c.old_status)
+        .where(RequestModel.updated_time == new_values.c.old_updated_time)
+        .values(status=new_values.c.status, updated_time=datetime.now(timezone.utc))
+        .returning(RequestModel)
+        .execution_options(synchronize_session=False)
+    )
+    async with db_transaction() as db_session:
+        updated_requests = (await db_session.scalars(query)).all()
+        await notify_request_changes(
+            db_session, "updated", [request.to_dict() for request in updated_requests]
         )
-        await grant_or_revoke_arborist_policy(
-            api_request.app.arborist_client,
-            request.policy_id,
-            request.username,
-            request.revoke,
+        await record_status_changes(
+            db_session,
+            updated_requests,
+            {request.request_id: request.status for request, _ in updates},
         )
+    return updated_requests
+
 
+async def apply_request_status_update(
+    arborist_client,
+    old_request: RequestModel,
+    request: RequestModel,
+    resource_paths: list,
+) -> str:
+    """
+    Grant or revoke access if the request's new status is one of the
+    UPDATE_ACCESS_STATUSES, and run the post-status-update actions. If
+    anything fails, the request is reverted to its previous status, the
+    access changes are reverted and an HTTPException is raised.
+
+    Returns the redirect URL, if any.
+    """
+    access_updated = False
     try:
-        redirect_url = post_status_update(
+        if request.status in config["UPDATE_ACCESS_STATUSES"]:
+            # the access request is approved: grant/revoke access
+            action = "revoke" if request.revoke else "grant"
+            logger.debug(
+                f"Status '{request.status}' is one of UPDATE_ACCESS_STATUSES {config['UPDATE_ACCESS_STATUSES']}, attempting to {action} access in Arborist"
+            )
+            await grant_or_revoke_arborist_policy(
+                arborist_client,
+                request.policy_id,
+                request.username,
+                request.revoke,
+            )
+            access_updated = True
+
+        return await post_status_update(
             request.status, request.to_dict(), resource_paths
         )
-    except Exception:  # if external calls or other actions fail: revert
+    except Exception as e:  # if access updates, external calls or other actions fail: revert
         logger.error("Something went wrong during post-status-update actions")
-        if not draft_previous_requests:
-            logger.warning(f"Deleting the request that was just created ({request_id})")
-            await db_session.execute(
-                delete(RequestModel).where(RequestModel.request_id == request_id)
+        logger.warning(f"Reverting to the previous status: {old_request.status}")
+        if not await set_request_status(request, old_request.status):
+            logger.error(
+                f"Unable to revert request '{request.request_id}' to status '{old_request.status}': it was updated by another process"
             )
-        if request.status in config["UPDATE_ACCESS_STATUSES"]:
+        if access_updated:
             logger.warning(f"Reverting the previous access {action} action")
             await grant_or_revoke_arborist_policy(
-                api_request.app.arborist_client,
+                arborist_client,
                 request.policy_id,
                 request.username,
                 not request.revoke,  # revert the access we just granted or revoked
             )
+        if isinstance(e, HTTPException):
+            raise
         traceback.print_exc()
         raise HTTPException(
             HTTP_500_INTERNAL_SERVER_ERROR,
             "Something went wrong during post-status-update actions",
         )
 
-    # CORS limits redirections, so we redirect on the client side
-    if redirect_url:
-        request.redirect_url = redirect_url
 
-    return request.to_dict()
+async def reapply_access_update(arborist_client, request: RequestModel) -> None:
+    """
+    Grant or revoke access again if the request's status is one of the
+    UPDATE_ACCESS_STATUSES. The status update is committed before access is
+    granted or revoked, so if the process stops in between, the access
+    update is missing: updating the request to the status it already has
+    applies it again. Granting and revoking access are idempotent.
+    """
+    if request.status not in config["UPDATE_ACCESS_STATUSES"]:
+        return
+    action = "revoke" if request.revoke else "grant"
+    logger.debug(
+        f"Status '{request.status}' is one of UPDATE_ACCESS_STATUSES {config['UPDATE_ACCESS_STATUSES']}, attempting to {action} access in Arborist again"
+    )
+    await grant_or_revoke_arborist_policy(
+        arborist_client,
+        request.policy_id,
+        request.username,
+        request.revoke,
+    )
+
+
+@router.put("/request/bulk", status_code=HTTP_200_OK)
+async def update_requests(
+    api_request: Request,
+    body: list[UpdateRequestInput],
+    auth=Depends(Auth),
+) -> list:
+    """
+    Update the status of up to BULK_MAX_REQUESTS access requests at once.
+    Each request is updated as with `PUT /request/{request_id}`.
+
+    Arborist policies are listed once, authorization is checked once per
+    distinct set of resource paths and all the statuses are updated in a
+    single statement. Access is then granted or revoked concurrently for
+    different users, and sequentially for each user.
+
+    Returns one result per update, in the same order: either
+    `{"status_code": 200, "request": {...}}` or
+    `{"status_code": <error code>, "detail": <error message>}`.
+    """
+    logger.info(f"Updating {len(body)} requests in bulk")
+    if len(body) > BULK_MAX_REQUESTS:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            f"Cannot update more than {BULK_MAX_REQUESTS} requests at once",
+        )
+    client = api_request.app.arborist_client
+
+    results = [None] * len(body)
+
+    def set_error(i: int, status_code: int, detail: str) -> None:
+        results[i] = {"status_code": status_code, "detail": detail}
+
+    allowed_statuses = config["ALLOWED_REQUEST_STATUSES"]
+    items = {}  # {index: update}
+    request_ids = set()
+    for i, item in enumerate(body):
+        if item.request_id in request_ids:
+            set_error(
+                i,
+                HTTP_400_BAD_REQUEST,
+                f"Request '{item.request_id}' can only be updated once",
+            )
+            continue
+        request_ids.add(item.request_id)
+        if item.status not in allowed_statuses:
+            set_error(
+                i,
+                HTTP_400_BAD_REQUEST,
+                f"Status '{item.status}' is not an allowed request status ({allowed_statuses})",
+            )
+            continue
+        items[i] = item
+
+    if not items:
+        return results
+
+    existing_policies = (await arborist.list_policies(client, expand=True))["policies"]
+
+    async with db_transaction() as db_session:
+        query = select(RequestModel).where(
+            RequestModel.request_id.in_([item.request_id for item in items.values()])
+        )
+        requests = {
+            r.request_id: r for r in (await db_session.execute(query)).scalars()
+        }
+
+    resource_paths = {}  # {index: resource paths}
+    for i, item in list(items.items()):
+        request = requests.get(item.request_id)
+        if not request:
+            set_error(i, HTTP_404_NOT_FOUND, "Not found")
+            del items[i]
+            continue
+        resource_paths[i] = arborist.get_resource_paths_for_policy(
+            existing_policies, request.policy_id
+        )
+
+    # check authz once per distinct set of resource paths
+    resource_sets = list({tuple(sorted(resource_paths[i])) for i in items})
+    authorized = await asyncio.gather(
+        *(auth.authorize("update", list(s), throw=False) for s in resource_sets)
+    )
+    authorized_sets = {s for s, ok in zip(resource_sets, authorized) if ok}
+    updates = {}  # {request_id: (index, old request, status)}
+    unchanged = {}  # {index: request which already has the status}
+    for i, item in items.items():
+        request = requests[item.request_id]
+        if tuple(sorted(resource_paths[i])) not in authorized_sets:
+            set_error(i, HTTP_403_FORBIDDEN, "Permission denied")
+        elif request.status == item.status:
+            logger.debug(
+                f"Request '{item.request_id}' already has status '{item.status}'"
+            )
+            unchanged[i] = request
+        else:
+            updates[request.request_id] = (i, request, item.status)
+
+    if not updates and not unchanged:
+        return results
+
+    updated_requests = []
+    if updates:
+        updated_requests = await set_requests_status(
+            [(request, status) for _, request, status in updates.values()]
+        )
+    updated_request_ids = {r.request_id for r in updated_requests}
+    for request_id, (i, _, _) in updates.items():
+        if request_id not in updated_request_ids:
+            set_error(
+                i,
+                HTTP_409_CONFLICT,
+                f"Request '{request_id}' was updated by another process. Please try again",
+            )
+
+    # Arborist calls for different users are made concurrently, and calls for
+    # the same user are made sequentially
+    requests_by_user = defaultdict(list)
+    for i, request in unchanged.items():
+        requests_by_user[request.username].append((i, None, request))
+    for request in updated_requests:
+        i, old_request, _ = updates[request.request_id]
+        requests_by_user[request.username].append((i, old_request, request))
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def apply_status_updates(user_requests: list[tuple]) -> None:
+        async with semaphore:
+            for i, old_request, request in user_requests:
+                try:
+                    if old_request:
+                        redirect_url = await apply_request_status_update(
+                            client, old_request, request, resource_paths[i]
+                        )
+                    else:
+                        await reapply_access_update(client, request)
+                        redirect_url = ""
+                except HTTPException as e:
+                    set_error(i, e.status_code, e.detail)
+                    continue
+                res = request.to_dict()
+                if redirect_url:
+                    res["redirect_url"] = redirect_url
+                results[i] = {"status_code": HTTP_200_OK, "request": res}
+
+    await asyncio.gather(
+        *(apply_status_updates(reqs) for reqs in requests_by_user.values())
+    )
+
+    return results
 
 
 @router.put("/request/{request_id}", status_code=HTTP_200_OK)
@@ -307,10 +981,14 @@ async def update_request(
     request_id: uuid.UUID,
     status: str = Body(..., embed=True),
     auth=Depends(Auth),
-    db_session: AsyncSession = Depends(get_db_session),
 ) -> dict:
     """
-    Update an access request with a new "status".
+    Update an access request with a new "status". Archived requests cannot
+    be updated.
+
+    Updating a request to the status it already has does not run the
+    status update actions again, except for granting or revoking access if
+    the status is one of UPDATE_ACCESS_STATUSES.
     """
     logger.info(f"Updating request '{request_id}' with status '{status}'")
 
@@ -318,15 +996,13 @@ async def update_request(
         api_request.app.arborist_client, expand=True
     )
 
-    # selecting the row with a lock (`with_for_update`) only allows 1 update request at a time
-    # on the same row
-    query = (
-        select(RequestModel)
-        .where(RequestModel.request_id == request_id)
-        .with_for_update()
-    )
-    result = await db_session.execute(query)
-    request = result.scalar()
+    # no lock is held while calling Arborist and external systems: the
+    # status update is a conditional UPDATE which fails if the request was
+    # updated concurrently
+    async with db_transaction() as db_session:
+        request, archived = await get_request_or_archived_request(
+            db_session, request_id
+        )
     if not request:
         raise HTTPException(
             HTTP_404_NOT_FOUND,
@@ -341,8 +1017,15 @@ async def update_request(
         resource_paths,
     )
 
+    if archived:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            f"Request '{request_id}' is archived and cannot be updated",
+        )
+
     if request.status == status:
         logger.debug(f"Request '{request_id}' already has status '{status}'")
+        await reapply_access_update(api_request.app.arborist_client, request)
         return request.to_dict()
 
     allowed_statuses = config["ALLOWED_REQUEST_STATUSES"]
@@ -352,54 +1035,123 @@ async def update_request(
             f"Status '{status}' is not an allowed request status ({allowed_statuses})",
         )
 
-    if status in config["UPDATE_ACCESS_STATUSES"]:
-        # the access request is approved: grant/revoke access
-        action = "revoke" if request.revoke else "grant"
-        logger.debug(
-            f"Status '{status}' is one of UPDATE_ACCESS_STATUSES {config['UPDATE_ACCESS_STATUSES']}, attempting to {action} access in Arborist"
-        )
-        await grant_or_revoke_arborist_policy(
-            api_request.app.arborist_client,
-            request.policy_id,
-            request.username,
-            request.revoke,
+    old_request = request
+    request = await set_request_status(old_request, status)
+    if not request:
+        raise HTTPException(
+            HTTP_409_CONFLICT,
+            f"Request '{request_id}' was updated by another process. Please try again",
         )
 
-    old_status = request.status
-    request.status = status
-    request.updated_time = datetime.now(timezone.utc)
-    # commit the transaction, releasing the lock - `post_status_update` could take time
-    db_session.commit()
+    redirect_url = await apply_request_status_update(
+        api_request.app.arborist_client, old_request, request, resource_paths
+    )
 
     res = request.to_dict()
+    # CORS limits redirections, so we redirect on the client side
+    if redirect_url:
+        res["redirect_url"] = redirect_url
 
-    try:
-        redirect_url = post_status_update(status, res, resource_paths)
-    except Exception:  # if external calls or other actions fail: revert
-        logger.error("Something went wrong during post-status-update actions")
-        logger.warning(f"Reverting to the previous status: {old_status}")
-        request.status = old_status
-        request.updated_time = datetime.now(timezone.utc)
-        db_session.commit()
-        if status in config["UPDATE_ACCESS_STATUSES"]:
-            logger.warning(f"Reverting the previous access {action} action")
-            await grant_or_revoke_arborist_policy(
-                api_request.app.arborist_client,
-                request.policy_id,
-                request.username,
-                not request.revoke,  # revert the access we just granted or revoked
+    return res
+
+
+@router.delete("/request", status_code=HTTP_200_OK)
+async def delete_requests(
+    api_request: Request,
+    auth=Depends(Auth),
+) -> dict:
+    """
+    Delete all the access requests matching the filters. The filters are
+    the same as for `GET /request`, and at least one is required. The other
+    parameters of `GET /request`, such as "limit", are not supported.
+
+    Example: `DELETE /request?status=DRAFT&created_before=2024-01-01`
+
+    Users must have `delete` access to all the matching requests: the
+    authorization is checked once per distinct policy. The requests are
+    deleted DELETE_BATCH_SIZE at a time. Archived requests are not deleted.
+
+    WARNING: deleting access requests that have already been approved does
+    NOT revoke the access that has been granted.
+    """
+    # the list parameters would be ignored: reject them rather than delete
+    # more requests than expected
+    params = [p for p in NON_FILTER_PARAMS if p in api_request.query_params]
+    if params:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            f"The parameters {params} are not supported when deleting requests",
+        )
+    filter_dict, active = populate_filters_from_query_params(api_request.query_params)
+    if not filter_dict:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            "At least one filter is required to delete requests",
+        )
+    logger.info(f"Deleting requests matching filters: {filter_dict}")
+
+    existing_policies = await arborist.list_policies(
+        api_request.app.arborist_client, expand=True
+    )
+
+    async with db_transaction() as db_session:
+        query = apply_request_filters(
+            select(RequestModel.policy_id).distinct(),
+            final=(not active),
+            filters=filter_dict,
+        )
+        policy_ids = list((await db_session.scalars(query)).all())
+
+    # check authz once per distinct policy
+    authorized = await asyncio.gather(
+        *(
+            auth.authorize(
+                "delete",
+                arborist.get_resource_paths_for_policy(
+                    existing_policies["policies"], policy_id
+                ),
+                throw=False,
             )
-        traceback.print_exc()
+            for policy_id in policy_ids
+        )
+    )
+    if not all(authorized):
         raise HTTPException(
-            HTTP_500_INTERNAL_SERVER_ERROR,
-            "Something went wrong during post-status-update actions",
+            HTTP_403_FORBIDDEN,
+            "Permission denied",
         )
 
-    # CORS limits redirections, so we redirect on the client side
-    if redirect_url:
-        res["redirect_url"] = redirect_url
+    # delete in batches so that each transaction stays short. Only requests
+    # for the authorized policies are deleted, even if new requests matching
+    # the filters are created in the meantime
+    to_delete = apply_request_filters(
+        select(RequestModel.request_id),
+        final=(not active),
+        filters=filter_dict,
+    ).where(RequestModel.policy_id.in_(policy_ids))
+    query = (
+        delete(RequestModel)
+        .where(
+            RequestModel.request_id.in_(
+                to_delete.limit(DELETE_BATCH_SIZE).scalar_subquery()
+            )
+        )
+        .returning(RequestModel)
+        .execution_options(synchronize_session=False)
+    )
+    request_ids = []
+    while policy_ids:
+        async with db_transaction() as db_session:
+            requests = (await db_session.scalars(query)).all()
+            await notify_request_changes(
+                db_session, "deleted", [request.to_dict() for request in requests]
+            )
+        request_ids.extend(request.request_id for request in requests)
+        if len(requests) < DELETE_BATCH_SIZE:
+            break
 
-    return res
+    logger.info(f"Deleted {len(request_ids)} requests")
+    return {"request_ids": request_ids}
 
 
 @router.delete("/request/{request_id}", status_code=HTTP_200_OK)
@@ -407,10 +1159,9 @@ async def delete_request(
     api_request: Request,
     request_id: uuid.UUID,
     auth=Depends(Auth),
-    db_session: AsyncSession = Depends(get_db_session),
 ) -> dict:
     """
-    Delete an access request.
+    Delete an access request, or an archived request.
 
     WARNING: deleting an access request that has already been approved does NOT revoke the access
     that has been granted. It only removes the trace of that access request from the database.
@@ -420,9 +1171,10 @@ async def delete_request(
         api_request.app.arborist_client, expand=True
     )
 
-    query = select(RequestModel).where(RequestModel.request_id == request_id)
-    result = await db_session.execute(query)
-    request = result.scalar()
+    async with db_transaction() as db_session:
+        request, archived = await get_request_or_archived_request(
+            db_session, request_id
+        )
     if not request:
         raise HTTPException(
             HTTP_404_NOT_FOUND,
@@ -436,9 +1188,25 @@ async def delete_request(
         ),
     )
 
-    await db_session.execute(
-        delete(RequestModel).where(RequestModel.request_id == request_id)
-    )
+    async with db_transaction() as db_session:
+        if archived:
+            # archived requests do not change: notify the request read above
+            query = (
+                delete(RequestArchive)
+                .where(RequestArchive.request_id == request_id)
+                .returning(RequestArchive.request_id)
+            )
+            if not (await db_session.scalars(query)).one_or_none():
+                request = None
+        else:
+            query = (
+                delete(RequestModel)
+                .where(RequestModel.request_id == request_id)
+                .returning(RequestModel)
+            )
+            request = (await db_session.scalars(query)).one_or_none()
+        if request:
+            await notify_request_change(db_session, "deleted", request.to_dict())
 
     return {"request_id": request_id}
 
@@ -1,8 +1,17 @@
+import asyncio
+import base64
+import json
+import operator
 import uuid
-from datetime import datetime
-from fastapi import APIRouter, Body, Depends, FastAPI, HTTPException
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio.session import AsyncSession
+from datetime import datetime, timedelta, timezone
+from typing import Literal
+
+from fastapi import APIRouter, Body, Depends, FastAPI, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from sqlalchemy import ARRAY, any_, bindparam, func, select, tuple_
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.inspection import inspect
 from starlette.requests import Request
 from starlette.status import (
     HTTP_200_OK,
@@ -13,53 +22,372 @@ from starlette.status import (
 )
 
 from .. import logger, arborist
+from ..archive import (
+    get_archived_requests,
+    get_request_or_archived_request,
+    get_requests_with_archive,
+)
 from ..auth import Auth
 from ..config import config
-from ..db import Request as RequestModel, get_db_session
+from ..db import (
+    Request as RequestModel,
+    RequestStatusEvent,
+    db_transaction,
+    get_request_status_values,
+)
+from ..notifications import Subscription, hub
 
 
 router = APIRouter()
 
+# query parameters that are not filters
+NON_FILTER_PARAMS = [
+    "limit",
+    "cursor",
+    "stream",
+    "fields",
+    "interval",
+    "include_archived",
+]
+
+# time range filters: { query parameter: (field, comparison) }. The ranges
+# include their start and exclude their end
+RANGE_FILTERS = {
+    "created_after": ("created_time", operator.ge),
+    "created_before": ("created_time", operator.lt),
+    "updated_after": ("updated_time", operator.ge),
+    "updated_before": ("updated_time", operator.lt),
+}
+
+# all the fields of a request, in the order they are returned
+REQUEST_FIELDS = [column.name for column in RequestModel.__table__.columns]
+# fields the list endpoints need, whether they are returned or not: the
+# policy for authorization checks, the rest for pagination cursors
+REQUIRED_FIELDS = ["request_id", "policy_id", "created_time"]
+
+# number of rows fetched from the database at a time when streaming
+STREAM_BATCH_SIZE = 500
+
+# number of seconds between keep-alive messages on idle event streams
+EVENTS_KEEPALIVE_INTERVAL = 15
+
+# max number of requests per `POST /request/batch_get` call
+BATCH_GET_MAX_IDS = 500
+
+# fields returned by `GET /request/status_events`
+STATUS_EVENT_FIELDS = [
+    column.name
+    for column in RequestStatusEvent.__table__.columns
+    if column.name != "id"
+]
+
+
+async def get_filtered_requests(db_session, **kwargs) -> list:
+    """
+    Get the requests matching the filters. See `get_filtered_requests_query`
+    for the arguments.
+    """
+    result = await db_session.execute(get_filtered_requests_query(**kwargs))
+    if kwargs.get("columns"):
+        return list(result.all())
+    return list(result.scalars().all())
+
 
-async def get_filtered_requests(
-    db_session,
+def get_filtered_requests_query(
     username: str = None,
     draft: bool = True,
     final: bool = True,
     filters: dict = {},
-) -> list:
+    limit: int = None,
+    after: tuple = None,
+    columns: list = None,
+    order_by_field: str = "created_time",
+    include_archived: bool = False,
+):
     """
     If not None, gets all the requests made by user with given username.
     If only non-draft requests are needed then set draft=False.
     If only non-final requests are needed then set final=False.
     Add filters if neccessary as a dictionary of {param : <List of values>} to get filtered results
+    The requests are ordered by (created_time, request_id), or by
+    (`order_by_field`, request_id). To get a page of results, set `limit`, and
+    `after` to the position in this order of the last request of the previous
+    page.
+    If `columns` is set, only these columns are selected, and the query
+    returns plain rows instead of `Request` objects. This is much faster
+    when reading many requests.
+    If `include_archived` is True, the archived requests are included.
+    """
+    model = get_requests_with_archive() if include_archived else RequestModel
+    if columns:
+        # the requests table, or the union of the requests and archive tables
+        table = inspect(model).selectable
+        query = select(*(table.c[name] for name in columns))
+    else:
+        query = select(model)
+    query = apply_request_filters(query, username, draft, final, filters, model)
+    order_by = [getattr(model, order_by_field), model.request_id]
+    if after:
+        query = query.where(tuple_(*order_by) > tuple_(*after))
+    # without an explicit order, the order of the results depends on the
+    # indexes the query planner uses
+    query = query.order_by(*order_by)
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def apply_request_filters(
+    query,
+    username: str = None,
+    draft: bool = True,
+    final: bool = True,
+    filters: dict = {},
+    model=RequestModel,
+):
+    """
+    Add the filters to a query on the requests table, or on `model` if
+    provided (see `get_requests_with_archive`). See
+    `get_filtered_requests_query` for the other arguments.
     """
-    query = select(RequestModel)
     if username:
-        query = query.where(RequestModel.username == username)
+        query = query.where(model.username == username)
     if not draft:
-        query = query.where(RequestModel.status.notin_(config["DRAFT_STATUSES"]))
+        query = query.where(model.status.notin_(config["DRAFT_STATUSES"]))
     if not final:
-        query = query.where(RequestModel.status.notin_(config["FINAL_STATUSES"]))
+        query = query.where(model.status.notin_(config["FINAL_STATUSES"]))
     for field, values in filters.items():
-        query = query.where(getattr(RequestModel, field).in_(values))
+        if field in RANGE_FILTERS:
+            column, compare = RANGE_FILTERS[field]
+            for value in values:
+                query = query.where(compare(getattr(model, column), value))
+        elif field == "status":
+            # the `request_status` type rejects unknown values instead of not
+            # matching them
+            known_statuses = get_request_status_values()
+            query = query.where(
+                model.status.in_([v for v in values if v in known_statuses])
+            )
+        else:
+            query = query.where(getattr(model, field).in_(values))
+    return query
 
-    result = await db_session.execute(query)
-    return list(result.scalars().all())
+
+def get_fields_to_select(fields: list) -> tuple[list, list]:
+    """
+    Validate the fields requested by the user, and return the list of
+    fields to return and the list of columns to select.
+    """
+    if not fields:
+        return REQUEST_FIELDS, REQUEST_FIELDS
+    for field in fields:
+        if field not in REQUEST_FIELDS:
+            raise HTTPException(
+                HTTP_400_BAD_REQUEST,
+                f"The field '{field}' is invalid. Valid fields: {REQUEST_FIELDS}",
+            )
+    fields = [f for f in REQUEST_FIELDS if f in fields]
+    columns = [f for f in REQUEST_FIELDS if f in fields or f in REQUIRED_FIELDS]
+    return fields, columns
+
+
+def encode_requests(rows: list, fields: list) -> bytes:
+    """
+    Encode the selected fields of the rows to JSON. This is equivalent to
+    FastAPI's serialization of `[r.to_dict() for r in requests]`, but skips
+    building ORM objects and validating the response.
+    """
+    return to_json([{f: getattr(row, f) for f in fields} for row in rows])
+
+
+def get_json_response(rows: list, fields: list, next_cursor: str = None) -> Response:
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(
+        content=encode_requests(rows, fields),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+async def stream_requests(query, stream: str, fields: list, is_authorized=None):
+    """
+    Yield the requests returned by the query, encoded as a JSON array
+    ("json") or as one JSON object per line ("ndjson"). Rows are read from a
+    server-side cursor, STREAM_BATCH_SIZE at a time, and requests for which
+    `is_authorized(policy_id)` is False are skipped, so the memory used does
+    not depend on the number of results.
+
+    The response is sent after the endpoint returns, so this uses its own
+    database session instead of the endpoint's.
+    """
+    async with db_transaction() as session:
+        result = await session.stream(
+            query.execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        first = True
+        if stream == "json":
+            yield b"["
+        async for r in result:
+            if is_authorized and not is_authorized(r.policy_id):
+                continue
+            # same encoding as the non-streamed responses
+            data = to_json({f: getattr(r, f) for f in fields})
+            if stream == "ndjson":
+                yield data + b"\n"
+            else:
+                yield data if first else b"," + data
+            first = False
+        if stream == "json":
+            yield b"]"
+
+
+def get_streaming_response(query, stream: str, fields: list, is_authorized=None):
+    media_type = "application/x-ndjson" if stream == "ndjson" else "application/json"
+    return StreamingResponse(
+        stream_requests(query, stream, fields, is_authorized), media_type=media_type
+    )
+
+
+def encode_cursor(request, order_by_field: str = "created_time") -> str:
+    """
+    Encode the position of a request in the (`order_by_field`, request_id)
+    order.
+    """
+    position = [
+        getattr(request, order_by_field).isoformat(),
+        str(request.request_id),
+    ]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_time, request_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(created_time), uuid.UUID(request_id)
+    except Exception:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            f"The cursor '{cursor}' is invalid",
+        )
+
+
+async def get_requests_page(
+    db_session,
+    limit: int,
+    cursor: str = None,
+    is_authorized=None,
+    **kwargs,
+) -> tuple[list, str]:
+    """
+    Get up to `limit` requests after the `cursor` position, and the cursor to
+    get the next page (None if there are no more results). Requests for which
+    `is_authorized(policy_id)` is False are skipped; more requests are fetched
+    until the page is full.
+
+    `kwargs` are passed to `get_filtered_requests_query`.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    page = []
+    while True:
+        requests = await get_filtered_requests(
+            db_session, limit=limit + 1, after=after, **kwargs
+        )
+        for r in requests:
+            if is_authorized and not is_authorized(r.policy_id):
+                continue
+            if len(page) == limit:
+                # there is at least 1 more result
+                return page, encode_cursor(page[-1])
+            page.append(r)
+        if len(requests) <= limit:
+            return page, None
+        after = (requests[-1].created_time, requests[-1].request_id)
+
+
+async def get_read_authorization_checker(api_request: Request, auth: Auth):
+    """
+    Return a function `is_authorized(policy_id) -> bool` which checks whether
+    the current user or client has read access to requests for a policy.
+    """
+    # get the resources the current user has access to see
+    token_claims = await auth.get_token_claims()
+    username = token_claims.get("context", {}).get("user", {}).get("name")
+    if username:
+        authz_mapping = await api_request.app.arborist_client.auth_mapping(username)
+    else:
+        client_id = token_claims.get("azp")
+        if not client_id:
+            raise HTTPException(
+                HTTP_401_UNAUTHORIZED,
+                "The provided token does not include a username or a client ID",
+            )
+        authz_mapping = await api_request.app.arborist_client.client_auth_mapping(
+            client_id
+        )
+    authorized_resource_paths = [
+        resource_path
+        for resource_path, access in authz_mapping.items()
+        if any(
+            e["service"] in ["requestor", "*"] and e["method"] in ["read", "*"]
+            for e in access
+        )
+    ]
+
+    existing_policies = await arborist.list_policies(
+        api_request.app.arborist_client, expand=True
+    )
+    # many requests share the same policy: only check each policy once
+    authorized_policies = {}
+
+    def is_authorized(policy_id: str) -> bool:
+        if policy_id in authorized_policies:
+            return authorized_policies[policy_id]
+        resource_paths = arborist.get_resource_paths_for_policy(
+            existing_policies["policies"], policy_id
+        )
+        # Note that GETting a request with no resource paths would require
+        # admin access - not implemented.
+        # A request is authorized if all the resource_paths in the request's
+        # policy are authorized.
+        authorized_policies[policy_id] = bool(resource_paths) and all(
+            # A resource_path is authorized if authorized_resource_paths
+            # contains the path or any of its prefixes
+            any(
+                arborist.is_path_prefix_of_path(authorized_resource_path, resource_path)
+                for authorized_resource_path in authorized_resource_paths
+            )
+            for resource_path in resource_paths
+        )
+        return authorized_policies[policy_id]
+
+    return is_authorized
+
+
+def check_stream_param(stream: str, limit: int) -> None:
+    if stream and limit:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            "The 'stream' and 'limit' parameters cannot be used together",
+        )
 
 
 def populate_filters_from_query_params(query_params):
     active = False
-    filter_dict = {k: set() for k in query_params if k != "active"}
+    filter_dict = {
+        k: set() for k in query_params if k not in ["active", *NON_FILTER_PARAMS]
+    }
     for param, value in query_params.multi_items():
-        if param == "active":
+        if param in NON_FILTER_PARAMS:
+            # validated by the endpoints' own parameters
+            continue
+        elif param == "active":
             if value:
                 raise HTTPException(
                     HTTP_400_BAD_REQUEST,
                     f"The 'active' parameter should not be assigned a value. Received '{value}'",
                 )
             active = True
-        elif not hasattr(RequestModel, param):
+        elif param not in RANGE_FILTERS and not hasattr(RequestModel, param):
             raise HTTPException(
                 HTTP_400_BAD_REQUEST,
                 f"The parameter '{param}' is invalid",
@@ -71,7 +399,9 @@ def populate_filters_from_query_params(query_params):
             )
         else:
             try:
-                if getattr(RequestModel, param).type.python_type == bool:
+                if param in RANGE_FILTERS:
+                    value = parse_datetime(value)
+                elif getattr(RequestModel, param).type.python_type == bool:
                     value = value.lower() == "true"
                 elif getattr(RequestModel, param).type.python_type == datetime:
                     # `multi_items()` interprets `+` as an encoded space, but in the case of a
@@ -88,11 +418,24 @@ def populate_filters_from_query_params(query_params):
     return filter_dict, active
 
 
+def parse_datetime(value: str) -> datetime:
+    # `multi_items()` interprets `+` as an encoded space, but in the case of a
+    # datetime it's an actual `+` character
+    value = datetime.fromisoformat(value.replace(" ", "+"))
+    if not value.tzinfo:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
 @router.get("/request")
 async def list_requests(
     api_request: Request,
+    limit: int = Query(None, ge=1),
+    cursor: str = None,
+    stream: Literal["json", "ndjson"] = None,
+    fields: list[str] = Query(None),
+    include_archived: bool = False,
     auth=Depends(Auth),
-    db_session: AsyncSession = Depends(get_db_session),
 ) -> list:
     """
     List all the requests the current user has access to see.
@@ -113,70 +456,73 @@ async def list_requests(
     "policy_id=foo&policy_id=bar" means "the policy is either foo or bar" (same field name).
 
     "policy_id=foo&revoke=False" means "the policy is foo and revoke is false" (different field names).
+
+    Use the "created_after", "created_before", "updated_after" and
+    "updated_before" query parameters to get the requests created or updated
+    in a time range. The start of the range is included and the end is
+    excluded. Dates without a timezone are in UTC.
+
+    Example: `?created_after=2024-01-01&created_before=2024-02-01`
+
+    Use the "limit" query parameter to get results one page at a time. When
+    there are more results, the `X-Next-Cursor` response header contains the
+    value of the "cursor" query parameter to use to get the next page.
+
+    Use the "stream" query parameter to stream the results as they are read
+    from the database, as a JSON array ("stream=json") or as one JSON object
+    per line ("stream=ndjson"). This is recommended for large listings.
+    Streaming cannot be combined with "limit".
+
+    Use the "fields" query parameter to only return some of the fields of the
+    requests. Example: `?fields=request_id&fields=status`
+
+    Requests in a final status that have not been updated for ARCHIVE_AFTER
+    seconds are archived. Use "include_archived=true" to include them.
     """
     filter_dict, active = populate_filters_from_query_params(api_request.query_params)
-    requests = await get_filtered_requests(
-        db_session, final=(not active), filters=filter_dict
-    )
-
-    # get the resources the current user has access to see
-    token_claims = await auth.get_token_claims()
-    username = token_claims.get("context", {}).get("user", {}).get("name")
-    if username:
-        authz_mapping = await api_request.app.arborist_client.auth_mapping(username)
-    else:
-        client_id = token_claims.get("azp")
-        if not client_id:
-            raise HTTPException(
-                HTTP_401_UNAUTHORIZED,
-                "The provided token does not include a username or a client ID",
-            )
-        authz_mapping = await api_request.app.arborist_client.client_auth_mapping(
-            client_id
-        )
-    authorized_resource_paths = [
-        resource_path
-        for resource_path, access in authz_mapping.items()
-        if any(
-            e["service"] in ["requestor", "*"] and e["method"] in ["read", "*"]
-            for e in access
-        )
-    ]
+    check_stream_param(stream, limit)
+    fields, columns = get_fields_to_select(fields)
+    is_authorized = await get_read_authorization_checker(api_request, auth)
 
     # filter requests with read access
-    existing_policies = await arborist.list_policies(
-        api_request.app.arborist_client, expand=True
-    )
-    authorized_requests = []
-    for r in requests:
-        resource_paths = arborist.get_resource_paths_for_policy(
-            existing_policies["policies"], r.policy_id
-        )
-        if not resource_paths:
-            # Note that GETting a request with no resource paths would require
-            # admin access - not implemented
-            continue
-        # A request is authorized if all the resource_paths in the request's
-        # policy are authorized.
-        if all(
-            # A resource_path is authorized if authorized_resource_paths
-            # contains the path or any of its prefixes
-            any(
-                arborist.is_path_prefix_of_path(authorized_resource_path, resource_path)
-                for authorized_resource_path in authorized_resource_paths
+    if limit:
+        async with db_transaction() as db_session:
+            authorized_requests, next_cursor = await get_requests_page(
+                db_session,
+                limit,
+                cursor,
+                is_authorized=is_authorized,
+                final=(not active),
+                filters=filter_dict,
+                columns=columns,
+                include_archived=include_archived,
             )
-            for resource_path in resource_paths
-        ):
-            authorized_requests.append(r)
+        return get_json_response(authorized_requests, fields, next_cursor)
 
-    return [r.to_dict() for r in authorized_requests]
+    query = get_filtered_requests_query(
+        final=(not active),
+        filters=filter_dict,
+        after=decode_cursor(cursor) if cursor else None,
+        columns=columns,
+        include_archived=include_archived,
+    )
+    if stream:
+        return get_streaming_response(query, stream, fields, is_authorized)
+    async with db_transaction() as db_session:
+        requests = (await db_session.execute(query)).all()
+    authorized_requests = [r for r in requests if is_authorized(r.policy_id)]
+    return get_json_response(authorized_requests, fields)
 
 
 @router.get("/request/user", status_code=HTTP_200_OK)
 async def list_user_requests(
     api_request: Request,
+    limit: int = Query(None, ge=1),
+    cursor: str = None,
+    stream: Literal["json", "ndjson"] = None,
+    fields: list[str] = Query(None),
+    include_archived: bool = False,
     auth=Depends(Auth),
-    db_session: AsyncSession = Depends(get_db_session),
 ) -> list:
     """
     List current user's requests.
@@ -197,6 +543,28 @@ async def list_user_requests(
     "policy_id=foo&policy_id=bar" means "the policy is either foo or bar" (same field name).
 
     "policy_id=foo&revoke=False" means "the policy is foo and revoke is false" (different field names).
+
+    Use the "created_after", "created_before", "updated_after" and
+    "updated_before" query parameters to get the requests created or updated
+    in a time range. The start of the range is included and the end is
+    excluded. Dates without a timezone are in UTC.
+
+    Example: `?created_after=2024-01-01&created_before=2024-02-01`
+
+    Use the "limit" query parameter to get results one page at a time. When
+    there are more results, the `X-Next-Cursor` response header contains the
+    value of the "cursor" query parameter to use to get the next page.
+
+    Use the "stream" query parameter to stream the results as they are read
+    from the database, as a JSON array ("stream=json") or as one JSON object
+    per line ("stream=ndjson"). This is recommended for large listings.
+    Streaming cannot be combined with "limit".
+
+    Use the "fields" query parameter to only return some of the fields of the
+    requests. Example: `?fields=request_id&fields=status`
+
+    Requests in a final status that have not been updated for ARCHIVE_AFTER
+    seconds are archived. Use "include_archived=true" to include them.
     """
     # no authz checks because we assume the current user can read
     # their own requests.
@@ -209,14 +577,318 @@ async def list_user_requests(
             "This endpoint does not support tokens that are not linked to a user",
         )
     logger.debug(f"Getting requests for user '{username}' with active = '{active}'")
-    user_requests = await get_filtered_requests(
-        db_session,
-        username,
+    check_stream_param(stream, limit)
+    fields, columns = get_fields_to_select(fields)
+    if limit:
+        async with db_transaction() as db_session:
+            user_requests, next_cursor = await get_requests_page(
+                db_session,
+                limit,
+                cursor,
+                username=username,
+                # if we only want active requests, filter out requests in a final status:
+                final=(not active),
+                filters=filter_dict,
+                columns=columns,
+                include_archived=include_archived,
+            )
+        return get_json_response(user_requests, fields, next_cursor)
+
+    query = get_filtered_requests_query(
+        username=username,
         # if we only want active requests, filter out requests in a final status:
         final=(not active),
         filters=filter_dict,
+        after=decode_cursor(cursor) if cursor else None,
+        columns=columns,
+        include_archived=include_archived,
+    )
+    if stream:
+        return get_streaming_response(query, stream, fields)
+    async with db_transaction() as db_session:
+        user_requests = (await db_session.execute(query)).all()
+    return get_json_response(user_requests, fields)
+
+
+@router.get("/request/stats", status_code=HTTP_200_OK)
+async def get_request_stats(
+    api_request: Request,
+    interval: Literal["hour", "day", "week", "month", "year"] = None,
+    auth=Depends(Auth),
+) -> list:
+    """
+    Count the requests the current user has access to see, grouped by
+    status, policy_id and revoke.
+
+    Use the "interval" query parameter to also group the requests by
+    creation time. Each result then includes a `created_time` field: the
+    start (in UTC) of the hour, day, week, month or year the requests were
+    created in.
+
+    The "active" query parameter and the filters are the same as for
+    `GET /request`. Archived requests are not counted.
+
+    Example: `GET /request/stats?interval=month&status=APPROVED`
+    """
+    filter_dict, active = populate_filters_from_query_params(api_request.query_params)
+    is_authorized = await get_read_authorization_checker(api_request, auth)
+
+    columns = [RequestModel.status, RequestModel.policy_id, RequestModel.revoke]
+    if interval:
+        # `timezone("UTC", ...)` is `... AT TIME ZONE 'UTC'`: truncate the
+        # creation time in UTC, then convert the result back to a timestamp
+        # with a time zone. `date_trunc` only accepts a time zone argument
+        # since Postgres 12
+        columns.append(
+            func.timezone(
+                "UTC",
+                func.date_trunc(
+                    interval, func.timezone("UTC", RequestModel.created_time)
+                ),
+            ).label("created_time")
+        )
+    query = select(*columns, func.count().label("count")).group_by(*columns)
+    query = apply_request_filters(query, final=(not active), filters=filter_dict)
+    query = query.order_by(*columns)
+    async with db_transaction() as db_session:
+        rows = (await db_session.execute(query)).all()
+
+    # filter groups with read access
+    return [row._asdict() for row in rows if is_authorized(row.policy_id)]
+
+
+@router.get("/request/changes", status_code=HTTP_200_OK)
+async def list_request_changes(
+    api_request: Request,
+    since: str = None,
+    limit: int = Query(100, ge=1, le=1000),
+    fields: list[str] = Query(None),
+    auth=Depends(Auth),
+) -> dict:
+    """
+    List the requests the current user has access to see that were created
+    or updated since the "since" cursor, in the order they were last
+    updated. Meant for external systems that keep a copy of the requests in
+    sync.
+
+    Start without a "since" cursor to get all the requests, then use the
+    returned `cursor` to get the next changes. `has_more` is true when there
+    are more changes to get right away.
+
+    Requests updated less than `CHANGES_FEED_LAG` seconds ago (see the
+    configuration) are not returned yet. Deleted and archived requests are
+    not returned: requests are only archived once they have not been updated
+    for ARCHIVE_AFTER seconds, so their last change was already returned.
+
+    Use the "fields" query parameter to only return some of the fields of the
+    requests.
+    """
+    fields, columns = get_fields_to_select(fields)
+    if "updated_time" not in columns:
+        columns = [*columns, "updated_time"]
+    is_authorized = await get_read_authorization_checker(api_request, auth)
+
+    # only return changes old enough that no change with an earlier
+    # updated_time can still be committed
+    changed_before = datetime.now(timezone.utc) - timedelta(
+        seconds=config["CHANGES_FEED_LAG"]
+    )
+    async with db_transaction() as db_session:
+        requests = await get_filtered_requests(
+            db_session,
+            filters={"updated_before": {changed_before}},
+            limit=limit,
+            after=decode_cursor(since) if since else None,
+            columns=columns,
+            order_by_field="updated_time",
+        )
+    authorized_requests = [r for r in requests if is_authorized(r.policy_id)]
+    return {
+        "requests": [{f: getattr(r, f) for f in fields} for r in authorized_requests],
+        # the position of the last request read, even if it is not authorized,
+        # so that the next call does not read it again
+        "cursor": encode_cursor(requests[-1], "updated_time") if requests else since,
+        "has_more": len(requests) == limit,
+    }
+
+
+@router.get("/request/events", status_code=HTTP_200_OK)
+async def stream_request_events(
+    api_request: Request,
+    request_id: uuid.UUID = None,
+    auth=Depends(Auth),
+) -> StreamingResponse:
+    """
+    Stream the changes to the current user's requests as server-sent events,
+    or the changes to a single request if "request_id" is provided. This
+    replaces polling `GET /request/{request_id}` to wait for a status change.
+
+    Each event's type is "created", "updated", "deleted" or "archived" (see
+    ARCHIVE_AFTER in the configuration), and its data is a JSON object
+    whose "request" field is the request's data. Archived requests cannot
+    be followed.
+
+    Users can follow their own requests and the requests they have access to
+    see. The stream ends when the server shuts down or the client is too slow
+    to read the events; clients should then reconnect.
+    """
+    token_claims = await auth.get_token_claims()
+    username = token_claims.get("context", {}).get("user", {}).get("name")
+    if request_id:
+        async with db_transaction() as db_session:
+            query = select(RequestModel).where(RequestModel.request_id == request_id)
+            request = (await db_session.execute(query)).scalar()
+        authorized = False
+        if request and username and request.username == username:
+            authorized = True
+        elif request:
+            existing_policies = await arborist.list_policies(
+                api_request.app.arborist_client, expand=True
+            )
+            authorized = await auth.authorize(
+                "read",
+                arborist.get_resource_paths_for_policy(
+                    existing_policies["policies"], request.policy_id
+                ),
+                throw=False,
+            )
+        if not authorized:
+            # return the same error for unauthorized and not found
+            raise HTTPException(
+                HTTP_404_NOT_FOUND,
+                "Not found",
+            )
+        subscription = await hub.subscribe(request_id=str(request_id))
+    elif username:
+        subscription = await hub.subscribe(username=username)
+    else:
+        raise HTTPException(
+            HTTP_403_FORBIDDEN,
+            "Following the changes to all the current user's requests is not supported for tokens that are not linked to a user. Provide a 'request_id'.",
+        )
+
+    return StreamingResponse(
+        get_request_events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def get_request_events(subscription: Subscription):
+    """
+    Yield the subscription's notifications as server-sent events, with
+    keep-alive comments when there are no changes.
+    """
+    try:
+        # let the client know the subscription is active
+        yield ": subscribed\n\n"
+        while True:
+            try:
+                notification = await asyncio.wait_for(
+                    subscription.queue.get(), EVENTS_KEEPALIVE_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if notification is None:
+                # the subscription was closed
+                break
+            yield f"event: {notification['event']}\ndata: {json.dumps(notification)}\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@router.get("/request/status_events", status_code=HTTP_200_OK)
+async def list_request_status_events(
+    api_request: Request,
+    start: str,
+    end: str = None,
+    request_id: uuid.UUID = None,
+    stream: Literal["json", "ndjson"] = "json",
+    auth=Depends(Auth),
+) -> list:
+    """
+    Get the history of the status changes of the requests the current user
+    has access to see, between "start" (included) and "end" (excluded,
+    defaults to now). Dates without a timezone are in UTC.
+
+    Each event has the request's "request_id", "username" and "policy_id",
+    the "old_status" (null for new requests), the new "status" and the
+    "event_time". Events are ordered by time, and streamed as a JSON array
+    ("stream=json", the default) or as one JSON object per line
+    ("stream=ndjson").
+
+    Use the "request_id" query parameter to get the history of a single
+    request.
+
+    Example: `GET /request/status_events?start=2024-01-01&end=2024-02-01`
+    """
+    try:
+        start = parse_datetime(start)
+        end = parse_datetime(end) if end else datetime.now(timezone.utc)
+    except ValueError:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            "The 'start' and 'end' parameters must be ISO 8601 dates",
+        )
+    is_authorized = await get_read_authorization_checker(api_request, auth)
+
+    query = (
+        select(*RequestStatusEvent.__table__.c)
+        .where(RequestStatusEvent.event_time >= start)
+        .where(RequestStatusEvent.event_time < end)
+        .order_by(RequestStatusEvent.event_time, RequestStatusEvent.id)
     )
-    return [r.to_dict() for r in user_requests]
+    if request_id:
+        query = query.where(RequestStatusEvent.request_id == request_id)
+    return get_streaming_response(query, stream, STATUS_EVENT_FIELDS, is_authorized)
+
+
+@router.post("/request/batch_get", status_code=HTTP_200_OK)
+async def batch_get_requests(
+    api_request: Request,
+    request_ids: list[uuid.UUID] = Body(..., embed=True),
+    auth=Depends(Auth),
+) -> dict:
+    """
+    Get up to BATCH_GET_MAX_IDS requests at once, with a single query and a
+    single authorization lookup, instead of one `GET /request/{request_id}`
+    call per request.
+
+    Returns the requests as `{request_id: request}`, including the archived
+    requests. Requests that do not exist or that the current user does not
+    have access to see are not included.
+    """
+    logger.debug(f"Getting {len(request_ids)} requests")
+    if len(request_ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST,
+            f"Cannot get more than {BATCH_GET_MAX_IDS} requests at once",
+        )
+    if not request_ids:
+        return {}
+
+    # a single array parameter, so the statement is the same for any number
+    # of IDs
+    query = select(RequestModel).where(
+        RequestModel.request_id
+        == any_(bindparam("request_ids", list(set(request_ids)), type_=ARRAY(UUID)))
+    )
+    async with db_transaction() as db_session:
+        requests = list((await db_session.scalars(query)).all())
+        found_ids = {str(request.request_id) for request in requests}
+        missing_ids = [i for i in set(request_ids) if str(i) not in found_ids]
+        if missing_ids:
+            requests.extend(await get_archived_requests(db_session, missing_ids))
+    if not requests:
+        return {}
+
+    is_authorized = await get_read_authorization_checker(api_request, auth)
+    return {
+        str(request.request_id): request.to_dict()
+        for request in requests
+        if is_authorized(request.policy_id)
+    }
 
 
 @router.get("/request/{request_id}", status_code=HTTP_200_OK)
@@ -224,13 +896,14 @@ async def get_request(
     api_request: Request,
     request_id: uuid.UUID,
     auth=Depends(Auth),
-    db_session: AsyncSession = Depends(get_db_session),
 ) -> dict:
+    """
+    Get an access request. Archived requests are returned as well.
+    """
     logger.debug(f"Getting request '{request_id}'")
 
-    query = select(RequestModel).where(RequestModel.request_id == request_id)
-    result = await db_session.execute(query)
-    request = result.scalar()
+    async with db_transaction() as db_session:
+        request, _ = await get_request_or_archived_request(db_session, request_id)
     if not request:
         raise HTTPException(
             HTTP_404_NOT_FOUND,
@@ -266,7 +939,6 @@ async def check_user_resource_paths(
     resource_paths: list = Body(..., embed=True),
     permissions: list = Body(None, embed=True),
     auth=Depends(Auth),
-    db_session: AsyncSession = Depends(get_db_session),
 ) -> dict:
     """
     Return whether the current user has already requested access to the
@@ -287,9 +959,10 @@ async def check_user_resource_paths(
             HTTP_403_FORBIDDEN,
             "This endpoint does not support tokens that are not linked to a user",
         )
-    user_requests = await get_filtered_requests(
-        db_session, username, draft=False, final=False
-    )
+    async with db_transaction() as db_session:
+        user_requests = await get_filtered_requests(
+            db_session, username=username, draft=False, final=False
+        )
     positive_requests = [r for r in user_requests if not r.revoke]
     existing_policies = await arborist.list_policies(
         api_request.app.arborist_client, expand=True
@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, FastAPI, Request
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
-from ..db import get_db_session
+from ..circuit_breaker import get_circuit_breakers_state
+from ..db import get_db_pool_state, get_db_session
+from ..rate_limiter import get_rate_limiters_state
 
 
 router = APIRouter()
@@ -21,5 +23,32 @@ async def get_status(
     return dict(status="OK")
 
 
+@router.get("/_circuit_breakers")
+def get_circuit_breakers() -> dict:
+    """
+    Get the state of the circuit breakers protecting each external call
+    destination host, in this worker process.
+    """
+    return get_circuit_breakers_state()
+
+
+@router.get("/_rate_limiters")
+def get_rate_limiters() -> dict:
+    """
+    Get the usage of the concurrency and rate limits applied to each external
+    call destination host, in this worker process.
+    """
+    return get_rate_limiters_state()
+
+
+@router.get("/_db_pool")
+def get_db_pool() -> dict:
+    """
+    Get the usage of the database connection pool, and the time spent
+    waiting for a connection, in this worker process.
+    """
+    return get_db_pool_state()
+
+
 def init_app(app: FastAPI) -> None:
     app.include_router(router, tags=["System"])
@@ -0,0 +1,46 @@
+"""
+Append-only history of the status changes of requests.
+
+Each new request and each status update is recorded in the
+`request_status_events` table, in the same transaction as the change, so
+the history can be used to audit the workflow (for example, how long
+requests take to be approved) without scraping logs.
+"""
+
+
+from sqlalchemy import insert
+
+from .db import RequestStatusEvent
+
+
+async def record_status_changes(
+    db_session, requests: list, old_statuses: dict = None
+) -> None:
+    """
+    Record the current status of each of the requests as a status change.
+    The events are inserted when the session's transaction is committed.
+
+    Args:
+        db_session (AsyncSession)
+        requests (list[Request]): the new or updated requests
+        old_statuses (dict): {request_id: status before the update}. Not
+            provided for new requests
+    """
+    if not requests:
+        return
+    old_statuses = old_statuses or {}
+    await db_session.execute(
+        insert(RequestStatusEvent),
+        [
+            {
+                "request_id": request.request_id,
+                "username": request.username,
+                "policy_id": request.policy_id,
+                "old_status": old_statuses.get(request.request_id),
+                "status": request.status,
+                # the status changed when the request was last updated
+                "event_time": request.updated_time,
+            }
+            for request in requests
+        ],
+    )
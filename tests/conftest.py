@@ -16,7 +16,9 @@ environ["REQUESTOR_CONFIG_PATH"] = os.path.join(
 
 from requestor.app import app_init
 from requestor.arborist import get_auto_policy_id
+from requestor.circuit_breaker import reset_circuit_breakers
 from requestor.config import config
+from requestor.rate_limiter import reset_rate_limiters
 from requestor.db import Base, get_db_engine_and_sessionmaker, initialize_db
 
 
@@ -300,6 +302,13 @@ def mock_arborist_requests(request):
                                 ],
                                 "roles": [],
                             },
+                            {
+                                "id": "test-policy-with-batched-external-call",
+                                "resource_paths": [
+                                    "/resource-with-batched-external-call/resource"
+                                ],
+                                "roles": [],
+                            },
                             {
                                 "id": "test-policy-with-redirect-and-external-call",
                                 "resource_paths": [
@@ -380,3 +389,14 @@ def arborist_authorized(mock_arborist_requests):
     "mock_arborist_requests(authorized=False)" in the test itself
     """
     mock_arborist_requests()
+
+
+@pytest.fixture(autouse=True)
+def reset_external_call_state():
+    """
+    Circuit breakers and rate limiters are kept in memory. Reset them after
+    every test so that external calls in one test do not affect other tests.
+    """
+    yield
+    reset_circuit_breakers()
+    reset_rate_limiters()
@@ -0,0 +1,67 @@
+from datetime import datetime
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from requestor.config import config
+from tests.migrations.conftest import MigrationRunner
+from tests.migrations.test_migration_b44035308332 import get_indexes
+
+
+async def insert_request(db_session, status):
+    date = str(datetime.now())
+    await db_session.execute(
+        text(
+            f"INSERT INTO requests(request_id, username, policy_id, revoke, status, created_time, updated_time) VALUES ('{uuid.uuid4()}', 'username', 'test-policy', false, '{status}', '{date}', '{date}')"
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_1e058444ee06_upgrade_and_downgrade(
+    db_session, access_token_user_only_patcher
+):
+    # before "Make the index on open requests unique" migration
+    migration_runner = MigrationRunner()
+    await migration_runner.upgrade("a91f5a501c24")
+    indexes = await get_indexes(db_session)
+    assert "UNIQUE" not in indexes["ix_requests_open_username_policy_id_revoke"]
+
+    # insert duplicate requests. The requests in a final status are not
+    # duplicates
+    open_status = config["DEFAULT_INITIAL_STATUS"]
+    final_status = config["FINAL_STATUSES"][-1]
+    for status in [open_status, open_status, final_status, final_status]:
+        await insert_request(db_session, status)
+    await db_session.commit()
+
+    # the migration fails when there are open duplicates
+    with pytest.raises(Exception, match="more than 1 open request"):
+        await migration_runner.upgrade("1e058444ee06")
+
+    # resolve the duplicates, and run the migration
+    await db_session.execute(
+        text(
+            f"UPDATE requests SET status = '{final_status}' WHERE request_id IN (SELECT request_id FROM requests WHERE status = '{open_status}' LIMIT 1)"
+        )
+    )
+    await db_session.commit()
+    await migration_runner.upgrade("1e058444ee06")
+    indexes = await get_indexes(db_session)
+    assert "UNIQUE" in indexes["ix_requests_open_username_policy_id_revoke"]
+
+    # open duplicates can no longer be inserted, but requests in a final
+    # status can
+    await insert_request(db_session, final_status)
+    await db_session.commit()
+    with pytest.raises(IntegrityError):
+        await insert_request(db_session, open_status)
+    await db_session.rollback()
+
+    # downgrade
+    await migration_runner.downgrade("a91f5a501c24")
+    indexes = await get_indexes(db_session)
+    assert "UNIQUE" not in indexes["ix_requests_open_username_policy_id_revoke"]
+    await db_session.commit()
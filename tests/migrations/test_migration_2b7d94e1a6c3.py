@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import text
+
+from tests.migrations.conftest import MigrationRunner
+
+
+async def get_dead_letter_columns(db_session):
+    return (
+        (
+            await db_session.execute(
+                text(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name = 'external_call_dead_letters'"
+                )
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+
+@pytest.mark.asyncio
+async def test_2b7d94e1a6c3_upgrade_and_downgrade(
+    db_session, access_token_user_only_patcher
+):
+    # before "Add claimed_until column to external_call_dead_letters" migration
+    migration_runner = MigrationRunner()
+    await migration_runner.upgrade("f3a8c1d2b6e4")
+    insert_stmt = 'INSERT INTO external_call_dead_letters("external_call_id", "request_id", "payload", "error", "attempts", "created_time", "last_attempt_time") VALUES (\'my_call\', \'571c6a1a-f21f-11ea-adc1-0242ac120002\', \'{"username": "username"}\', \'error\', 1, now(), now())'
+    await db_session.execute(text(insert_stmt))
+    await db_session.commit()
+    assert "claimed_until" not in await get_dead_letter_columns(db_session)
+
+    # run the migration: existing dead letters should not be claimed
+    await migration_runner.upgrade("2b7d94e1a6c3")
+    assert "claimed_until" in await get_dead_letter_columns(db_session)
+    data = list(
+        (
+            await db_session.execute(
+                text(
+                    "SELECT external_call_id, claimed_until FROM external_call_dead_letters"
+                )
+            )
+        ).all()
+    )
+    assert len(data) == 1
+    assert data[0].external_call_id == "my_call"
+    assert data[0].claimed_until is None
+    await db_session.commit()
+
+    # downgrade: the column should not exist anymore
+    await migration_runner.downgrade("f3a8c1d2b6e4")
+    assert "claimed_until" not in await get_dead_letter_columns(db_session)
@@ -0,0 +1,28 @@
+import pytest
+
+from tests.migrations.conftest import MigrationRunner
+from tests.migrations.test_migration_b44035308332 import get_indexes
+
+
+@pytest.mark.asyncio
+async def test_5d3f0c7e2b91_upgrade_and_downgrade(
+    db_session, access_token_user_only_patcher
+):
+    # before "Add (status, updated_time) index" migration
+    migration_runner = MigrationRunner()
+    await migration_runner.upgrade("1e058444ee06")
+    indexes = await get_indexes(db_session)
+    assert "ix_requests_status_updated_time" not in indexes
+    await db_session.commit()
+
+    # run the migration
+    await migration_runner.upgrade("5d3f0c7e2b91")
+    indexes = await get_indexes(db_session)
+    assert "(status, updated_time)" in indexes["ix_requests_status_updated_time"]
+    await db_session.commit()
+
+    # downgrade
+    await migration_runner.downgrade("1e058444ee06")
+    indexes = await get_indexes(db_session)
+    assert "ix_requests_status_updated_time" not in indexes
+    await db_session.commit()
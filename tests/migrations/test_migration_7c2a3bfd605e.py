@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from tests.migrations.conftest import MigrationRunner
+
+
+@pytest.mark.asyncio
+async def test_7c2a3bfd605e_upgrade_and_downgrade(
+    db_session, access_token_user_only_patcher
+):
+    # before "Add external_call_dead_letters table" migration
+    migration_runner = MigrationRunner()
+    await migration_runner.upgrade("42cbae986650")
+
+    with pytest.raises(
+        ProgrammingError, match='relation "external_call_dead_letters" does not exist'
+    ):
+        await db_session.execute(text("SELECT * FROM external_call_dead_letters"))
+    await db_session.rollback()
+
+    # run the migration: the table should now exist
+    await migration_runner.upgrade("7c2a3bfd605e")
+    insert_stmt = 'INSERT INTO external_call_dead_letters("external_call_id", "request_id", "payload", "error", "attempts", "created_time", "last_attempt_time") VALUES (\'my_call\', \'571c6a1a-f21f-11ea-adc1-0242ac120002\', \'{"username": "username"}\', \'error\', 1, now(), now())'
+    await db_session.execute(text(insert_stmt))
+    data = list(
+        (
+            await db_session.execute(
+                text(
+                    "SELECT id, external_call_id, payload FROM external_call_dead_letters"
+                )
+            )
+        ).all()
+    )
+    assert len(data) == 1
+    assert data[0].external_call_id == "my_call"
+    assert data[0].payload == {"username": "username"}
+    await db_session.commit()
+
+    # downgrade: the table should not exist anymore
+    await migration_runner.downgrade("42cbae986650")
+    with pytest.raises(
+        ProgrammingError, match='relation "external_call_dead_letters" does not exist'
+    ):
+        await db_session.execute(text("SELECT * FROM external_call_dead_letters"))
+    await db_session.rollback()
@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from tests.migrations.conftest import MigrationRunner
+
+
+@pytest.mark.asyncio
+async def test_8b6a2e4f1c37_upgrade_and_downgrade(
+    db_session, access_token_user_only_patcher
+):
+    # before "Create request_status_events table" migration
+    migration_runner = MigrationRunner()
+    await migration_runner.upgrade("d7e41c3a9b02")
+
+    with pytest.raises(
+        ProgrammingError, match='relation "request_status_events" does not exist'
+    ):
+        await db_session.execute(text("SELECT * FROM request_status_events"))
+    await db_session.rollback()
+
+    # run the migration: the table should now exist
+    await migration_runner.upgrade("8b6a2e4f1c37")
+    insert_stmt = "INSERT INTO request_status_events(request_id, username, policy_id, old_status, status, event_time) VALUES ('571c6a1a-f21f-11ea-adc1-0242ac120002', 'username', 'test-policy', 'DRAFT', 'APPROVED', now())"
+    await db_session.execute(text(insert_stmt))
+    data = list(
+        (
+            await db_session.execute(
+                text("SELECT id, old_status, status FROM request_status_events")
+            )
+        ).all()
+    )
+    assert len(data) == 1
+    assert (data[0].old_status, data[0].status) == ("DRAFT", "APPROVED")
+    index = (
+        await db_session.execute(
+            text(
+                "SELECT indexdef FROM pg_indexes WHERE indexname = 'ix_request_status_events_event_time'"
+            )
+        )
+    ).scalar()
+    assert "USING brin (event_time)" in index
+    await db_session.commit()
+
+    # downgrade: the table should not exist anymore
+    await migration_runner.downgrade("d7e41c3a9b02")
+    with pytest.raises(
+        ProgrammingError, match='relation "request_status_events" does not exist'
+    ):
+        await db_session.execute(text("SELECT * FROM request_status_events"))
+    await db_session.rollback()
@@ -0,0 +1,35 @@
+import pytest
+
+from tests.migrations.conftest import MigrationRunner
+from tests.migrations.test_migration_b44035308332 import get_indexes
+
+
+@pytest.mark.asyncio
+async def test_a91f5a501c24_upgrade_and_downgrade(
+    db_session, access_token_user_only_patcher
+):
+    # before "Add created_time and updated_time indexes" migration
+    migration_runner = MigrationRunner()
+    await migration_runner.upgrade("b44035308332")
+    indexes = await get_indexes(db_session)
+    assert "ix_requests_created_time_request_id" not in indexes
+    assert "ix_requests_updated_time_request_id" not in indexes
+    await db_session.commit()
+
+    # run the migration
+    await migration_runner.upgrade("a91f5a501c24")
+    indexes = await get_indexes(db_session)
+    assert "(created_time, request_id)" in (
+        indexes["ix_requests_created_time_request_id"]
+    )
+    assert "(updated_time, request_id)" in (
+        indexes["ix_requests_updated_time_request_id"]
+    )
+    await db_session.commit()
+
+    # downgrade
+    await migration_runner.downgrade("b44035308332")
+    indexes = await get_indexes(db_session)
+    assert "ix_requests_created_time_request_id" not in indexes
+    assert "ix_requests_updated_time_request_id" not in indexes
+    await db_session.commit()
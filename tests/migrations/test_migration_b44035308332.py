@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import text
+
+from requestor.config import config
+from tests.migrations.conftest import MigrationRunner
+
+
+async def get_indexes(db_session) -> dict:
+    result = await db_session.execute(
+        text("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'requests'")
+    )
+    return {row.indexname: row.indexdef for row in result.all()}
+
+
+@pytest.mark.asyncio
+async def test_b44035308332_upgrade_and_downgrade(
+    db_session, access_token_user_only_patcher
+):
+    # before "Add indexes for username, policy_id and revoke lookups" migration
+    migration_runner = MigrationRunner()
+    await migration_runner.upgrade("7c2a3bfd605e")
+    indexes = await get_indexes(db_session)
+    assert "ix_requests_username_policy_id_revoke" not in indexes
+    assert "ix_requests_open_username_policy_id_revoke" not in indexes
+    await db_session.commit()
+
+    # run the migration
+    await migration_runner.upgrade("b44035308332")
+    indexes = await get_indexes(db_session)
+    assert "(username, policy_id, revoke)" in (
+        indexes["ix_requests_username_policy_id_revoke"]
+    )
+    open_index = indexes["ix_requests_open_username_policy_id_revoke"]
+    assert "(username, policy_id, revoke) WHERE" in open_index
+    for status in config["FINAL_STATUSES"]:
+        assert f"'{status}'" in open_index
+    await db_session.commit()
+
+    # downgrade
+    await migration_runner.downgrade("7c2a3bfd605e")
+    indexes = await get_indexes(db_session)
+    assert "ix_requests_username_policy_id_revoke" not in indexes
+    assert "ix_requests_open_username_policy_id_revoke" not in indexes
+    await db_session.commit()
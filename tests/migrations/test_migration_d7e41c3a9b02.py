@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from tests.migrations.conftest import MigrationRunner
+
+
+@pytest.mark.asyncio
+async def test_d7e41c3a9b02_upgrade_and_downgrade(
+    db_session, access_token_user_only_patcher
+):
+    # before "Create requests_archive table" migration
+    migration_runner = MigrationRunner()
+    await migration_runner.upgrade("5d3f0c7e2b91")
+
+    with pytest.raises(
+        ProgrammingError, match='relation "requests_archive" does not exist'
+    ):
+        await db_session.execute(text("SELECT * FROM requests_archive"))
+    await db_session.rollback()
+
+    # run the migration: the table should now exist, with the same columns
+    # as the requests table
+    await migration_runner.upgrade("d7e41c3a9b02")
+    insert_stmt = "INSERT INTO requests_archive(request_id, username, policy_id, revoke, status, created_time, updated_time, resource_id, resource_display_name, archived_time) SELECT '571c6a1a-f21f-11ea-adc1-0242ac120002', 'username', 'test-policy', false, 'REJECTED', now(), now(), 'uniqid', 'My Resource', now()"
+    await db_session.execute(text(insert_stmt))
+    data = list(
+        (
+            await db_session.execute(
+                text(
+                    "SELECT request_id, username, policy_id, revoke, status FROM requests UNION ALL SELECT request_id, username, policy_id, revoke, status FROM requests_archive"
+                )
+            )
+        ).all()
+    )
+    assert len(data) == 1
+    assert data[0].username == "username"
+    await db_session.commit()
+
+    # downgrade: the table should not exist anymore
+    await migration_runner.downgrade("5d3f0c7e2b91")
+    with pytest.raises(
+        ProgrammingError, match='relation "requests_archive" does not exist'
+    ):
+        await db_session.execute(text("SELECT * FROM requests_archive"))
+    await db_session.rollback()
@@ -0,0 +1,111 @@
+import pytest
+from sqlalchemy import text
+
+from requestor.config import config
+from tests.migrations.conftest import MigrationRunner
+from tests.migrations.test_migration_b44035308332 import get_indexes
+
+
+async def get_status_columns(db_session) -> dict:
+    result = await db_session.execute(
+        text(
+            "SELECT table_name, udt_name, ordinal_position FROM information_schema.columns WHERE table_name IN ('requests', 'requests_archive') AND column_name = 'status'"
+        )
+    )
+    return {row.table_name: row for row in result.all()}
+
+
+async def get_status_column_types(db_session) -> dict:
+    columns = await get_status_columns(db_session)
+    return {table: column.udt_name for table, column in columns.items()}
+
+
+async def get_status_column_positions(db_session) -> dict:
+    columns = await get_status_columns(db_session)
+    return {table: column.ordinal_position for table, column in columns.items()}
+
+
+async def get_status_counts(db_session) -> dict:
+    result = await db_session.execute(
+        text(
+            "SELECT status::text, count(*) FROM (SELECT status FROM requests UNION ALL SELECT status FROM requests_archive) s GROUP BY status"
+        )
+    )
+    return dict(result.all())
+
+
+@pytest.mark.asyncio
+async def test_f3a8c1d2b6e4_upgrade_and_downgrade(
+    db_session, access_token_user_only_patcher
+):
+    # before "Store the status of requests as a Postgres enum" migration
+    migration_runner = MigrationRunner()
+    await migration_runner.upgrade("8b6a2e4f1c37")
+    assert await get_status_column_types(db_session) == {
+        "requests": "varchar",
+        "requests_archive": "varchar",
+    }
+
+    # requests with each status, including a status that is not in
+    # ALLOWED_REQUEST_STATUSES anymore
+    statuses = [*config["ALLOWED_REQUEST_STATUSES"], "OLD_STATUS"]
+    await db_session.execute(
+        text(
+            "INSERT INTO requests(request_id, username, policy_id, revoke, status, created_time, updated_time) SELECT md5(i::text)::uuid, 'user_' || i, 'test-policy', false, (CAST(:statuses AS varchar[]))[i % :n + 1], now(), now() FROM generate_series(1, 100) i"
+        ),
+        {"statuses": statuses, "n": len(statuses)},
+    )
+    await db_session.execute(
+        text(
+            "INSERT INTO requests_archive(request_id, username, policy_id, revoke, status, created_time, updated_time, archived_time) SELECT md5('archived')::uuid, 'username', 'test-policy', false, :status, now(), now(), now()"
+        ),
+        {"status": config["FINAL_STATUSES"][0]},
+    )
+    status_counts = await get_status_counts(db_session)
+    assert sum(status_counts.values()) == 101
+    positions = await get_status_column_positions(db_session)
+    await db_session.commit()
+
+    # run the migration: the statuses are converted in place without
+    # changing the data, and the indexes on `status` are recreated
+    await migration_runner.upgrade("f3a8c1d2b6e4")
+    assert await get_status_column_types(db_session) == {
+        "requests": "request_status",
+        "requests_archive": "request_status",
+    }
+    assert await get_status_column_positions(db_session) == positions
+    assert await get_status_counts(db_session) == status_counts
+    enum_values = (
+        (
+            await db_session.execute(
+                text("SELECT unnest(enum_range(NULL::request_status))::text")
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert enum_values == statuses
+    indexes = await get_indexes(db_session)
+    assert "(status, updated_time)" in indexes["ix_requests_status_updated_time"]
+    open_index = indexes["ix_requests_open_username_policy_id_revoke"]
+    for status in config["FINAL_STATUSES"]:
+        assert f"'{status}'" in open_index
+    await db_session.commit()
+
+    # downgrade
+    await migration_runner.downgrade("8b6a2e4f1c37")
+    assert await get_status_column_types(db_session) == {
+        "requests": "varchar",
+        "requests_archive": "varchar",
+    }
+    assert await get_status_column_positions(db_session) == positions
+    assert await get_status_counts(db_session) == status_counts
+    indexes = await get_indexes(db_session)
+    assert "(status, updated_time)" in indexes["ix_requests_status_updated_time"]
+    assert "ix_requests_open_username_policy_id_revoke" in indexes
+    assert (
+        await db_session.execute(
+            text("SELECT count(*) FROM pg_type WHERE typname = 'request_status'")
+        )
+    ).scalar_one() == 0
+    await db_session.commit()
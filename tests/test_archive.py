@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta, timezone
+
+from requestor.archive import archive_final_requests
+from requestor.config import config
+from requestor.notifications import hub
+from tests.test_draft_expiry import create_requests, set_updated_time
+from tests.test_notifications import get_notification
+
+
+def setup_archived_request(client, monkeypatch) -> list:
+    """
+    Create 3 requests and archive the 1st one: it has a final status and
+    has not been updated for 2 days. The 2nd one has a final status but was
+    updated recently, and the 3rd one was not updated for 2 days but does
+    not have a final status.
+    """
+    monkeypatch.setitem(config, "ARCHIVE_AFTER", 24 * 3600)
+    # archive the requests in several batches
+    monkeypatch.setitem(config, "ARCHIVE_BATCH_SIZE", 1)
+    request_ids = create_requests(
+        client, ["requestor_user", "other_user", "third_user"]
+    )
+    for request_id in request_ids[:2]:
+        res = client.put(
+            f"/request/{request_id}", json={"status": config["FINAL_STATUSES"][0]}
+        )
+        assert res.status_code == 200, res.text
+    two_days_ago = datetime.now(timezone.utc) - timedelta(days=2)
+    client.portal.call(set_updated_time, [request_ids[0], request_ids[2]], two_days_ago)
+
+    assert client.portal.call(archive_final_requests) == 1
+    assert client.portal.call(archive_final_requests) == 0
+    return request_ids
+
+
+def test_archive_final_requests(client, monkeypatch):
+    request_ids = setup_archived_request(client, monkeypatch)
+    headers = {"Authorization": "bearer 1.2.3"}
+
+    res = client.get("/request", headers=headers)
+    assert res.status_code == 200, res.text
+    assert sorted(r["request_id"] for r in res.json()) == sorted(request_ids[1:])
+
+    # the archived request is included with `include_archived`, unchanged
+    res = client.get("/request", params={"include_archived": True}, headers=headers)
+    assert res.status_code == 200, res.text
+    requests = res.json()
+    assert [r["request_id"] for r in requests] == request_ids
+    assert requests[0]["status"] == config["FINAL_STATUSES"][0]
+    assert requests[0]["username"] == "requestor_user"
+
+
+def test_get_archived_requests(client, monkeypatch):
+    """
+    The endpoints for a single request, and `POST /request/batch_get`,
+    should fall back to the archived requests.
+    """
+    request_ids = setup_archived_request(client, monkeypatch)
+    headers = {"Authorization": "bearer 1.2.3"}
+    res = client.get("/request", params={"include_archived": True}, headers=headers)
+    assert res.status_code == 200, res.text
+    archived_request = res.json()[0]
+    assert archived_request["request_id"] == request_ids[0]
+
+    res = client.get(f"/request/{request_ids[0]}", headers=headers)
+    assert res.status_code == 200, res.text
+    assert res.json() == archived_request
+
+    res = client.post(
+        "/request/batch_get", json={"request_ids": request_ids}, headers=headers
+    )
+    assert res.status_code == 200, res.text
+    assert sorted(res.json()) == sorted(request_ids)
+    assert res.json()[request_ids[0]] == archived_request
+
+    # archived requests cannot be updated
+    res = client.put(f"/request/{request_ids[0]}", json={"status": "APPROVED"})
+    assert res.status_code == 400, res.text
+    assert "archived" in res.json()["detail"]
+
+    res = client.delete(f"/request/{request_ids[0]}")
+    assert res.status_code == 200, res.text
+    res = client.get(f"/request/{request_ids[0]}", headers=headers)
+    assert res.status_code == 404, res.text
+    res = client.get("/request", params={"include_archived": True}, headers=headers)
+    assert res.status_code == 200, res.text
+    assert [r["request_id"] for r in res.json()] == request_ids[1:]
+
+
+def test_archive_notifications(client, monkeypatch, access_token_user_only_patcher):
+    """
+    Archiving a request should notify the subscribers to the request.
+    """
+    monkeypatch.setitem(config, "ARCHIVE_AFTER", 24 * 3600)
+    request_ids = create_requests(client, ["requestor_user"])
+    res = client.put(
+        f"/request/{request_ids[0]}", json={"status": config["FINAL_STATUSES"][0]}
+    )
+    assert res.status_code == 200, res.text
+    two_days_ago = datetime.now(timezone.utc) - timedelta(days=2)
+    client.portal.call(set_updated_time, request_ids, two_days_ago)
+    res = client.get(f"/request/{request_ids[0]}")
+    assert res.status_code == 200, res.text
+    request_data = res.json()
+
+    subscription = client.portal.call(hub.subscribe, None, request_ids[0])
+    assert client.portal.call(archive_final_requests) == 1
+    notification = client.portal.call(get_notification, subscription)
+    assert notification == {"event": "archived", "request": request_data}
+    assert subscription.queue.empty()
+    hub.unsubscribe(subscription)
+
+
+def test_list_requests_include_archived(client, monkeypatch):
+    """
+    `include_archived` can be combined with the other parameters of the list
+    endpoints.
+    """
+    request_ids = setup_archived_request(client, monkeypatch)
+    headers = {"Authorization": "bearer 1.2.3"}
+
+    res = client.get(
+        "/request",
+        params={"include_archived": True, "username": "requestor_user"},
+        headers=headers,
+    )
+    assert res.status_code == 200, res.text
+    assert [r["request_id"] for r in res.json()] == request_ids[:1]
+
+    res = client.get(
+        "/request",
+        params={"include_archived": True, "limit": 1, "fields": "request_id"},
+        headers=headers,
+    )
+    assert res.status_code == 200, res.text
+    assert res.json() == [{"request_id": request_ids[0]}]
+    res = client.get(
+        "/request",
+        params={
+            "include_archived": True,
+            "limit": 5,
+            "cursor": res.headers["X-Next-Cursor"],
+        },
+        headers=headers,
+    )
+    assert res.status_code == 200, res.text
+    assert [r["request_id"] for r in res.json()] == request_ids[1:]
+
+    res = client.get(
+        "/request",
+        params={"include_archived": True, "stream": "ndjson"},
+        headers=headers,
+    )
+    assert res.status_code == 200, res.text
+    assert len(res.text.splitlines()) == 3
+
+
+def test_list_user_requests_include_archived(
+    client, monkeypatch, access_token_user_only_patcher
+):
+    request_ids = setup_archived_request(client, monkeypatch)
+    headers = {"Authorization": "bearer 1.2.3"}
+
+    res = client.get("/request/user", headers=headers)
+    assert res.status_code == 200, res.text
+    assert res.json() == []
+
+    res = client.get(
+        "/request/user", params={"include_archived": True}, headers=headers
+    )
+    assert res.status_code == 200, res.text
+    assert [r["request_id"] for r in res.json()] == request_ids[:1]
@@ -0,0 +1,172 @@
+import asyncio
+import mock
+import pytest
+import time
+from types import SimpleNamespace
+
+from requestor.batching import ExternalCallBatcher
+from requestor.config import config
+from requestor.dead_letters import group_dead_letters
+from tests.test_dead_letters import get_dead_letters
+
+
+def create_requests(client, usernames):
+    request_ids = []
+    for username in usernames:
+        data = {
+            "username": username,
+            "policy_id": "test-policy-with-batched-external-call",
+            "status": "CREATED",
+        }
+        res = client.post("/request", json=data)
+        assert res.status_code == 201, res.text
+        request_ids.append(res.json()["request_id"])
+    return request_ids
+
+
+def wait_for_calls(mock_func, call_count):
+    # `max_wait` is 0.5s in the test config
+    for _ in range(50):
+        if mock_func.call_count >= call_count:
+            break
+        time.sleep(0.1)
+
+
+def test_batched_external_calls(client):
+    """
+    Status updates for an external call config with `batch` enabled should
+    be sent together, in batches of up to `max_size`.
+    """
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        request_ids = create_requests(client, ["user1", "user2", "user3"])
+        wait_for_calls(mock_requests.post, 2)
+
+        assert mock_requests.post.call_count == 2
+        assert mock_requests.post.call_args_list[0] == mock.call(
+            "https://batch_system/access",
+            json={"events": [{"request": request_ids[0]}, {"request": request_ids[1]}]},
+            headers={},
+        )
+        assert mock_requests.post.call_args_list[1] == mock.call(
+            "https://batch_system/access",
+            json={"events": [{"request": request_ids[2]}]},
+            headers={},
+        )
+
+
+def test_failed_batched_external_calls(client):
+    """
+    When a batch still fails after all retries, the status updates should not
+    be reverted, and each event should be saved to the dead-letter table.
+    """
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        mock_requests.post.return_value = "this will cause an exception"
+        request_ids = create_requests(client, ["user1", "user2"])
+        wait_for_calls(mock_requests.post, 2)
+
+        dead_letters = []
+        for _ in range(50):
+            dead_letters = client.portal.call(get_dead_letters)
+            if dead_letters:
+                break
+            time.sleep(0.1)
+
+    assert sorted(str(d.request_id) for d in dead_letters) == sorted(request_ids)
+    assert all(d.external_call_id == "let_batch_system_know" for d in dead_letters)
+
+
+@pytest.mark.asyncio
+async def test_stopping_batcher_sends_queued_events(
+    db_session, access_token_user_only_patcher
+):
+    batcher = ExternalCallBatcher("let_batch_system_know", max_size=10, max_wait=60)
+    batcher.start()
+    for i in range(3):
+        batcher.add({"request_id": f"request_{i}"})
+
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        await batcher.stop()
+        mock_requests.post.assert_called_once_with(
+            "https://batch_system/access",
+            json={"events": [{"request": f"request_{i}"} for i in range(3)]},
+            headers={},
+        )
+
+
+@pytest.mark.asyncio
+async def test_stopping_batcher_sends_events_being_batched(
+    db_session, access_token_user_only_patcher
+):
+    """
+    Status updates that the batcher already took from the queue, while it
+    waits for more updates to fill the batch, should be sent when it stops.
+    """
+    batcher = ExternalCallBatcher("let_batch_system_know", max_size=10, max_wait=60)
+    batcher.start()
+    for i in range(3):
+        batcher.add({"request_id": f"request_{i}"})
+
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        # let the batcher take the updates from the queue and wait for more
+        await asyncio.sleep(0.1)
+        assert batcher.queue.empty()
+        mock_requests.post.assert_not_called()
+
+        await batcher.stop()
+        mock_requests.post.assert_called_once_with(
+            "https://batch_system/access",
+            json={"events": [{"request": f"request_{i}"} for i in range(3)]},
+            headers={},
+        )
+
+
+def test_batched_external_call_not_sent_when_other_action_fails(client, monkeypatch):
+    """
+    When another post-status-update action fails, the request creation is
+    reverted, so the status update should not be sent in a batch.
+    """
+    action_on_update = dict(config["ACTION_ON_UPDATE"])
+    action_on_update["/resource-with-batched-external-call"] = {
+        "CREATED": {
+            "external_call_configs": [
+                "let_batch_system_know",
+                "let_abc_system_know",
+            ]
+        }
+    }
+    monkeypatch.setitem(config, "ACTION_ON_UPDATE", action_on_update)
+
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        mock_requests.post.return_value = "this will cause an exception"
+        data = {
+            "username": "user1",
+            "policy_id": "test-policy-with-batched-external-call",
+            "status": "CREATED",
+        }
+        res = client.post("/request", json=data)
+        assert res.status_code == 500, res.text
+
+        # `max_wait` is 0.5s in the test config
+        time.sleep(1)
+        assert all(
+            call.args[0] != "https://batch_system/access"
+            for call in mock_requests.post.call_args_list
+        )
+
+
+def test_group_dead_letters_for_replay():
+    dead_letters = [
+        SimpleNamespace(id=i, external_call_id=external_call_id)
+        for i, external_call_id in enumerate(
+            [
+                "let_batch_system_know",
+                "let_abc_system_know",
+                "let_batch_system_know",
+                "let_batch_system_know",
+                "let_abc_system_know",
+            ]
+        )
+    ]
+    groups = group_dead_letters(dead_letters)
+    # `max_size` is 2 in the test config
+    assert [[d.id for d in group] for group in groups] == [[0, 2], [1], [3], [4]]
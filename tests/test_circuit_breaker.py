@@ -0,0 +1,89 @@
+import mock
+import pytest
+
+from requestor.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+from requestor.config import config
+
+
+def test_circuit_breaker_states():
+    breaker = CircuitBreaker("abc_system", failure_threshold=2, recovery_timeout=30)
+    with mock.patch("requestor.circuit_breaker.time.monotonic") as mock_time:
+        mock_time.return_value = 100
+
+        # a single failure does not open the circuit
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.before_call()
+
+        # a success resets the number of consecutive failures
+        breaker.record_success()
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+        # reaching the threshold opens the circuit
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        assert breaker.to_dict()["seconds_until_probe"] == 30
+
+        # after the recovery timeout, a single probe call is allowed
+        mock_time.return_value = 130
+        breaker.before_call()
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        # a failed probe opens the circuit again
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        # a successful probe closes the circuit
+        mock_time.return_value = 160
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        breaker.before_call()
+
+
+def test_circuit_breaker_fails_fast(client):
+    """
+    Once the circuit for a destination is open, calls to that destination
+    should fail without being attempted, and the state should be visible in
+    the `/_circuit_breakers` endpoint.
+    """
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy-with-redirect-and-external-call",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+        "status": "CREATED",
+    }
+    threshold = config["EXTERNAL_CALL_CIRCUIT_BREAKER"]["FAILURE_THRESHOLD"]
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        mock_requests.post.return_value = "this will cause an exception"
+        while mock_requests.post.call_count < threshold:
+            res = client.post("/request", json=data)
+            assert res.status_code == 500, res.text
+        assert mock_requests.post.call_count == threshold
+
+        res = client.get("/_circuit_breakers")
+        assert res.status_code == 200, res.text
+        assert res.json()["abc_system"]["state"] == OPEN
+        assert res.json()["abc_system"]["consecutive_failures"] == threshold
+
+        # the circuit is open: the external call is not attempted
+        res = client.post("/request", json=data)
+        assert res.status_code == 500, res.text
+        assert mock_requests.post.call_count == threshold
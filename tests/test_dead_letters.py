@@ -0,0 +1,190 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import mock
+import pytest
+from sqlalchemy import insert, select
+
+from requestor.config import config
+from requestor.db import ExternalCallDeadLetter, get_db_engine_and_sessionmaker
+from requestor.dead_letters import replay_dead_letters
+
+
+def test_failed_external_call_is_not_saved(client):
+    """
+    When an external call that is not batched still fails after all retries,
+    the request creation is reverted, so the call should not be saved to the
+    dead-letter table.
+    """
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy-with-redirect-and-external-call",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+        "status": "CREATED",
+    }
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        mock_requests.post.return_value = "this will cause an exception"
+        res = client.post("/request", json=data)
+        assert res.status_code == 500, res.text
+
+    assert client.portal.call(get_dead_letters) == []
+
+
+def test_failed_external_call_with_dead_letter_is_saved(client, monkeypatch):
+    """
+    When an external call with `dead_letter` enabled still fails after all
+    retries, the request creation should not be reverted, and the call
+    should be saved to the dead-letter table.
+    """
+    external_call_configs = dict(config["EXTERNAL_CALL_CONFIGS"])
+    external_call_configs["let_abc_system_know"] = {
+        **external_call_configs["let_abc_system_know"],
+        "dead_letter": True,
+    }
+    monkeypatch.setitem(config, "EXTERNAL_CALL_CONFIGS", external_call_configs)
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy-with-redirect-and-external-call",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+        "status": "CREATED",
+    }
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        mock_requests.post.return_value = "this will cause an exception"
+        res = client.post("/request", json=data)
+        assert res.status_code == 201, res.text
+        request_id = res.json()["request_id"]
+
+    res = client.get(
+        f"/request/{request_id}", headers={"Authorization": "bearer 1.2.3"}
+    )
+    assert res.status_code == 200, res.text
+    dead_letters = client.portal.call(get_dead_letters)
+    assert len(dead_letters) == 1
+    assert dead_letters[0].external_call_id == "let_abc_system_know"
+    assert dead_letters[0].attempts == 1
+    assert dead_letters[0].error
+    payload = dead_letters[0].payload
+    assert str(dead_letters[0].request_id) == payload["request_id"] == request_id
+    assert payload["username"] == data["username"]
+    assert payload["status"] == data["status"]
+
+
+async def get_dead_letters():
+    """
+    Use `client.portal.call(get_dead_letters)` to run this in the app's event
+    loop.
+    """
+    _, async_sessionmaker_instance = get_db_engine_and_sessionmaker()
+    async with async_sessionmaker_instance() as session:
+        result = await session.execute(select(ExternalCallDeadLetter))
+        return list(result.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_replay_dead_letters(db_session, access_token_user_only_patcher):
+    payload = {
+        "request_id": "571c6a1a-f21f-11ea-adc1-0242ac120002",
+        "username": "requestor_user",
+        "resource_id": "uniqid",
+    }
+    for external_call_id in ["let_abc_system_know", "let_xyz_system_know"]:
+        await db_session.execute(
+            insert(ExternalCallDeadLetter).values(
+                external_call_id=external_call_id,
+                request_id=payload["request_id"],
+                payload=payload,
+                error="error",
+            )
+        )
+    await db_session.commit()
+
+    # replaying fails again: the dead letters are kept
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        mock_requests.post.return_value = "this will cause an exception"
+        mock_requests.get.return_value = "this will cause an exception"
+        counts = await replay_dead_letters(concurrency=2)
+    assert counts == {"replayed": 0, "failed": 2}
+    dead_letters = (
+        (await db_session.execute(select(ExternalCallDeadLetter))).scalars().all()
+    )
+    assert [d.attempts for d in dead_letters] == [2, 2]
+    db_session.expunge_all()
+
+    # only replay one of the external calls
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        counts = await replay_dead_letters(external_call_id="let_abc_system_know")
+        mock_requests.post.assert_called_once_with(
+            "https://abc_system/access",
+            data={"dataset": payload["resource_id"], "username": payload["username"]},
+            headers={},
+        )
+        mock_requests.get.assert_not_called()
+    assert counts == {"replayed": 1, "failed": 0}
+
+    # replay the rest
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        counts = await replay_dead_letters()
+        mock_requests.get.assert_called_once()
+    assert counts == {"replayed": 1, "failed": 0}
+    dead_letters = (
+        (await db_session.execute(select(ExternalCallDeadLetter))).scalars().all()
+    )
+    assert dead_letters == []
+
+
+@pytest.mark.asyncio
+async def test_replay_claimed_dead_letters(db_session, access_token_user_only_patcher):
+    """
+    Dead letters claimed by another replay should be skipped, unless the
+    claim expired. The claimed dead letters should not be locked while the
+    calls are made.
+    """
+    now = datetime.now(timezone.utc)
+    for claimed_until in [now + timedelta(minutes=5), now - timedelta(minutes=5)]:
+        await db_session.execute(
+            insert(ExternalCallDeadLetter).values(
+                external_call_id="let_abc_system_know",
+                request_id="571c6a1a-f21f-11ea-adc1-0242ac120002",
+                payload={"username": "requestor_user", "resource_id": "uniqid"},
+                error="error",
+                claimed_until=claimed_until,
+            )
+        )
+    await db_session.commit()
+
+    loop = asyncio.get_running_loop()
+    claimed_rows = []
+
+    async def lock_dead_letters():
+        # fails if the replay holds a lock on the rows
+        _, async_sessionmaker_instance = get_db_engine_and_sessionmaker()
+        async with async_sessionmaker_instance() as session:
+            async with session.begin():
+                query = (
+                    select(ExternalCallDeadLetter)
+                    .order_by(ExternalCallDeadLetter.id)
+                    .with_for_update(nowait=True)
+                )
+                return list((await session.execute(query)).scalars().all())
+
+    def make_call(*args, **kwargs):
+        # the calls are made in a worker thread
+        claimed_rows.extend(
+            asyncio.run_coroutine_threadsafe(lock_dead_letters(), loop).result()
+        )
+        return mock.MagicMock()
+
+    with mock.patch("requestor.request_utils.requests") as mock_requests:
+        mock_requests.post.side_effect = make_call
+        counts = await replay_dead_letters()
+        mock_requests.post.assert_called_once()
+    assert counts == {"replayed": 1, "failed": 0}
+    assert len(claimed_rows) == 2
+    assert all(d.claimed_until > now for d in claimed_rows)
+
+    dead_letters = (
+        (await db_session.execute(select(ExternalCallDeadLetter))).scalars().all()
+    )
+    assert len(dead_letters) == 1
+    assert dead_letters[0].claimed_until > now
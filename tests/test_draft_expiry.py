@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from requestor.config import config
+from requestor.db import Request as RequestModel, db_transaction
+from requestor.draft_expiry import expire_draft_requests
+from requestor.notifications import hub
+from requestor.periodic_tasks import start_periodic_tasks, stop_periodic_tasks
+from tests.test_notifications import get_notification
+
+
+def create_requests(client, usernames: list) -> list:
+    request_ids = []
+    for username in usernames:
+        res = client.post(
+            "/request",
+            json={"username": username, "policy_id": "test-policy"},
+            headers={"Authorization": "bearer 1.2.3"},
+        )
+        assert res.status_code == 201, res.text
+        request_ids.append(res.json()["request_id"])
+    return request_ids
+
+
+async def set_updated_time(request_ids: list, updated_time: datetime) -> None:
+    async with db_transaction() as db_session:
+        await db_session.execute(
+            update(RequestModel)
+            .where(RequestModel.request_id.in_(request_ids))
+            .values(updated_time=updated_time)
+        )
+
+
+def get_statuses(client, request_ids: list) -> list:
+    statuses = []
+    for request_id in request_ids:
+        res = client.get(
+            f"/request/{request_id}", headers={"Authorization": "bearer 1.2.3"}
+        )
+        statuses.append(res.json()["status"] if res.status_code == 200 else None)
+    return statuses
+
+
+def setup_expired_drafts(client) -> list:
+    """
+    Create 2 expired drafts, 1 draft that is not expired, and 1 request that
+    is not a draft anymore.
+    """
+    request_ids = create_requests(
+        client, ["requestor_user", "other_user", "third_user", "fourth_user"]
+    )
+    res = client.put(
+        f"/request/{request_ids[3]}", json={"status": "INTERMEDIATE_STATUS"}
+    )
+    assert res.status_code == 200, res.text
+    two_days_ago = datetime.now(timezone.utc) - timedelta(days=2)
+    client.portal.call(
+        set_updated_time, [request_ids[0], request_ids[1], request_ids[3]], two_days_ago
+    )
+    return request_ids
+
+
+def test_expire_draft_requests(client, monkeypatch):
+    monkeypatch.setitem(config, "DRAFT_TTL", 24 * 3600)
+    # process the expired drafts in several batches
+    monkeypatch.setitem(config, "DRAFT_SWEEP_BATCH_SIZE", 1)
+    request_ids = setup_expired_drafts(client)
+
+    assert client.portal.call(expire_draft_requests) == 2
+    assert get_statuses(client, request_ids) == [
+        None,
+        None,
+        config["DEFAULT_INITIAL_STATUS"],
+        "INTERMEDIATE_STATUS",
+    ]
+    assert client.portal.call(expire_draft_requests) == 0
+
+
+def test_expire_draft_requests_to_final_status(client, monkeypatch):
+    monkeypatch.setitem(config, "DRAFT_TTL", 24 * 3600)
+    monkeypatch.setitem(config, "DRAFT_EXPIRED_STATUS", config["FINAL_STATUSES"][0])
+    request_ids = setup_expired_drafts(client)
+
+    assert client.portal.call(expire_draft_requests) == 2
+    assert get_statuses(client, request_ids) == [
+        config["FINAL_STATUSES"][0],
+        config["FINAL_STATUSES"][0],
+        config["DEFAULT_INITIAL_STATUS"],
+        "INTERMEDIATE_STATUS",
+    ]
+
+
+def test_draft_expiry_notifications(client, monkeypatch):
+    monkeypatch.setitem(config, "DRAFT_TTL", 24 * 3600)
+    request_ids = setup_expired_drafts(client)
+    subscription = client.portal.call(hub.subscribe)
+
+    assert client.portal.call(expire_draft_requests) == 2
+    notifications = [
+        client.portal.call(get_notification, subscription) for _ in range(2)
+    ]
+    assert sorted(
+        (n["event"], n["request"]["request_id"]) for n in notifications
+    ) == sorted(("deleted", request_id) for request_id in request_ids[:2])
+    assert subscription.queue.empty()
+    hub.unsubscribe(subscription)
+
+
+def test_draft_expiry_periodic_task(client, monkeypatch):
+    monkeypatch.setitem(config, "DRAFT_TTL", 24 * 3600)
+    request_ids = setup_expired_drafts(client)
+
+    async def run_periodic_tasks():
+        start_periodic_tasks()
+        # the first run is when the task starts
+        await asyncio.sleep(0.5)
+        await stop_periodic_tasks()
+
+    client.portal.call(run_periodic_tasks)
+    assert get_statuses(client, request_ids)[:3] == [
+        None,
+        None,
+        config["DEFAULT_INITIAL_STATUS"],
+    ]
@@ -3,9 +3,17 @@ Tests requests with `policy_id`.
 """
 import asyncio
 import pytest
-from unittest.mock import MagicMock, patch
+from sqlalchemy import text
+from unittest.mock import AsyncMock, MagicMock, patch
 
+from requestor.auth import Auth
 from requestor.config import config
+from requestor.db import (
+    db_transaction,
+    get_request_status_values,
+    sync_request_status_type,
+)
+from requestor.routes.manage import set_request_status, set_requests_status
 
 
 def test_create_request_without_username(client, access_token_user_only_patcher):
@@ -111,6 +119,60 @@ def test_create_duplicate_request(client):
     assert res.status_code == 201, res.text
 
 
+def test_create_final_request_with_open_request(client):
+    """
+    New requests in FINAL_STATUSES are not covered by the unique index on
+    open requests, but should still conflict with the existing open
+    requests, or reuse the existing draft request.
+    """
+    final_status = config["FINAL_STATUSES"][0]
+    data = {"username": "requestor_user", "policy_id": "test-policy"}
+    res = client.post("/request", json=data)
+    assert res.status_code == 201, res.text
+    draft_request_id = res.json()["request_id"]
+
+    # the draft request is reused
+    res = client.post("/request", json={**data, "status": final_status})
+    assert res.status_code == 201, res.text
+    assert res.json()["request_id"] == draft_request_id
+    assert res.json()["status"] == config["DEFAULT_INITIAL_STATUS"]
+
+    # conflict with the open request
+    res = client.put(
+        f"/request/{draft_request_id}", json={"status": "INTERMEDIATE_STATUS"}
+    )
+    assert res.status_code == 200, res.text
+    res = client.post("/request", json={**data, "status": final_status})
+    assert res.status_code == 409, res.text
+    res = client.post(
+        "/request/bulk",
+        json=[
+            {**data, "status": final_status},
+            {
+                "username": "other_user",
+                "policy_id": "test-policy",
+                "status": final_status,
+            },
+        ],
+    )
+    assert res.status_code == 200, res.text
+    assert [r["status_code"] for r in res.json()] == [409, 201], res.json()
+
+    res = client.get("/request", headers={"Authorization": "bearer 1.2.3"})
+    assert res.status_code == 200, res.text
+    assert sorted((r["username"], r["status"]) for r in res.json()) == [
+        ("other_user", final_status),
+        ("requestor_user", "INTERMEDIATE_STATUS"),
+    ]
+
+    # no conflict once the open request is in a final status
+    res = client.put(f"/request/{draft_request_id}", json={"status": final_status})
+    assert res.status_code == 200, res.text
+    res = client.post("/request", json={**data, "status": final_status})
+    assert res.status_code == 201, res.text
+    assert res.json()["request_id"] != draft_request_id
+
+
 def test_create_request_without_access(client, mock_arborist_requests):
     fake_jwt = "1.2.3"
     mock_arborist_requests(authorized=False)
@@ -134,6 +196,81 @@ def test_create_request_without_access(client, mock_arborist_requests):
     assert res.json() == []
 
 
+def test_create_request_with_new_allowed_status(client, monkeypatch):
+    """
+    Statuses added to ALLOWED_REQUEST_STATUSES after the `request_status`
+    type was created are added to the type on startup.
+    """
+    monkeypatch.setattr("requestor.db.request_status_values", [])
+    monkeypatch.setitem(
+        config,
+        "ALLOWED_REQUEST_STATUSES",
+        [*config["ALLOWED_REQUEST_STATUSES"], "NEW_STATUS"],
+    )
+    client.portal.call(sync_request_status_type)
+    assert get_request_status_values() == config["ALLOWED_REQUEST_STATUSES"]
+
+    res = client.post(
+        "/request",
+        json={
+            "username": "requestor_user",
+            "policy_id": "test-policy",
+            "status": "NEW_STATUS",
+        },
+    )
+    assert res.status_code == 201, res.text
+    assert res.json()["status"] == "NEW_STATUS"
+    res = client.get(
+        "/request?status=NEW_STATUS", headers={"Authorization": "bearer 1.2.3"}
+    )
+    assert res.status_code == 200, res.text
+    assert [r["status"] for r in res.json()] == ["NEW_STATUS"]
+
+
+def test_sync_request_status_type_without_migration(client):
+    """
+    The service should not start if the migration creating the
+    `request_status` type has not run.
+    """
+
+    async def rename_type(old_name, new_name):
+        async with db_transaction() as db_session:
+            await db_session.execute(
+                text(f"ALTER TYPE {old_name} RENAME TO {new_name}")
+            )
+
+    client.portal.call(rename_type, "request_status", "request_status_renamed")
+    try:
+        with pytest.raises(Exception, match="alembic upgrade head"):
+            client.portal.call(sync_request_status_type)
+    finally:
+        client.portal.call(rename_type, "request_status_renamed", "request_status")
+
+
+def test_create_request_with_unknown_status(client):
+    """
+    Creating a request with a status that is not in ALLOWED_REQUEST_STATUSES
+    should fail with a 400 error, and not create anything.
+    """
+    data = {"username": "requestor_user", "policy_id": "test-policy", "status": "BOGUS"}
+    res = client.post("/request", json=data)
+    assert res.status_code == 400, res.text
+    assert "not an allowed request status" in res.text
+
+    res = client.post(
+        "/request/bulk",
+        json=[data, {**data, "status": config["DEFAULT_INITIAL_STATUS"]}],
+    )
+    assert res.status_code == 200, res.text
+    assert res.json()[0]["status_code"] == 400, res.json()
+    assert "not an allowed request status" in res.json()[0]["detail"]
+    assert res.json()[1]["status_code"] == 201, res.json()
+
+    res = client.get("/request", headers={"Authorization": "bearer 1.2.3"})
+    assert res.status_code == 200, res.text
+    assert [r["status"] for r in res.json()] == [config["DEFAULT_INITIAL_STATUS"]]
+
+
 def test_create_request_with_non_existent_policy(client):
     fake_jwt = "1.2.3"
 
@@ -223,6 +360,166 @@ def test_update_request(client):
     assert request_data["status"] == status
 
 
+def test_update_request_access_grant_failure(client):
+    """
+    When granting access fails, the request's status should be reverted.
+    """
+    res = client.post(
+        "/request",
+        json={
+            "username": "requestor_user",
+            "policy_id": "test-policy",
+            "resource_id": "uniqid",
+            "resource_display_name": "My Resource",
+        },
+    )
+    assert res.status_code == 201, res.text
+    request_id = res.json()["request_id"]
+
+    future = asyncio.Future()
+    future.set_result(False)
+    with patch(
+        "requestor.routes.manage.arborist.grant_user_access_to_policy",
+        MagicMock(return_value=future),
+    ):
+        res = client.put(
+            f"/request/{request_id}",
+            json={"status": config["UPDATE_ACCESS_STATUSES"][0]},
+        )
+    assert res.status_code == 500, res.text
+    assert "unable to grant access" in res.json()["detail"]
+
+    res = client.get(f"/request/{request_id}")
+    assert res.status_code == 200, res.text
+    assert res.json()["status"] == config["DEFAULT_INITIAL_STATUS"]
+
+
+def test_update_request_same_status_grants_access_again(client):
+    """
+    When updating a request to the UPDATE_ACCESS_STATUS it already has,
+    access should be granted again, in case the previous grant did not
+    happen, and the other actions should not run again.
+    """
+    res = client.post(
+        "/request",
+        json={
+            "username": "requestor_user",
+            "policy_id": "test-policy",
+            "resource_id": "uniqid",
+            "resource_display_name": "My Resource",
+        },
+    )
+    assert res.status_code == 201, res.text
+    request_id = res.json()["request_id"]
+
+    status = config["UPDATE_ACCESS_STATUSES"][0]
+    with patch(
+        "requestor.routes.manage.arborist.grant_user_access_to_policy",
+        AsyncMock(return_value=True),
+    ) as mock_grant, patch(
+        "requestor.routes.manage.post_status_update", AsyncMock(return_value="")
+    ) as mock_post_status_update:
+        res = client.put(f"/request/{request_id}", json={"status": status})
+        assert res.status_code == 200, res.text
+        updated_time = res.json()["updated_time"]
+        assert mock_grant.call_count == 1
+        assert mock_post_status_update.call_count == 1
+
+        res = client.put(f"/request/{request_id}", json={"status": status})
+        assert res.status_code == 200, res.text
+        assert res.json()["status"] == status
+        assert res.json()["updated_time"] == updated_time
+        assert mock_grant.call_count == 2
+        assert mock_grant.call_args.args[1:] == ("requestor_user", "test-policy")
+        assert mock_post_status_update.call_count == 1
+
+        res = client.put(
+            "/request/bulk", json=[{"request_id": request_id, "status": status}]
+        )
+        assert res.status_code == 200, res.text
+        assert [r["status_code"] for r in res.json()] == [200]
+        assert mock_grant.call_count == 3
+        assert mock_post_status_update.call_count == 1
+
+
+def test_create_request_interrupted_access_grant(client):
+    """
+    If the service stops after a request is created with an
+    UPDATE_ACCESS_STATUS but before access is granted, updating the request
+    to the same status should grant access.
+    """
+    status = config["UPDATE_ACCESS_STATUSES"][0]
+    # simulate the service stopping before the post-creation actions
+    with patch(
+        "requestor.routes.manage.apply_new_request_status",
+        AsyncMock(return_value=""),
+    ):
+        res = client.post(
+            "/request",
+            json={
+                "username": "requestor_user",
+                "policy_id": "test-policy",
+                "resource_id": "uniqid",
+                "resource_display_name": "My Resource",
+                "status": status,
+            },
+        )
+    assert res.status_code == 201, res.text
+    request_id = res.json()["request_id"]
+
+    with patch(
+        "requestor.routes.manage.arborist.grant_user_access_to_policy",
+        AsyncMock(return_value=True),
+    ) as mock_grant:
+        res = client.put(f"/request/{request_id}", json={"status": status})
+    assert res.status_code == 200, res.text
+    assert res.json()["status"] == status
+    mock_grant.assert_called_once()
+    assert mock_grant.call_args.args[1:] == ("requestor_user", "test-policy")
+
+
+def test_update_request_concurrent_update(client):
+    """
+    If the request is updated by someone else between the time it is read
+    and the time it is updated, the update should fail.
+    """
+    res = client.post(
+        "/request",
+        json={
+            "username": "requestor_user",
+            "policy_id": "test-policy",
+            "resource_id": "uniqid",
+            "resource_display_name": "My Resource",
+        },
+    )
+    assert res.status_code == 201, res.text
+    request_id = res.json()["request_id"]
+    other_status = config["ALLOWED_REQUEST_STATUSES"][1]
+
+    # simulate a concurrent update: update the status right before this
+    # update's conditional UPDATE statement
+    original_set_request_status = set_request_status
+
+    async def set_request_status_after_concurrent_update(request, status):
+        concurrent_update = await original_set_request_status(request, other_status)
+        assert concurrent_update
+        return await original_set_request_status(request, status)
+
+    with patch(
+        "requestor.routes.manage.set_request_status",
+        set_request_status_after_concurrent_update,
+    ):
+        res = client.put(
+            f"/request/{request_id}",
+            json={"status": config["FINAL_STATUSES"][-1]},
+        )
+    assert res.status_code == 409, res.text
+
+    res = client.get(f"/request/{request_id}")
+    assert res.status_code == 200, res.text
+    assert res.json()["status"] == other_status
+
+
 def test_create_request_with_granting_access(client):
     fake_jwt = "1.2.3"
     mock_arborist_return_value = 200
@@ -461,3 +758,342 @@ def test_revoke_request_failure(client):
     )
     assert res.status_code == 400, res.text
     assert "does not have access to policy" in res.json()["detail"]
+
+
+def test_create_requests_bulk(client):
+    """
+    Each request in the bulk request gets its own result, in order, and
+    authorization is only checked once per distinct set of resource paths.
+    """
+    fake_jwt = "1.2.3"
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+    }
+    body = [
+        data,
+        {**data, "username": "other_user"},
+        {**data, "policy_id": "some-nonexistent-policy"},
+        # duplicate of the 1st request
+        data,
+        # neither a policy_id nor resource_paths
+        {"username": "requestor_user"},
+    ]
+    with patch.object(
+        Auth, "authorize", autospec=True, side_effect=Auth.authorize
+    ) as mock_authorize:
+        res = client.post(
+            "/request/bulk",
+            json=body,
+            headers={"Authorization": f"bearer {fake_jwt}"},
+        )
+    assert res.status_code == 200, res.text
+    results = res.json()
+    assert [r["status_code"] for r in results] == [201, 201, 400, 409, 400]
+    assert "does not exist" in results[2]["detail"]
+    for i, username in [(0, "requestor_user"), (1, "other_user")]:
+        request_data = results[i]["request"]
+        assert request_data == {
+            "request_id": request_data["request_id"],
+            "username": username,
+            "policy_id": data["policy_id"],
+            "resource_id": data["resource_id"],
+            "resource_display_name": data["resource_display_name"],
+            "status": config["DEFAULT_INITIAL_STATUS"],
+            "revoke": False,
+            "created_time": request_data["created_time"],
+            "updated_time": request_data["updated_time"],
+        }
+    assert mock_authorize.call_count == 1
+
+    res = client.get("/request", headers={"Authorization": f"bearer {fake_jwt}"})
+    assert res.status_code == 200, res.text
+    assert sorted(r["request_id"] for r in res.json()) == sorted(
+        r["request"]["request_id"] for r in results[:2]
+    )
+
+
+def test_create_requests_bulk_existing_requests(client):
+    """
+    Bulk creation follows the same rules as `POST /request`: draft requests
+    are reused, and requests that are in progress cannot be created again.
+    """
+    fake_jwt = "1.2.3"
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+    }
+    draft_request_ids = []
+    for username in ["requestor_user", "other_user"]:
+        res = client.post(
+            "/request",
+            json={**data, "username": username},
+            headers={"Authorization": f"bearer {fake_jwt}"},
+        )
+        assert res.status_code == 201, res.text
+        draft_request_ids.append(res.json()["request_id"])
+    res = client.put(
+        f"/request/{draft_request_ids[1]}", json={"status": "INTERMEDIATE_STATUS"}
+    )
+    assert res.status_code == 200, res.text
+
+    res = client.post(
+        "/request/bulk",
+        json=[data, {**data, "username": "other_user"}],
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    results = res.json()
+    assert [r["status_code"] for r in results] == [201, 409]
+    assert results[0]["request"]["request_id"] == draft_request_ids[0]
+    assert "already exists" in results[1]["detail"]
+
+
+def test_create_requests_bulk_without_access(client, mock_arborist_requests):
+    fake_jwt = "1.2.3"
+    mock_arborist_requests(authorized=False)
+
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy",
+    }
+    res = client.post(
+        "/request/bulk",
+        json=[data, {**data, "username": "other_user"}],
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert [r["status_code"] for r in res.json()] == [403, 403]
+
+    # check that no request was created
+    res = client.get("/request", headers={"Authorization": f"bearer {fake_jwt}"})
+    assert res.status_code == 200, res.text
+    assert res.json() == []
+
+
+def test_create_requests_bulk_too_many(client, monkeypatch):
+    monkeypatch.setattr("requestor.routes.manage.BULK_MAX_REQUESTS", 1)
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy",
+    }
+    res = client.post(
+        "/request/bulk",
+        json=[data, {**data, "username": "other_user"}],
+        headers={"Authorization": "bearer 1.2.3"},
+    )
+    assert res.status_code == 400, res.text
+
+
+def create_requests_for_users(client, usernames: list) -> list:
+    request_ids = []
+    for username in usernames:
+        res = client.post(
+            "/request",
+            json={
+                "username": username,
+                "policy_id": "test-policy",
+                "resource_id": "uniqid",
+                "resource_display_name": "My Resource",
+            },
+        )
+        assert res.status_code == 201, res.text
+        request_ids.append(res.json()["request_id"])
+    return request_ids
+
+
+def test_update_requests_bulk(client):
+    """
+    Each update in the bulk request gets its own result, in order.
+    """
+    request_ids = create_requests_for_users(
+        client, ["requestor_user", "other_user", "third_user"]
+    )
+    approved_status = config["UPDATE_ACCESS_STATUSES"][0]
+    body = [
+        {"request_id": request_ids[0], "status": approved_status},
+        {"request_id": request_ids[1], "status": "INTERMEDIATE_STATUS"},
+        {
+            "request_id": "2b2ee5c5-5f1f-4a86-a6e0-7d1d0a2e2b1a",
+            "status": "INTERMEDIATE_STATUS",
+        },
+        # the same request cannot be updated twice
+        {"request_id": request_ids[0], "status": "INTERMEDIATE_STATUS"},
+        {
+            "request_id": "9e6c8b1e-3a43-4f0e-9d5b-2f4c3b1d7a10",
+            "status": "UNKNOWN_STATUS",
+        },
+        # status unchanged
+        {"request_id": request_ids[2], "status": config["DEFAULT_INITIAL_STATUS"]},
+    ]
+    with patch(
+        "requestor.routes.manage.arborist.grant_user_access_to_policy",
+        AsyncMock(return_value=True),
+    ) as mock_grant:
+        res = client.put("/request/bulk", json=body)
+    assert res.status_code == 200, res.text
+    results = res.json()
+    assert [r["status_code"] for r in results] == [200, 200, 404, 400, 400, 200]
+    assert results[0]["request"]["status"] == approved_status
+    assert results[1]["request"]["status"] == "INTERMEDIATE_STATUS"
+    assert results[5]["request"]["status"] == config["DEFAULT_INITIAL_STATUS"]
+    mock_grant.assert_called_once()
+    assert mock_grant.call_args.args[1:] == ("requestor_user", "test-policy")
+
+    for request_id, status in [
+        (request_ids[0], approved_status),
+        (request_ids[1], "INTERMEDIATE_STATUS"),
+        (request_ids[2], config["DEFAULT_INITIAL_STATUS"]),
+    ]:
+        res = client.get(f"/request/{request_id}")
+        assert res.status_code == 200, res.text
+        assert res.json()["status"] == status
+
+
+def test_update_requests_bulk_access_grant_failure(client):
+    """
+    When granting access fails for a request, only that request's status
+    should be reverted.
+    """
+    request_ids = create_requests_for_users(client, ["requestor_user", "other_user"])
+    approved_status = config["UPDATE_ACCESS_STATUSES"][0]
+
+    async def grant_user_access_to_policy(arborist_client, username, policy_id):
+        return username != "other_user"
+
+    with patch(
+        "requestor.routes.manage.arborist.grant_user_access_to_policy",
+        grant_user_access_to_policy,
+    ):
+        res = client.put(
+            "/request/bulk",
+            json=[
+                {"request_id": request_id, "status": approved_status}
+                for request_id in request_ids
+            ],
+        )
+    assert res.status_code == 200, res.text
+    results = res.json()
+    assert [r["status_code"] for r in results] == [200, 500]
+    assert "unable to grant access" in results[1]["detail"]
+
+    res = client.get(f"/request/{request_ids[1]}")
+    assert res.status_code == 200, res.text
+    assert res.json()["status"] == config["DEFAULT_INITIAL_STATUS"]
+
+
+def test_update_requests_bulk_concurrent_update(client):
+    """
+    Requests updated by someone else between the time they are read and the
+    time they are updated are not updated.
+    """
+    request_ids = create_requests_for_users(client, ["requestor_user", "other_user"])
+    other_status = config["ALLOWED_REQUEST_STATUSES"][1]
+
+    original_set_requests_status = set_requests_status
+
+    async def set_requests_status_after_concurrent_update(updates):
+        request, _ = updates[0]
+        assert await set_request_status(request, other_status)
+        return await original_set_requests_status(updates)
+
+    with patch(
+        "requestor.routes.manage.set_requests_status",
+        set_requests_status_after_concurrent_update,
+    ):
+        res = client.put(
+            "/request/bulk",
+            json=[
+                {"request_id": request_id, "status": "INTERMEDIATE_STATUS"}
+                for request_id in request_ids
+            ],
+        )
+    assert res.status_code == 200, res.text
+    assert [r["status_code"] for r in res.json()] == [409, 200]
+
+    res = client.get(f"/request/{request_ids[0]}")
+    assert res.status_code == 200, res.text
+    assert res.json()["status"] == other_status
+
+
+def test_update_requests_bulk_without_access(client, mock_arborist_requests):
+    request_ids = create_requests_for_users(client, ["requestor_user"])
+    mock_arborist_requests(authorized=False)
+    res = client.put(
+        "/request/bulk",
+        json=[{"request_id": request_ids[0], "status": "INTERMEDIATE_STATUS"}],
+    )
+    assert res.status_code == 200, res.text
+    assert [r["status_code"] for r in res.json()] == [403]
+
+    mock_arborist_requests()  # authorize the GET request
+    res = client.get(f"/request/{request_ids[0]}")
+    assert res.status_code == 200, res.text
+    assert res.json()["status"] == config["DEFAULT_INITIAL_STATUS"]
+
+
+def test_delete_requests_with_filters(client, monkeypatch):
+    """
+    The requests matching the filters are deleted, in batches.
+    """
+    monkeypatch.setattr("requestor.routes.manage.DELETE_BATCH_SIZE", 1)
+    request_ids = create_requests_for_users(
+        client, ["requestor_user", "other_user", "third_user"]
+    )
+    res = client.put(
+        f"/request/{request_ids[2]}", json={"status": "INTERMEDIATE_STATUS"}
+    )
+    assert res.status_code == 200, res.text
+
+    res = client.delete("/request", params={"status": config["DEFAULT_INITIAL_STATUS"]})
+    assert res.status_code == 200, res.text
+    assert sorted(res.json()["request_ids"]) == sorted(request_ids[:2])
+
+    res = client.get("/request", headers={"Authorization": "bearer 1.2.3"})
+    assert res.status_code == 200, res.text
+    assert [r["request_id"] for r in res.json()] == [request_ids[2]]
+
+
+def test_delete_requests_invalid_filters(client):
+    create_requests_for_users(client, ["requestor_user"])
+
+    # a filter is required
+    res = client.delete("/request")
+    assert res.status_code == 400, res.text
+    res = client.delete("/request?active")
+    assert res.status_code == 400, res.text
+
+    res = client.delete("/request", params={"not_a_field": "value"})
+    assert res.status_code == 400, res.text
+
+    # the list parameters are not supported
+    status = config["DEFAULT_INITIAL_STATUS"]
+    for param, value in [
+        ("limit", "10"),
+        ("cursor", "abc"),
+        ("stream", "json"),
+        ("fields", "request_id"),
+        ("include_archived", "true"),
+    ]:
+        res = client.delete("/request", params={"status": status, param: value})
+        assert res.status_code == 400, res.text
+        assert param in res.json()["detail"]
+
+    res = client.get("/request", headers={"Authorization": "bearer 1.2.3"})
+    assert res.status_code == 200, res.text
+    assert len(res.json()) == 1
+
+
+def test_delete_requests_without_access(client, mock_arborist_requests):
+    request_ids = create_requests_for_users(client, ["requestor_user"])
+    mock_arborist_requests(authorized=False)
+    res = client.delete("/request", params={"username": "requestor_user"})
+    assert res.status_code == 403, res.text
+
+    mock_arborist_requests()  # authorize the GET request
+    res = client.get(f"/request/{request_ids[0]}")
+    assert res.status_code == 200, res.text
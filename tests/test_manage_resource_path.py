@@ -2,8 +2,9 @@
 Tests requests with `resource_paths` and `role_ids`.
 """
 import pytest
+from unittest.mock import patch
 
-from requestor.arborist import get_auto_policy_id
+from requestor.arborist import create_arborist_policy, get_auto_policy_id
 from requestor.config import config
 
 
@@ -537,3 +538,40 @@ def test_no_revoke_requests(client):
     )
     assert res.status_code == 400, res.text
     assert "not compatible" in res.json()["detail"]
+
+
+def test_create_requests_bulk_with_resource_paths(client, list_roles_patcher):
+    """
+    The Arborist policy for a set of resource paths and roles is only
+    created once, even if several requests need it.
+    """
+    fake_jwt = "1.2.3"
+    data = {
+        "username": "requestor_user",
+        "resource_paths": ["/study/123456", "/study/7890"],
+        "role_ids": ["study_registrant"],
+    }
+    body = [
+        data,
+        {**data, "username": "other_user"},
+        {**data, "role_ids": ["some-nonexistent-role"]},
+    ]
+    with patch(
+        "requestor.routes.manage.arborist.create_arborist_policy",
+        wraps=create_arborist_policy,
+    ) as mock_create_policy:
+        res = client.post(
+            "/request/bulk",
+            json=body,
+            headers={"Authorization": f"bearer {fake_jwt}"},
+        )
+    assert res.status_code == 200, res.text
+    results = res.json()
+    assert [r["status_code"] for r in results] == [201, 201, 400]
+    assert "do not exist" in results[2]["detail"]
+    expected_policy_id = get_auto_policy_id(
+        resource_paths=data["resource_paths"], role_ids=data["role_ids"]
+    )
+    for r in results[:2]:
+        assert r["request"]["policy_id"] == expected_policy_id
+    assert mock_create_policy.call_count == 1
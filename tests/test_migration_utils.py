@@ -0,0 +1,108 @@
+import pytest
+import sqlalchemy as sa
+
+from requestor.migration_utils import (
+    estimate_row_count,
+    get_table,
+    iter_batches,
+    update_rows,
+)
+
+
+async def run_with_table(db_session, rows: int, func):
+    """
+    Create a temporary `items` table with `rows` rows, inserted in random
+    order, and run `func(connection, table)` with a sync connection, like
+    in a migration.
+    """
+    connection = await db_session.connection()
+    await connection.execute(
+        sa.text(
+            "CREATE TEMPORARY TABLE items (id integer PRIMARY KEY, name varchar NOT NULL UNIQUE, value integer)"
+        )
+    )
+    await connection.execute(
+        sa.text(
+            "INSERT INTO items (id, name) SELECT i, 'item_' || i FROM generate_series(1, :rows) i ORDER BY random()"
+        ),
+        {"rows": rows},
+    )
+    return await connection.run_sync(
+        lambda sync_connection: func(
+            sync_connection, get_table(sync_connection, "items")
+        )
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "rows,batch_sizes", [(0, []), (2000, [1000, 1000]), (2500, [1000, 1000, 500])]
+)
+async def test_iter_batches(db_session, rows, batch_sizes):
+    batches = await run_with_table(
+        db_session,
+        rows,
+        lambda connection, table: list(
+            iter_batches(connection, table, ["name"], key="id", batch_size=1000)
+        ),
+    )
+    assert [len(batch) for batch in batches] == batch_sizes
+    assert [row.id for batch in batches for row in batch] == list(range(1, rows + 1))
+    assert all(row.name == f"item_{row.id}" for batch in batches for row in batch)
+
+
+@pytest.mark.asyncio
+async def test_iter_batches_string_key(db_session):
+    """
+    The batches follow the database's order of the key, which may differ
+    from Python's order for strings.
+    """
+    batches = await run_with_table(
+        db_session,
+        1000,
+        lambda connection, table: list(
+            iter_batches(connection, table, [], key="name", batch_size=300)
+        ),
+    )
+    names = [row.name for batch in batches for row in batch]
+    assert len(names) == 1000
+    assert set(names) == {f"item_{i}" for i in range(1, 1001)}
+
+
+@pytest.mark.asyncio
+async def test_update_rows(db_session):
+    def migrate(connection, table):
+        update_rows(connection, table, [], key="id")
+        for rows in iter_batches(connection, table, [], key="id", batch_size=100):
+            update_rows(
+                connection,
+                table,
+                [
+                    {"id": row.id, "name": f"new_{row.id}", "value": row.id * 2}
+                    for row in rows
+                    if row.id % 2
+                ],
+                key="id",
+            )
+        return connection.execute(
+            sa.select(table.c.id, table.c.name, table.c.value).order_by(table.c.id)
+        ).all()
+
+    rows = await run_with_table(db_session, 250, migrate)
+    assert len(rows) == 250
+    for row in rows:
+        if row.id % 2:
+            assert (row.name, row.value) == (f"new_{row.id}", row.id * 2)
+        else:
+            assert (row.name, row.value) == (f"item_{row.id}", None)
+
+
+@pytest.mark.asyncio
+async def test_estimate_row_count(db_session):
+    def estimate(connection, table):
+        before = estimate_row_count(connection, table)
+        connection.execute(sa.text("ANALYZE items"))
+        return before, estimate_row_count(connection, table)
+
+    # the table was never analyzed, so there is no estimate until ANALYZE
+    assert await run_with_table(db_session, 500, estimate) == (0, 500)
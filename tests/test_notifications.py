@@ -0,0 +1,227 @@
+import asyncio
+
+import pytest
+
+from requestor.config import config
+from requestor.notifications import Subscription, hub
+from requestor.routes.query import get_request_events
+
+
+async def get_notification(subscription, timeout=5):
+    """
+    Use `client.portal.call(get_notification, subscription)` to run this in
+    the app's event loop.
+    """
+    return await asyncio.wait_for(subscription.queue.get(), timeout)
+
+
+def test_notifications_for_user(client, access_token_user_only_patcher):
+    """
+    Creating, updating and deleting a request should notify the subscribers
+    to the user's requests, but not the subscribers to other users' requests.
+    """
+    subscription = client.portal.call(hub.subscribe, "requestor_user")
+    other_subscription = client.portal.call(hub.subscribe, "other_user")
+
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+    }
+    res = client.post("/request", json=data)
+    assert res.status_code == 201, res.text
+    request_data = res.json()
+    notification = client.portal.call(get_notification, subscription)
+    assert notification == {"event": "created", "request": request_data}
+
+    final_status = config["FINAL_STATUSES"][-1]
+    res = client.put(
+        f"/request/{request_data['request_id']}", json={"status": final_status}
+    )
+    assert res.status_code == 200, res.text
+    notification = client.portal.call(get_notification, subscription)
+    assert notification["event"] == "updated"
+    assert notification["request"]["status"] == final_status
+
+    res = client.delete(f"/request/{request_data['request_id']}")
+    assert res.status_code == 200, res.text
+    notification = client.portal.call(get_notification, subscription)
+    assert notification["event"] == "deleted"
+    assert notification["request"]["request_id"] == request_data["request_id"]
+
+    assert other_subscription.queue.empty()
+    hub.unsubscribe(subscription)
+    hub.unsubscribe(other_subscription)
+
+
+def test_notifications_for_request(client, access_token_user_only_patcher):
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+    }
+    request_ids = []
+    for username in ["requestor_user", "other_user"]:
+        res = client.post("/request", json={**data, "username": username})
+        assert res.status_code == 201, res.text
+        request_ids.append(res.json()["request_id"])
+
+    subscription = client.portal.call(hub.subscribe, None, request_ids[1])
+    final_status = config["FINAL_STATUSES"][-1]
+    for request_id in request_ids:
+        res = client.put(f"/request/{request_id}", json={"status": final_status})
+        assert res.status_code == 200, res.text
+
+    notification = client.portal.call(get_notification, subscription)
+    assert notification["request"]["request_id"] == request_ids[1]
+    assert subscription.queue.empty()
+    hub.unsubscribe(subscription)
+
+
+def test_notifications_for_bulk_create(client, access_token_user_only_patcher):
+    """
+    Creating requests in bulk should send one notification per new request,
+    and reusing a draft request should send an "updated" notification.
+    """
+    subscription = client.portal.call(hub.subscribe, "requestor_user")
+    data = {"username": "requestor_user", "policy_id": "test-policy"}
+    res = client.post("/request", json=data)
+    assert res.status_code == 201, res.text
+    draft = res.json()
+    client.portal.call(get_notification, subscription)
+
+    res = client.post(
+        "/request/bulk",
+        json=[data, {**data, "policy_id": "test-policy-with-redirect"}],
+    )
+    assert res.status_code == 200, res.text
+    requests = [r["request"] for r in res.json()]
+    notifications = [
+        client.portal.call(get_notification, subscription) for _ in range(2)
+    ]
+    assert sorted(
+        (n["event"], n["request"]["request_id"]) for n in notifications
+    ) == sorted(
+        [("updated", draft["request_id"]), ("created", requests[1]["request_id"])]
+    )
+    assert subscription.queue.empty()
+    hub.unsubscribe(subscription)
+
+
+def test_notifications_for_bulk_update(client, access_token_user_only_patcher):
+    request_ids = []
+    for policy_id in ["test-policy", "test-policy-with-redirect"]:
+        res = client.post(
+            "/request", json={"username": "requestor_user", "policy_id": policy_id}
+        )
+        assert res.status_code == 201, res.text
+        request_ids.append(res.json()["request_id"])
+
+    subscription = client.portal.call(hub.subscribe, "requestor_user")
+    res = client.put(
+        "/request/bulk",
+        json=[
+            {"request_id": request_id, "status": "INTERMEDIATE_STATUS"}
+            for request_id in request_ids
+        ],
+    )
+    assert res.status_code == 200, res.text
+    notifications = [
+        client.portal.call(get_notification, subscription) for _ in range(2)
+    ]
+    assert sorted(
+        (n["event"], n["request"]["request_id"], n["request"]["status"])
+        for n in notifications
+    ) == sorted(
+        ("updated", request_id, "INTERMEDIATE_STATUS") for request_id in request_ids
+    )
+    assert subscription.queue.empty()
+    hub.unsubscribe(subscription)
+
+
+def test_notifications_for_bulk_delete(
+    client, monkeypatch, access_token_user_only_patcher
+):
+    monkeypatch.setattr("requestor.routes.manage.DELETE_BATCH_SIZE", 2)
+    request_ids = []
+    for policy_id in [
+        "test-policy",
+        "test-policy-with-redirect",
+        "test-policy-with-external-calls",
+    ]:
+        res = client.post(
+            "/request", json={"username": "requestor_user", "policy_id": policy_id}
+        )
+        assert res.status_code == 201, res.text
+        request_ids.append(res.json()["request_id"])
+
+    subscription = client.portal.call(hub.subscribe, "requestor_user")
+    res = client.delete("/request", params={"username": "requestor_user"})
+    assert res.status_code == 200, res.text
+    notifications = [
+        client.portal.call(get_notification, subscription) for _ in range(3)
+    ]
+    assert sorted(
+        (n["event"], n["request"]["request_id"]) for n in notifications
+    ) == sorted(("deleted", request_id) for request_id in request_ids)
+    assert subscription.queue.empty()
+    hub.unsubscribe(subscription)
+
+
+def test_no_notification_for_rolled_back_change(client, access_token_user_only_patcher):
+    """
+    Notifications are sent in the request's transaction: if the change is
+    rolled back, no notification is sent.
+    """
+    subscription = client.portal.call(hub.subscribe, "requestor_user")
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+    }
+    res = client.post("/request", json=data)
+    assert res.status_code == 201, res.text
+    client.portal.call(get_notification, subscription)
+
+    # unknown status
+    res = client.put(
+        f"/request/{res.json()['request_id']}", json={"status": "UNKNOWN_STATUS"}
+    )
+    assert res.status_code == 400, res.text
+    with pytest.raises(asyncio.TimeoutError):
+        client.portal.call(get_notification, subscription, 1)
+    hub.unsubscribe(subscription)
+
+
+def test_request_events_format(client, access_token_user_only_patcher):
+    async def get_events():
+        subscription = Subscription(username="requestor_user")
+        notification = {"event": "updated", "request": {"request_id": "123"}}
+        subscription.queue.put_nowait(notification)
+        # closed subscription
+        subscription.queue.put_nowait(None)
+        return [event async for event in get_request_events(subscription)]
+
+    assert client.portal.call(get_events) == [
+        ": subscribed\n\n",
+        'event: updated\ndata: {"event": "updated", "request": {"request_id": "123"}}\n\n',
+    ]
+
+
+def test_request_events_errors(client, access_token_patcher_param):
+    # unknown request
+    res = client.get(
+        "/request/events",
+        params={"request_id": "2b2ee5c5-5f1f-4a86-a6e0-7d1d0a2e2b1a"},
+        headers={"Authorization": "bearer 1.2.3"},
+    )
+    assert res.status_code == 404, res.text
+
+    if access_token_patcher_param == "user_token":
+        return
+    # following all the user's requests requires a token linked to a user
+    res = client.get("/request/events", headers={"Authorization": "bearer 1.2.3"})
+    assert res.status_code == 403, res.text
@@ -1,3 +1,6 @@
+from datetime import datetime, timezone
+import json
+
 import pytest
 
 from requestor.config import config
@@ -202,6 +205,27 @@ def test_get_filtered_requests(client):
     )
     assert res.status_code == 400, res.text
 
+    # Filter on a status that does not exist
+    res = client.get(
+        "/request?status=APPROVED",
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    approved_requests = res.json()
+    assert approved_requests
+    res = client.get(
+        "/request?status=UNKNOWN_STATUS&status=APPROVED",
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert res.json() == approved_requests
+    res = client.get(
+        "/request?status=UNKNOWN_STATUS",
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert res.json() == []
+
 
 def test_get_user_requests(client, access_token_user_only_patcher):
     fake_jwt = "1.2.3"
@@ -693,3 +717,584 @@ def test_check_permissions_mismatch(
     )
     assert res.status_code == 200, res.text
     assert res.json() == {test_data["resource_path"]: False}
+
+
+def test_list_requests_with_pagination(client):
+    fake_jwt = "1.2.3"
+
+    # create requests, some of which the current user cannot access
+    accessible_requests = []
+    for i in range(5):
+        for policy_id in ["test-policy", "test-policy-i-cant-access"]:
+            data = {
+                "username": f"user_{i}",
+                "policy_id": policy_id,
+                "resource_id": "uniqid",
+                "resource_display_name": "My Resource",
+            }
+            res = client.post(
+                "/request", json=data, headers={"Authorization": f"bearer {fake_jwt}"}
+            )
+            assert res.status_code == 201, res.text
+            if policy_id == "test-policy":
+                accessible_requests.append(res.json())
+
+    # without a limit, all the results are returned and there is no cursor
+    res = client.get("/request", headers={"Authorization": f"bearer {fake_jwt}"})
+    assert res.status_code == 200, res.text
+    assert res.json() == accessible_requests
+    assert "X-Next-Cursor" not in res.headers
+
+    # get the results one page at a time
+    pages = []
+    params = {"limit": 2}
+    while True:
+        res = client.get(
+            "/request", params=params, headers={"Authorization": f"bearer {fake_jwt}"}
+        )
+        assert res.status_code == 200, res.text
+        assert len(res.json()) <= 2
+        pages.append(res.json())
+        if "X-Next-Cursor" not in res.headers:
+            break
+        params["cursor"] = res.headers["X-Next-Cursor"]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [r for page in pages for r in page] == accessible_requests
+
+    # filters still apply
+    res = client.get(
+        "/request",
+        params={"limit": 2, "username": ["user_1", "user_3"]},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert res.json() == [accessible_requests[1], accessible_requests[3]]
+    assert "X-Next-Cursor" not in res.headers
+
+
+def test_list_user_requests_with_pagination(client, access_token_user_only_patcher):
+    fake_jwt = "1.2.3"
+
+    # create requests
+    user_requests = []
+    for policy_id in [
+        "test-policy",
+        "test-policy-with-redirect",
+        "test-policy-i-cant-access",
+    ]:
+        data = {
+            "username": "requestor_user",
+            "policy_id": policy_id,
+            "resource_id": "uniqid",
+            "resource_display_name": "My Resource",
+        }
+        res = client.post(
+            "/request", json=data, headers={"Authorization": f"bearer {fake_jwt}"}
+        )
+        assert res.status_code == 201, res.text
+        user_requests.append(res.json()["request_id"])
+
+    res = client.get(
+        "/request/user",
+        params={"limit": 2},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert [r["request_id"] for r in res.json()] == user_requests[:2]
+    cursor = res.headers["X-Next-Cursor"]
+
+    res = client.get(
+        "/request/user",
+        params={"limit": 2, "cursor": cursor},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert [r["request_id"] for r in res.json()] == user_requests[2:]
+    assert "X-Next-Cursor" not in res.headers
+
+
+@pytest.mark.parametrize("endpoint", ["/request", "/request/user"])
+@pytest.mark.parametrize(
+    "params",
+    [{"limit": 0}, {"limit": "abc"}, {"limit": 2, "cursor": "not-a-cursor"}],
+)
+def test_list_requests_with_invalid_pagination(
+    client, access_token_user_only_patcher, endpoint, params
+):
+    fake_jwt = "1.2.3"
+    res = client.get(
+        endpoint, params=params, headers={"Authorization": f"bearer {fake_jwt}"}
+    )
+    assert res.status_code in [400, 422], res.text
+
+
+@pytest.mark.parametrize("stream", ["json", "ndjson"])
+def test_list_requests_with_streaming(client, stream):
+    fake_jwt = "1.2.3"
+
+    # create requests, some of which the current user cannot access
+    accessible_requests = []
+    for i in range(3):
+        for policy_id in ["test-policy", "test-policy-i-cant-access"]:
+            data = {
+                "username": f"user_{i}",
+                "policy_id": policy_id,
+                "resource_id": "uniqid",
+                "resource_display_name": "My Resource",
+            }
+            res = client.post(
+                "/request", json=data, headers={"Authorization": f"bearer {fake_jwt}"}
+            )
+            assert res.status_code == 201, res.text
+            if policy_id == "test-policy":
+                accessible_requests.append(res.json())
+
+    res = client.get(
+        "/request",
+        params={"stream": stream},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    if stream == "json":
+        assert res.headers["content-type"] == "application/json"
+        assert res.json() == accessible_requests
+    else:
+        assert res.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in res.text.splitlines()] == (
+            accessible_requests
+        )
+
+    # same results as without streaming
+    res2 = client.get("/request", headers={"Authorization": f"bearer {fake_jwt}"})
+    assert res2.status_code == 200, res2.text
+    assert res2.json() == accessible_requests
+
+    # no results
+    res = client.get(
+        "/request",
+        params={"stream": stream, "username": "unknown_user"},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert res.text == ("[]" if stream == "json" else "")
+
+
+def test_list_user_requests_with_streaming(client, access_token_user_only_patcher):
+    fake_jwt = "1.2.3"
+
+    request_ids = []
+    for policy_id in ["test-policy", "test-policy-i-cant-access"]:
+        data = {
+            "username": "requestor_user",
+            "policy_id": policy_id,
+            "resource_id": "uniqid",
+            "resource_display_name": "My Resource",
+        }
+        res = client.post(
+            "/request", json=data, headers={"Authorization": f"bearer {fake_jwt}"}
+        )
+        assert res.status_code == 201, res.text
+        request_ids.append(res.json()["request_id"])
+
+    res = client.get(
+        "/request/user",
+        params={"stream": "ndjson"},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert [json.loads(line)["request_id"] for line in res.text.splitlines()] == (
+        request_ids
+    )
+
+
+@pytest.mark.parametrize("endpoint", ["/request", "/request/user"])
+@pytest.mark.parametrize("params", [{"stream": "xml"}, {"stream": "json", "limit": 2}])
+def test_list_requests_with_invalid_streaming(
+    client, access_token_user_only_patcher, endpoint, params
+):
+    fake_jwt = "1.2.3"
+    res = client.get(
+        endpoint, params=params, headers={"Authorization": f"bearer {fake_jwt}"}
+    )
+    assert res.status_code in [400, 422], res.text
+
+
+@pytest.mark.parametrize("stream", [None, "json", "ndjson"])
+def test_list_requests_with_fields(client, stream):
+    fake_jwt = "1.2.3"
+    request_data = []
+    for policy_id in ["test-policy", "test-policy-i-cant-access"]:
+        data = {
+            "username": "requestor_user",
+            "policy_id": policy_id,
+            "resource_id": "uniqid",
+            "resource_display_name": "My Resource",
+        }
+        res = client.post(
+            "/request", json=data, headers={"Authorization": f"bearer {fake_jwt}"}
+        )
+        assert res.status_code == 201, res.text
+        request_data.append(res.json())
+
+    # "policy_id" is not returned but the authorization checks still apply
+    params = {"fields": ["status", "request_id"]}
+    if stream:
+        params["stream"] = stream
+    res = client.get(
+        "/request", params=params, headers={"Authorization": f"bearer {fake_jwt}"}
+    )
+    assert res.status_code == 200, res.text
+    if stream == "ndjson":
+        results = [json.loads(line) for line in res.text.splitlines()]
+    else:
+        results = res.json()
+    # fields are returned in the usual order
+    assert [list(r.keys()) for r in results] == [["request_id", "status"]]
+    assert results == [
+        {
+            "request_id": request_data[0]["request_id"],
+            "status": request_data[0]["status"],
+        }
+    ]
+
+
+def test_list_user_requests_with_fields(client, access_token_user_only_patcher):
+    fake_jwt = "1.2.3"
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+    }
+    res = client.post(
+        "/request", json=data, headers={"Authorization": f"bearer {fake_jwt}"}
+    )
+    assert res.status_code == 201, res.text
+    request_data = res.json()
+
+    res = client.get(
+        "/request/user",
+        params={"fields": ["created_time"], "limit": 1},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert res.json() == [{"created_time": request_data["created_time"]}]
+
+    # invalid field
+    res = client.get(
+        "/request/user",
+        params={"fields": ["request_id", "not_a_field"]},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 400, res.text
+
+
+def test_get_request_stats(client):
+    fake_jwt = "1.2.3"
+
+    # create requests, some of which the current user cannot access
+    request_ids = {}
+    for username in ["user_1", "user_2", "user_3"]:
+        for policy_id in ["test-policy", "test-policy-i-cant-access"]:
+            data = {
+                "username": username,
+                "policy_id": policy_id,
+                "resource_id": "uniqid",
+                "resource_display_name": "My Resource",
+            }
+            res = client.post(
+                "/request", json=data, headers={"Authorization": f"bearer {fake_jwt}"}
+            )
+            assert res.status_code == 201, res.text
+            request_ids[(username, policy_id)] = res.json()["request_id"]
+
+    # update one of the requests to a final status
+    final_status = config["FINAL_STATUSES"][-1]
+    res = client.put(
+        f"/request/{request_ids[('user_1', 'test-policy')]}",
+        json={"status": final_status},
+    )
+    assert res.status_code == 200, res.text
+
+    res = client.get("/request/stats", headers={"Authorization": f"bearer {fake_jwt}"})
+    assert res.status_code == 200, res.text
+    assert sorted(res.json(), key=lambda r: r["status"]) == sorted(
+        [
+            {
+                "status": config["DEFAULT_INITIAL_STATUS"],
+                "policy_id": "test-policy",
+                "revoke": False,
+                "count": 2,
+            },
+            {
+                "status": final_status,
+                "policy_id": "test-policy",
+                "revoke": False,
+                "count": 1,
+            },
+        ],
+        key=lambda r: r["status"],
+    )
+
+    # filters apply
+    res = client.get(
+        "/request/stats",
+        params={"active": "", "username": ["user_1", "user_2"]},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert res.json() == [
+        {
+            "status": config["DEFAULT_INITIAL_STATUS"],
+            "policy_id": "test-policy",
+            "revoke": False,
+            "count": 1,
+        }
+    ]
+
+    # group by creation day
+    res = client.get(
+        "/request/stats",
+        params={"interval": "day", "status": config["DEFAULT_INITIAL_STATUS"]},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    stats = res.json()
+    assert len(stats) == 1
+    assert stats[0]["count"] == 2
+    created_time = datetime.fromisoformat(stats[0]["created_time"])
+    assert created_time.tzinfo
+    created_time = created_time.astimezone(timezone.utc)
+    assert (created_time.hour, created_time.minute, created_time.second) == (0, 0, 0)
+
+    # invalid interval
+    res = client.get(
+        "/request/stats",
+        params={"interval": "decade"},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 422, res.text
+
+
+def test_get_requests_with_time_range_filters(client):
+    fake_jwt = "1.2.3"
+
+    request_data = []
+    for username in ["user_1", "user_2", "user_3"]:
+        data = {
+            "username": username,
+            "policy_id": "test-policy",
+            "resource_id": "uniqid",
+            "resource_display_name": "My Resource",
+        }
+        res = client.post(
+            "/request", json=data, headers={"Authorization": f"bearer {fake_jwt}"}
+        )
+        assert res.status_code == 201, res.text
+        request_data.append(res.json())
+
+    # update the first request so its updated_time is after the others'
+    res = client.put(
+        f"/request/{request_data[0]['request_id']}",
+        json={"status": config["FINAL_STATUSES"][-1]},
+    )
+    assert res.status_code == 200, res.text
+    request_data[0] = res.json()
+
+    def list_request_ids(params):
+        res = client.get(
+            "/request", params=params, headers={"Authorization": f"bearer {fake_jwt}"}
+        )
+        assert res.status_code == 200, res.text
+        return [r["request_id"] for r in res.json()]
+
+    request_ids = [r["request_id"] for r in request_data]
+    # the start of the range is included and the end is excluded
+    assert list_request_ids(
+        {
+            "created_after": request_data[1]["created_time"],
+            "created_before": request_data[2]["created_time"],
+        }
+    ) == [request_ids[1]]
+    assert list_request_ids({"created_after": request_data[1]["created_time"]}) == (
+        request_ids[1:]
+    )
+    assert list_request_ids({"updated_after": request_data[2]["updated_time"]}) == [
+        request_ids[0],
+        request_ids[2],
+    ]
+    assert list_request_ids({"updated_before": request_data[2]["updated_time"]}) == [
+        request_ids[1]
+    ]
+    # dates without a timezone are in UTC
+    assert list_request_ids({"created_before": "2000-01-01"}) == []
+    assert list_request_ids({"created_after": "2000-01-01T00:00:00"}) == request_ids
+
+    res = client.get(
+        "/request",
+        params={"created_after": "not-a-date"},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 400, res.text
+
+
+def test_list_request_changes(client):
+    fake_jwt = "1.2.3"
+
+    # create requests, some of which the current user cannot access
+    request_ids = []
+    for username in ["user_1", "user_2", "user_3"]:
+        for policy_id in ["test-policy", "test-policy-i-cant-access"]:
+            data = {
+                "username": username,
+                "policy_id": policy_id,
+                "resource_id": "uniqid",
+                "resource_display_name": "My Resource",
+            }
+            res = client.post(
+                "/request", json=data, headers={"Authorization": f"bearer {fake_jwt}"}
+            )
+            assert res.status_code == 201, res.text
+            if policy_id == "test-policy":
+                request_ids.append(res.json()["request_id"])
+
+    # get all the changes, 2 at a time
+    res = client.get(
+        "/request/changes",
+        params={"limit": 2},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    changes = res.json()
+    # the first 2 requests are "user_1"'s requests, and only 1 is authorized
+    assert [r["request_id"] for r in changes["requests"]] == request_ids[:1]
+    assert changes["has_more"] == True
+    seen_request_ids = [r["request_id"] for r in changes["requests"]]
+    while changes["has_more"]:
+        res = client.get(
+            "/request/changes",
+            params={"limit": 2, "since": changes["cursor"]},
+            headers={"Authorization": f"bearer {fake_jwt}"},
+        )
+        assert res.status_code == 200, res.text
+        changes = res.json()
+        seen_request_ids.extend(r["request_id"] for r in changes["requests"])
+    assert seen_request_ids == request_ids
+
+    # no changes since the last call: the cursor does not change
+    cursor = changes["cursor"]
+    res = client.get(
+        "/request/changes",
+        params={"since": cursor},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert res.json() == {"requests": [], "cursor": cursor, "has_more": False}
+
+    # update a request: only that request is returned
+    final_status = config["FINAL_STATUSES"][-1]
+    res = client.put(f"/request/{request_ids[1]}", json={"status": final_status})
+    assert res.status_code == 200, res.text
+    res = client.get(
+        "/request/changes",
+        params={"since": cursor, "fields": ["request_id", "status"]},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    changes = res.json()
+    assert changes["requests"] == [
+        {"request_id": request_ids[1], "status": final_status}
+    ]
+    assert changes["cursor"] != cursor
+
+
+def test_list_request_changes_lag(client, monkeypatch):
+    fake_jwt = "1.2.3"
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+    }
+    res = client.post(
+        "/request", json=data, headers={"Authorization": f"bearer {fake_jwt}"}
+    )
+    assert res.status_code == 201, res.text
+
+    # recent changes are not returned yet
+    monkeypatch.setitem(config, "CHANGES_FEED_LAG", 60)
+    res = client.get(
+        "/request/changes", headers={"Authorization": f"bearer {fake_jwt}"}
+    )
+    assert res.status_code == 200, res.text
+    assert res.json() == {"requests": [], "cursor": None, "has_more": False}
+
+
+def test_batch_get_requests(client):
+    fake_jwt = "1.2.3"
+    request_ids = []
+    for username in ["requestor_user", "other_user"]:
+        res = client.post(
+            "/request",
+            json={
+                "username": username,
+                "policy_id": "test-policy",
+                "resource_id": "uniqid",
+                "resource_display_name": "My Resource",
+            },
+            headers={"Authorization": f"bearer {fake_jwt}"},
+        )
+        assert res.status_code == 201, res.text
+        request_ids.append(res.json()["request_id"])
+    unknown_request_id = "2b2ee5c5-5f1f-4a86-a6e0-7d1d0a2e2b1a"
+
+    res = client.post(
+        "/request/batch_get",
+        json={"request_ids": [*request_ids, unknown_request_id, request_ids[0]]},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    data = res.json()
+    assert sorted(data.keys()) == sorted(request_ids)
+    for request_id in request_ids:
+        res = client.get(
+            f"/request/{request_id}", headers={"Authorization": f"bearer {fake_jwt}"}
+        )
+        assert res.status_code == 200, res.text
+        assert data[request_id] == res.json()
+
+
+def test_batch_get_requests_without_access(client, mock_arborist_requests):
+    fake_jwt = "1.2.3"
+    res = client.post(
+        "/request",
+        json={"username": "requestor_user", "policy_id": "test-policy"},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 201, res.text
+    request_id = res.json()["request_id"]
+
+    # the user does not have access to see the request
+    mock_arborist_requests(authorized=False)
+    res = client.post(
+        "/request/batch_get",
+        json={"request_ids": [request_id]},
+        headers={"Authorization": f"bearer {fake_jwt}"},
+    )
+    assert res.status_code == 200, res.text
+    assert res.json() == {}
+
+
+def test_batch_get_requests_too_many(client, monkeypatch):
+    monkeypatch.setattr("requestor.routes.query.BATCH_GET_MAX_IDS", 1)
+    res = client.post(
+        "/request/batch_get",
+        json={
+            "request_ids": [
+                "2b2ee5c5-5f1f-4a86-a6e0-7d1d0a2e2b1a",
+                "9e6c8b1e-3a43-4f0e-9d5b-2f4c3b1d7a10",
+            ]
+        },
+        headers={"Authorization": "bearer 1.2.3"},
+    )
+    assert res.status_code == 400, res.text
@@ -0,0 +1,104 @@
+import asyncio
+import mock
+import pytest
+
+from requestor.rate_limiter import RateLimiter, RateLimitExceededError
+
+
+async def make_call(limiter):
+    async with limiter.limit():
+        pass
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_concurrency_limit():
+    limiter = RateLimiter("abc_system", max_concurrency=1, max_queue_wait=0.1)
+
+    async with limiter.limit():
+        assert limiter.to_dict()["in_flight"] == 1
+
+        # the only slot is taken: the call waits, then fails
+        with pytest.raises(RateLimitExceededError):
+            await make_call(limiter)
+
+    # the slot is free again
+    await make_call(limiter)
+
+    metrics = limiter.to_dict()
+    assert metrics["in_flight"] == 0
+    assert metrics["queued"] == 0
+    assert metrics["total_calls"] == 2
+    assert metrics["rejected_calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_waiting_calls():
+    """
+    Calls waiting for their turn should wait in the event loop, get their
+    turn as soon as a slot is released, and release their place in line
+    when they are cancelled.
+    """
+    limiter = RateLimiter("abc_system", max_concurrency=1, max_queue_wait=5)
+
+    async with limiter.limit():
+        tasks = [asyncio.create_task(make_call(limiter)) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        assert limiter.to_dict()["queued"] == 3
+        tasks[0].cancel()
+        await asyncio.sleep(0.1)
+        assert limiter.to_dict()["queued"] == 2
+
+    await asyncio.wait_for(asyncio.gather(*tasks[1:]), 1)
+    metrics = limiter.to_dict()
+    assert metrics["in_flight"] == 0
+    assert metrics["queued"] == 0
+    assert metrics["total_calls"] == 3
+    assert metrics["rejected_calls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_rate_limit():
+    limiter = RateLimiter(
+        "abc_system", max_calls_per_second=10, burst=2, max_queue_wait=0.15
+    )
+    with mock.patch("requestor.rate_limiter.time") as mock_time, mock.patch(
+        "requestor.rate_limiter.asyncio.sleep", new_callable=mock.AsyncMock
+    ) as mock_sleep:
+        mock_time.monotonic.return_value = 100
+
+        # the first 2 calls are allowed right away (burst)
+        for _ in range(2):
+            await make_call(limiter)
+        mock_sleep.assert_not_called()
+
+        # the next call has to wait 0.1s
+        await make_call(limiter)
+        mock_sleep.assert_called_once_with(pytest.approx(0.1))
+
+        # the next call would have to wait 0.2s, longer than `max_queue_wait`
+        with pytest.raises(RateLimitExceededError):
+            await make_call(limiter)
+
+    metrics = limiter.to_dict()
+    assert metrics["total_calls"] == 3
+    assert metrics["rejected_calls"] == 1
+
+
+def test_rate_limiters_endpoint(client):
+    data = {
+        "username": "requestor_user",
+        "policy_id": "test-policy-with-redirect-and-external-call",
+        "resource_id": "uniqid",
+        "resource_display_name": "My Resource",
+        "status": "CREATED",
+    }
+    with mock.patch("requestor.request_utils.requests"):
+        res = client.post("/request", json=data)
+        assert res.status_code == 201, res.text
+
+    res = client.get("/_rate_limiters")
+    assert res.status_code == 200, res.text
+    metrics = res.json()["abc_system"]
+    assert metrics["total_calls"] == 1
+    assert metrics["in_flight"] == 0
+    assert metrics["rejected_calls"] == 0
@@ -0,0 +1,45 @@
+import time
+import uuid
+
+import pytest
+
+from requestor.config import config
+from requestor.request_ids import new_request_id, uuid7
+
+
+def test_uuid7():
+    before_ms = time.time_ns() // 1_000_000
+    ids = []
+    for _ in range(3):
+        ids.append(uuid7())
+        time.sleep(0.002)
+    after_ms = time.time_ns() // 1_000_000
+
+    for request_id in ids:
+        assert request_id.version == 7
+        assert request_id.variant == uuid.RFC_4122
+        assert before_ms <= request_id.int >> 80 <= after_ms
+    # IDs generated in different milliseconds are ordered
+    assert ids == sorted(ids)
+    assert [str(i) for i in ids] == sorted(str(i) for i in ids)
+    assert len(set(uuid7() for _ in range(1000))) == 1000
+
+
+@pytest.mark.parametrize("version", [4, 7])
+def test_create_request_id_version(client, monkeypatch, version):
+    monkeypatch.setitem(config, "REQUEST_ID_VERSION", version)
+    assert uuid.UUID(new_request_id()).version == version
+
+    res = client.post(
+        "/request", json={"username": "requestor_user", "policy_id": "test-policy"}
+    )
+    assert res.status_code == 201, res.text
+    assert uuid.UUID(res.json()["request_id"]).version == version
+
+    res = client.post(
+        "/request/bulk",
+        json=[{"username": "other_user", "policy_id": "test-policy"}],
+    )
+    assert res.status_code == 200, res.text
+    assert res.json()[0]["status_code"] == 201, res.json()
+    assert uuid.UUID(res.json()[0]["request"]["request_id"]).version == version
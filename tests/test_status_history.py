@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+import json
+
+from requestor.config import config
+from requestor.draft_expiry import expire_draft_requests
+from tests.test_draft_expiry import create_requests, set_updated_time
+
+
+def get_status_events(client, **params) -> list:
+    res = client.get(
+        "/request/status_events",
+        params={"start": "2000-01-01", "stream": "ndjson", **params},
+        headers={"Authorization": "bearer 1.2.3"},
+    )
+    assert res.status_code == 200, res.text
+    return [json.loads(line) for line in res.text.splitlines()]
+
+
+def test_status_history(client):
+    """
+    Creating a request and updating its status should be recorded in the
+    status history.
+    """
+    request_ids = create_requests(client, ["requestor_user", "other_user"])
+    for status in ["INTERMEDIATE_STATUS", config["FINAL_STATUSES"][0]]:
+        res = client.put(f"/request/{request_ids[0]}", json={"status": status})
+        assert res.status_code == 200, res.text
+
+    events = get_status_events(client, request_id=request_ids[0])
+    assert [(e["old_status"], e["status"]) for e in events] == [
+        (None, config["DEFAULT_INITIAL_STATUS"]),
+        (config["DEFAULT_INITIAL_STATUS"], "INTERMEDIATE_STATUS"),
+        ("INTERMEDIATE_STATUS", config["FINAL_STATUSES"][0]),
+    ]
+    res = client.get(
+        f"/request/{request_ids[0]}", headers={"Authorization": "bearer 1.2.3"}
+    )
+    assert events[-1] == {
+        "request_id": request_ids[0],
+        "username": "requestor_user",
+        "policy_id": "test-policy",
+        "old_status": "INTERMEDIATE_STATUS",
+        "status": config["FINAL_STATUSES"][0],
+        "event_time": res.json()["updated_time"],
+    }
+
+    # all the requests
+    events = get_status_events(client)
+    assert len(events) == 4
+    assert [e["event_time"] for e in events] == sorted(e["event_time"] for e in events)
+
+    # JSON array
+    res = client.get(
+        "/request/status_events",
+        params={"start": "2000-01-01"},
+        headers={"Authorization": "bearer 1.2.3"},
+    )
+    assert res.status_code == 200, res.text
+    assert res.json() == events
+
+
+def test_status_history_draft_reuse(client):
+    """
+    Reusing a draft request should be recorded in the status history, like
+    a status update that does not change the status.
+    """
+    data = {"username": "requestor_user", "policy_id": "test-policy"}
+    res = client.post("/request", json=data)
+    assert res.status_code == 201, res.text
+    draft = res.json()
+    res = client.post("/request/bulk", json=[data])
+    assert res.status_code == 200, res.text
+    assert res.json()[0]["request"]["request_id"] == draft["request_id"]
+    res = client.post("/request", json={**data, "status": config["FINAL_STATUSES"][0]})
+    assert res.status_code == 201, res.text
+    reused = res.json()
+    assert reused["request_id"] == draft["request_id"]
+    assert reused["status"] == draft["status"]
+    assert reused["updated_time"] > draft["updated_time"]
+
+    events = get_status_events(client, request_id=draft["request_id"])
+    assert [(e["old_status"], e["status"]) for e in events] == [
+        (None, draft["status"]),
+        (draft["status"], draft["status"]),
+        (draft["status"], draft["status"]),
+    ]
+    assert events[-1]["event_time"] == reused["updated_time"]
+
+
+def test_status_history_time_range(client):
+    create_requests(client, ["requestor_user"])
+    now = datetime.now(timezone.utc)
+    assert len(get_status_events(client, end=now.isoformat())) == 1
+    assert get_status_events(client, start=now.isoformat()) == []
+    assert get_status_events(client, end="2000-01-02") == []
+
+    res = client.get(
+        "/request/status_events",
+        params={"start": "not a date"},
+        headers={"Authorization": "bearer 1.2.3"},
+    )
+    assert res.status_code == 400, res.text
+
+
+def test_status_history_bulk_update_and_draft_expiry(client, monkeypatch):
+    request_ids = create_requests(client, ["requestor_user", "other_user"])
+    res = client.put(
+        "/request/bulk",
+        json=[{"request_id": request_ids[0], "status": "INTERMEDIATE_STATUS"}],
+    )
+    assert res.status_code == 200, res.text
+
+    monkeypatch.setitem(config, "DRAFT_TTL", 24 * 3600)
+    monkeypatch.setitem(config, "DRAFT_EXPIRED_STATUS", config["FINAL_STATUSES"][0])
+    two_days_ago = datetime.now(timezone.utc) - timedelta(days=2)
+    client.portal.call(set_updated_time, [request_ids[1]], two_days_ago)
+    assert client.portal.call(expire_draft_requests) == 1
+
+    assert [
+        (e["old_status"], e["status"])
+        for e in get_status_events(client, start=two_days_ago.isoformat())
+        if e["old_status"]
+    ] == [
+        (config["DEFAULT_INITIAL_STATUS"], "INTERMEDIATE_STATUS"),
+        (config["DEFAULT_INITIAL_STATUS"], config["FINAL_STATUSES"][0]),
+    ]
+
+
+def test_status_history_without_access(client, mock_arborist_requests):
+    create_requests(client, ["requestor_user"])
+    mock_arborist_requests(authorized=False)
+    assert get_status_events(client) == []
@@ -16,3 +16,17 @@ def test_asgi_py():
     Run code in asgi.py for coverage purposes
     """
     import requestor.asgi
+
+
+def test_db_pool_endpoint(client):
+    res = client.get("/_status")
+    assert res.status_code == 200
+
+    res = client.get("/_db_pool")
+    assert res.status_code == 200, res.text
+    state = res.json()
+    assert state["checkouts"] > 0
+    # the `_status` endpoint released its connection
+    assert state["checked_out"] == 0
+    for key in ["size", "overflow", "average_wait_seconds", "max_wait_seconds"]:
+        assert key in state